@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class LmsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "lms"
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+        from .services import dashboard_export  # noqa: F401  (registers the export builder)
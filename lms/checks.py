@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from lms.services.dashboard_cache import LOCAL_CACHE_MAX_TTL, cache_is_shared, dashboard_cache_ttl
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Long dashboard TTLs rely on version bumps reaching every worker."""
+    if cache_is_shared() or dashboard_cache_ttl() <= LOCAL_CACHE_MAX_TTL:
+        return []
+    return [
+        Warning(
+            f"DASHBOARD_CACHE_TTL is {dashboard_cache_ttl()} s but the default cache "
+            f"({settings.CACHES['default']['BACKEND']}) is local to each process, so "
+            "dashboard invalidations only reach the worker that made the write.",
+            hint="Set CACHE_URL to a shared cache (rediscache://, pymemcache:// or dbcache://).",
+            id="lms.W001",
+        )
+    ]
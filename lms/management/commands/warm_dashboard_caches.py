@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lms.services.dashboard import (
+    DASHBOARD_DAYS_OPTIONS,
+    DASHBOARD_PANELS,
+    DAYLESS_PANELS,
+    DEFAULT_DASHBOARD_DAYS,
+)
+from lms.services.dashboard_cache import cache_is_shared, warm_panel
+from lms_courses.models import CourseSemester
+from lms_users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute cached teacher dashboard panels: every day-range for all courses, "
+        "plus each owned course at the default range. Meant to run from cron off-peak."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=200, help="Owners loaded per query (default 200)"
+        )
+        parser.add_argument(
+            "--force", action="store_true", help="Recompute entries that are still fresh"
+        )
+
+    @staticmethod
+    def combinations(course_ids: list[int]):
+        """Yield (panel, days, course id) for the filters teachers use most.
+
+        Trend panels are warmed at each range's default granularity.
+        """
+        for cs_id in [0, *course_ids]:
+            ranges = DASHBOARD_DAYS_OPTIONS if not cs_id else (DEFAULT_DASHBOARD_DAYS,)
+            for panel in DASHBOARD_PANELS:
+                for days in (DEFAULT_DASHBOARD_DAYS,) if panel in DAYLESS_PANELS else ranges:
+                    yield panel, days, cs_id
+
+    def handle(self, *args: Any, **options: Any):
+        if not cache_is_shared():
+            # The entries would die with this process, unseen by the web workers
+            raise CommandError(
+                "The default cache is local to this process; set CACHE_URL to a shared cache."
+            )
+        batch_size = max(1, options["batch_size"])
+        force = options["force"]
+        owners = User.objects.filter(course_semesters__isnull=False).distinct().order_by("pk")
+
+        warmed = owner_count = 0
+        started = time.monotonic()
+        last_pk = 0
+        # Keyset batches keep each query small; all of them share the command's connection
+        while batch := list(owners.filter(pk__gt=last_pk)[:batch_size]):
+            last_pk = batch[-1].pk
+            course_ids: dict[int, list[int]] = {}
+            for owner_id, cs_id in (
+                CourseSemester.objects.filter(owner__in=batch)
+                .order_by("pk")
+                .values_list("owner_id", "pk")
+            ):
+                course_ids.setdefault(owner_id, []).append(cs_id)
+
+            for owner in batch:
+                owner_started = time.monotonic()
+                count = sum(
+                    warm_panel(owner, panel, days, cs_id, force=force)
+                    for panel, days, cs_id in self.combinations(course_ids.get(owner.pk, []))
+                )
+                warmed += count
+                owner_count += 1
+                elapsed_ms = (time.monotonic() - owner_started) * 1000
+                self.stdout.write(f"{owner.username}: warmed {count} in {elapsed_ms:.0f} ms")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Warmed {warmed} dashboard cache entries for {owner_count} owner(s) "
+                f"in {time.monotonic() - started:.2f} s."
+            )
+        )
@@ -1,122 +1,363 @@
+"""Domain-level services for the lms project."""
+
 from __future__ import annotations
 
+from dataclasses import dataclass
 from datetime import date, timedelta
+from typing import Iterable, NamedTuple
 
-from django.db.models import Avg, Count, Q, QuerySet
+from django.db.models import (
+    Count,
+    Exists,
+    F,
+    IntegerField,
+    Max,
+    OuterRef,
+    QuerySet,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth, TruncWeek
 
 from lms_courses.models import (
     CourseSemester,
-    FinalAssignment,
+    CourseSemesterDailyActivity,
+    LabParticipation,
     LabReportGrade,
     LabSession,
 )
+from lms_users.models import User
 
+DASHBOARD_DAYS_OPTIONS = (3, 7, 14, 30, 90, 365)
+DEFAULT_DASHBOARD_DAYS = 7
+TREND_GRANULARITIES = {"day": TruncDay, "week": TruncWeek, "month": TruncMonth}
+OVERDUE_PANEL_LIMIT = 10
+# Bump whenever the shape of a cached panel value changes (CourseRow, OverdueRow,
+# the KPI dict, ...) so entries pickled by the previous deploy are never read
+PANEL_LAYOUT_VERSION = 2
 
-def compute_dashboard_stats(user, days: int, selected_course_id: int) -> dict:
-    """Return computed dashboard stats for a user, given filters.
 
-    Output keys align with the context used by the dashboard template.
+class CourseRow(NamedTuple):
+    """One per-course dashboard row, reduced to primitives."""
+
+    id: int
+    code: str
+    title: str
+    year: int
+    students_count: int
+    upcoming_sessions: int
+    lab_done: int
+    lab_null: int
+    fa_sub: int
+    fa_grd: int
+
+
+@dataclass(frozen=True, slots=True)
+class DashboardSnapshot:
+    """Compact, picklable result of ``compute_dashboard_stats``.
+
+    Holds no QuerySets or model instances, so export jobs can build their
+    sheets from plain values.
+    """
+
+    active_courses: int
+    unique_students: int
+    upcoming_labs: int
+    lab_grades_done: int
+    lab_grades_null: int
+    fa_submitted: int
+    fa_graded: int
+    fa_avg: float | None
+    overdue_ungraded: int
+    no_attendance_sessions: int
+    attendance_trend: tuple[int, ...]
+    per_course: tuple[CourseRow, ...]
+    # First day of each ``attendance_trend`` bucket
+    trend_periods: tuple[date, ...] = ()
+
+    @classmethod
+    def from_stats(cls, data: dict) -> DashboardSnapshot:
+        """Materialize the output of ``compute_dashboard_stats`` into a snapshot."""
+        return cls(
+            active_courses=data["active_courses"],
+            unique_students=data["unique_students"],
+            upcoming_labs=data["upcoming_labs"],
+            lab_grades_done=data["lab_grades_done"],
+            lab_grades_null=data["lab_grades_null"],
+            fa_submitted=data["fa_submitted"],
+            fa_graded=data["fa_graded"],
+            fa_avg=data["fa_avg"],
+            overdue_ungraded=data["overdue_ungraded"],
+            no_attendance_sessions=data["no_attendance_sessions"],
+            attendance_trend=tuple(data.get("attendance_trend", ())),
+            per_course=_course_rows(data.get("per_course", ())),
+            trend_periods=tuple(data.get("attendance_trend_periods", ())),
+        )
+
+
+class OverdueRow(NamedTuple):
+    """A past lab session that still has ungraded reports."""
+
+    session_id: int
+    course_semester_id: int
+    code: str
+    name: str
+    date: date
+    ungraded: int
+
+
+def _course_rows(per_course: Iterable) -> tuple[CourseRow, ...]:
+    return tuple(
+        CourseRow(
+            id=cs.id,
+            code=cs.course.code,
+            title=cs.course.title,
+            year=cs.year,
+            students_count=cs.students_count,
+            upcoming_sessions=cs.upcoming_sessions,
+            lab_done=cs.lab_done,
+            lab_null=cs.lab_null,
+            fa_sub=cs.fa_sub,
+            fa_grd=cs.fa_grd,
+        )
+        for cs in per_course
+    )
+
+
+def _scalar(qs: QuerySet, expression) -> Coalesce:
+    """Wrap a single-value aggregate over ``qs`` as a scalar subquery (0 when empty)."""
+    sub = qs.order_by().annotate(_one=Value(1)).values("_one").annotate(v=expression).values("v")
+    return Coalesce(Subquery(sub, output_field=IntegerField()), 0)
+
+
+def _stat(name: str) -> Coalesce:
+    """Read a counter from the CourseSemesterStats row (0 when not built yet)."""
+    return Coalesce(F(f"stats__{name}"), 0)
+
+
+def _course_kpi_subqueries(today: date, soon: date) -> dict:
+    """Per-CourseSemester expressions for every summable headline KPI.
+
+    Grade and final-assignment counters come from the one-to-one stats read
+    model; date-dependent counts are correlated subqueries over a single
+    child table. Neither multiplies rows the way chained joins would.
+    """
+    sessions = LabSession.objects.filter(course_semester=OuterRef("pk"))
+    null_grade = LabReportGrade.objects.filter(
+        lab_report__session=OuterRef("pk"), grade__isnull=True
+    )
+    any_participation = LabParticipation.objects.filter(session=OuterRef("pk"))
+
+    subs = {
+        "upcoming_labs": _scalar(sessions.filter(date__gte=today, date__lte=soon), Count("pk")),
+        "lab_grades_done": _stat("lab_graded"),
+        "lab_grades_null": _stat("lab_ungraded"),
+        "fa_submitted": _stat("fa_submitted"),
+        "fa_graded": _stat("fa_graded"),
+        "fa_grade_sum": _stat("fa_grade_sum"),
+        "overdue_ungraded": _scalar(
+            sessions.filter(date__lt=today - timedelta(days=7)).filter(Exists(null_grade)),
+            Count("pk"),
+        ),
+        "no_attendance_sessions": _scalar(sessions.filter(~Exists(any_participation)), Count("pk")),
+    }
+    return subs
+
+
+def compute_headline_kpis(
+    cs_qs: QuerySet[CourseSemester], days: int, granularity: str | None = None
+) -> dict:
+    """Compute all dashboard headline KPIs for ``cs_qs``.
+
+    Per-course counters are summed in one outer aggregate; ``unique_students``
+    rides along as an uncorrelated subquery over enrolled users. The grading
+    trend is a second query, bucketed exactly like the trend panel.
     """
     today = date.today()
     soon = today + timedelta(days=days)
 
-    all_courses_qs: QuerySet[CourseSemester] = CourseSemester.objects.filter(
-        owner=user
-    ).select_related("course")
-    if selected_course_id and all_courses_qs.filter(id=selected_course_id).exists():
-        cs_qs = all_courses_qs.filter(id=selected_course_id)
-    else:
-        cs_qs = all_courses_qs
-
-    active_courses = cs_qs.count()
-    unique_students = cs_qs.values("students").exclude(students__isnull=True).distinct().count()
-    upcoming_labs = LabSession.objects.filter(
-        course_semester__in=cs_qs, date__gte=today, date__lte=soon
-    ).count()
-
-    lab_grades_done = LabReportGrade.objects.filter(
-        lab_report__session__course_semester__in=cs_qs, grade__isnull=False
-    ).count()
-    lab_grades_null = LabReportGrade.objects.filter(
-        lab_report__session__course_semester__in=cs_qs, grade__isnull=True
-    ).count()
-
-    fa_qs = FinalAssignment.objects.filter(course_semester__in=cs_qs)
-    fa_submitted = fa_qs.aggregate(c=Count("results", filter=Q(results__submitted=True)))["c"] or 0
-    fa_graded = (
-        fa_qs.aggregate(c=Count("results", filter=Q(results__grade__isnull=False)))["c"] or 0
+    subs = _course_kpi_subqueries(today, soon)
+    enrolled = User.objects.filter(enrolled_course_semesters__in=cs_qs.values("pk"))
+    subs["unique_students"] = _scalar(enrolled, Count("pk", distinct=True))
+
+    # Annotation aliases must differ from the aggregate names or Django drops them
+    annotations = {f"course_{name}": expr for name, expr in subs.items()}
+    aggregates = {name: Sum(f"course_{name}") for name in subs}
+    aggregates["unique_students"] = Max("course_unique_students")
+    totals = (
+        cs_qs.order_by().annotate(**annotations).aggregate(active_courses=Count("pk"), **aggregates)
     )
-    fa_avg = fa_qs.aggregate(avg=Avg("results__grade"))["avg"]
+    totals = {k: v or 0 for k, v in totals.items()}
 
-    overdue_ungraded = (
-        LabSession.objects.filter(
-            course_semester__in=cs_qs,
-            date__lt=today - timedelta(days=7),
-            report__grades__grade__isnull=True,
+    fa_grade_sum = totals.pop("fa_grade_sum")
+    fa_grade_count = totals["fa_graded"]
+    totals["fa_avg"] = fa_grade_sum / fa_grade_count if fa_grade_count else None
+    trend = _trend_panel(cs_qs, days, granularity)
+    totals["attendance_trend"] = [row["grades_entered"] for row in trend]
+    totals["attendance_trend_periods"] = [row["period"] for row in trend]
+    return totals
+
+
+def trend_granularity(days: int, granularity: str | None = None) -> str:
+    """``granularity`` if valid, else the bucket size that suits a ``days`` range."""
+    if granularity in TREND_GRANULARITIES:
+        return granularity
+    if days <= 14:
+        return "day"
+    return "week" if days <= 90 else "month"
+
+
+def _period_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_period(start: date, granularity: str) -> date:
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def activity_trend(
+    cs_qs: QuerySet[CourseSemester], start: date, end: date, granularity: str = "week"
+) -> list[dict]:
+    """Bucket the daily activity of ``cs_qs`` between ``start`` and ``end`` (inclusive).
+
+    One range scan over the daily rollup table, whatever the history length.
+    Returns a row per day/ISO week/month with ``period`` (its first day) and the
+    summed counters; periods without activity are filled with zeroes.
+    """
+    if granularity not in TREND_GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    counters = CourseSemesterDailyActivity.COUNTERS
+    rows = (
+        CourseSemesterDailyActivity.objects.filter(
+            course_semester__in=cs_qs.values("pk"), date__gte=start, date__lte=end
         )
-        .distinct()
-        .count()
-    )
-    no_attendance_sessions = (
-        LabSession.objects.filter(course_semester__in=cs_qs)
-        .exclude(participations__isnull=False)
-        .count()
+        .annotate(period=TREND_GRANULARITIES[granularity]("date"))
+        .values("period")
+        .annotate(**{name: Sum(name) for name in counters})
+        .order_by("period")
     )
+    totals = {row.pop("period"): row for row in rows}
+
+    trend = []
+    period = _period_start(start, granularity)
+    while period <= end:
+        values = totals.get(period, {})
+        trend.append({"period": period, **{name: values.get(name) or 0 for name in counters}})
+        period = _next_period(period, granularity)
+    return trend
+
 
-    per_course = (
+def per_course_stats(cs_qs: QuerySet[CourseSemester], days: int) -> QuerySet[CourseSemester]:
+    """Annotate each course semester in ``cs_qs`` with its dashboard counters.
+
+    Counters are read from the stats row or computed by an independent
+    correlated subquery over one child table, so cost grows with the rows of
+    that table alone instead of the students x sessions x grades product a
+    joined ``Count`` would build.
+    """
+    today = date.today()
+    subs = _course_kpi_subqueries(today, today + timedelta(days=days))
+    return (
         cs_qs.annotate(
-            students_count=Count("students", distinct=True),
-            upcoming_sessions=Count(
-                "sessions",
-                filter=Q(sessions__date__gte=today, sessions__date__lte=soon),
-                distinct=True,
-            ),
-            lab_done=Count(
-                "sessions__report__grades",
-                filter=Q(sessions__report__grades__grade__isnull=False),
-            ),
-            lab_null=Count(
-                "sessions__report__grades",
-                filter=Q(sessions__report__grades__grade__isnull=True),
-            ),
-            fa_sub=Count(
-                "final_assignment__results",
-                filter=Q(final_assignment__results__submitted=True),
-            ),
-            fa_grd=Count(
-                "final_assignment__results",
-                filter=Q(final_assignment__results__grade__isnull=False),
-            ),
+            students_count=_stat("students"),
+            upcoming_sessions=subs["upcoming_labs"],
+            lab_done=subs["lab_grades_done"],
+            lab_null=subs["lab_grades_null"],
+            fa_sub=subs["fa_submitted"],
+            fa_grd=subs["fa_graded"],
         )
         .select_related("course")
         .order_by("course__code")
     )
 
-    trend = []
-    for weeks_ago in range(4, 0, -1):
-        start = today - timedelta(days=7 * weeks_ago)
-        end = start + timedelta(days=6)
-        count = LabReportGrade.objects.filter(
-            lab_report__session__course_semester__in=cs_qs,
-            lab_report__session__date__gte=start,
-            lab_report__session__date__lte=end,
-            grade__isnull=False,
-        ).count()
-        trend.append(count)
 
+def overdue_sessions(
+    cs_qs: QuerySet[CourseSemester], limit: int = OVERDUE_PANEL_LIMIT
+) -> tuple[OverdueRow, ...]:
+    """Oldest sessions (over a week past) of ``cs_qs`` that still have ungraded reports."""
+    null_grades = LabReportGrade.objects.filter(
+        lab_report__session=OuterRef("pk"), grade__isnull=True
+    )
+    rows = (
+        LabSession.objects.filter(
+            course_semester__in=cs_qs.values("pk"), date__lt=date.today() - timedelta(days=7)
+        )
+        .annotate(ungraded=_scalar(null_grades, Count("pk")))
+        .filter(ungraded__gt=0)
+        .order_by("date", "pk")
+        .values_list(
+            "pk", "course_semester_id", "course_semester__course__code", "name", "date", "ungraded"
+        )
+    )
+    return tuple(OverdueRow(*values) for values in rows[:limit])
+
+
+def owned_course_semesters(
+    user, selected_course_id: int
+) -> tuple[QuerySet[CourseSemester], QuerySet[CourseSemester]]:
+    """Return (all of ``user``'s course semesters, those the dashboard covers).
+
+    A selected course only narrows the scope when ``user`` owns it.
+    """
+    all_courses_qs: QuerySet[CourseSemester] = CourseSemester.objects.filter(
+        owner=user
+    ).select_related("course")
+    if selected_course_id and all_courses_qs.filter(id=selected_course_id).exists():
+        return all_courses_qs, all_courses_qs.filter(id=selected_course_id)
+    return all_courses_qs, all_courses_qs
+
+
+def _trend_panel(
+    cs_qs: QuerySet[CourseSemester], days: int, granularity: str | None = None
+) -> list[dict]:
+    """Activity over the last ``days`` days (today included), bucketed by ``granularity``."""
+    today = date.today()
+    start = today - timedelta(days=days - 1)
+    return activity_trend(cs_qs, start, today, trend_granularity(days, granularity))
+
+
+# Independently cached dashboard panels: name -> compute(cs_qs, days, granularity),
+# returning primitives
+DASHBOARD_PANELS = {
+    "kpis": compute_headline_kpis,
+    "courses": lambda cs_qs, days, granularity: _course_rows(per_course_stats(cs_qs, days)),
+    "trend": _trend_panel,
+    "overdue": lambda cs_qs, days, granularity: overdue_sessions(cs_qs),
+}
+# Panels whose content does not depend on the day-range filter
+DAYLESS_PANELS = frozenset({"overdue"})
+# Panels whose content depends on the trend granularity
+TREND_PANELS = frozenset({"kpis", "trend"})
+
+
+def compute_panel(
+    user, panel: str, days: int, selected_course_id: int, granularity: str | None = None
+):
+    """Compute a single dashboard panel for ``user``."""
+    _, cs_qs = owned_course_semesters(user, selected_course_id)
+    return DASHBOARD_PANELS[panel](cs_qs, days, granularity)
+
+
+def compute_dashboard_stats(
+    user, days: int, selected_course_id: int, granularity: str | None = None
+) -> dict:
+    """Return computed dashboard stats for a user, given filters.
+
+    Output keys align with the context used by the dashboard template.
+    """
+    all_courses_qs, cs_qs = owned_course_semesters(user, selected_course_id)
     return {
         "all_courses_qs": all_courses_qs,
         "cs_qs": cs_qs,
-        "active_courses": active_courses,
-        "unique_students": unique_students,
-        "upcoming_labs": upcoming_labs,
-        "lab_grades_done": lab_grades_done,
-        "lab_grades_null": lab_grades_null,
-        "fa_submitted": fa_submitted,
-        "fa_graded": fa_graded,
-        "fa_avg": fa_avg,
-        "overdue_ungraded": overdue_ungraded,
-        "no_attendance_sessions": no_attendance_sessions,
-        "per_course": per_course,
-        "attendance_trend": trend,
+        **compute_headline_kpis(cs_qs, days, granularity),
+        "per_course": per_course_stats(cs_qs, days),
     }
@@ -0,0 +1,268 @@
+"""Versioned cache namespace for teacher dashboards.
+
+Every owner has a version counter in the cache; dashboard entries embed it in
+their key. Writes to any of the owner's course data bump the counter (after
+the surrounding transaction commits), which orphans all existing entries at
+once, so entries can live for hours without ever being served stale.
+
+Within a version, entries carry a soft expiry for the date-dependent figures.
+``get_or_refresh`` serves the stale value while a single worker (holding a
+cache lock) recomputes it, and refreshes popular keys probabilistically
+ahead of the soft expiry (XFetch) so they never expire all at once.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+import time
+import uuid
+import weakref
+from typing import Any, Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from lms.services.dashboard import (
+    DAYLESS_PANELS,
+    PANEL_LAYOUT_VERSION,
+    TREND_PANELS,
+    compute_panel,
+    trend_granularity,
+)
+
+DEFAULT_DASHBOARD_CACHE_TTL = 6 * 60 * 60
+DEFAULT_DASHBOARD_CACHE_SOFT_TTL = 15 * 60
+# Longest TTL that stays acceptable when version bumps do not reach other workers
+LOCAL_CACHE_MAX_TTL = 60
+# Upper bound for one recomputation; the lock expires on its own after this
+REFRESH_LOCK_TIMEOUT = 30
+# How long a request without a cached value waits for another worker's result
+MISS_WAIT_SECONDS = 5.0
+MISS_POLL_INTERVAL = 0.05
+# XFetch aggressiveness: >1 refreshes earlier, <1 later
+XFETCH_BETA = 1.0
+
+
+def cache_is_shared() -> bool:
+    """False for the per-process local-memory backend, which other workers cannot see."""
+    return not settings.CACHES["default"]["BACKEND"].endswith("LocMemCache")
+
+
+def dashboard_cache_ttl() -> int:
+    return int(getattr(settings, "DASHBOARD_CACHE_TTL", DEFAULT_DASHBOARD_CACHE_TTL))
+
+
+def dashboard_cache_soft_ttl() -> int:
+    return int(getattr(settings, "DASHBOARD_CACHE_SOFT_TTL", DEFAULT_DASHBOARD_CACHE_SOFT_TTL))
+
+
+def _version_key(owner_id: int) -> str:
+    return f"dash:ver:{owner_id}"
+
+
+def dashboard_version(owner_id: int) -> int:
+    """Return the owner's current dashboard namespace version."""
+    key = _version_key(owner_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter never revisits an old namespace
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key, 0)
+    return version
+
+
+def bump_dashboard_version(owner_id: int) -> None:
+    key = _version_key(owner_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def dashboard_cache_key(
+    owner_id: int, days: int, course_id: int, panel: str = "all", granularity: str = ""
+) -> str:
+    version = dashboard_version(owner_id)
+    return (
+        f"dash:{owner_id}:v{version}:l{PANEL_LAYOUT_VERSION}:{panel}"
+        f":d{days}:g{granularity or '-'}:c{course_id or 'all'}"
+    )
+
+
+class _PendingBump:
+    """on_commit callback collecting the owners touched by one transaction."""
+
+    def __init__(self) -> None:
+        self.owner_ids: set[int] = set()
+        self.done = False
+
+    def __call__(self) -> None:
+        self.done = True
+        for owner_id in self.owner_ids:
+            bump_dashboard_version(owner_id)
+
+
+def invalidate_owner_dashboards(owner_ids: Iterable[int | None]) -> None:
+    """Bump the dashboard version of ``owner_ids`` once the transaction commits.
+
+    Bumping before commit would let a concurrent reader cache pre-commit data
+    under the new version. All calls within one atomic block add to a single
+    set of owners and a single callback, so a grid save touching hundreds of
+    rows bumps once.
+    """
+    ids = {owner_id for owner_id in owner_ids if owner_id is not None}
+    if not ids:
+        return
+    conn = transaction.get_connection()
+    if not conn.in_atomic_block:
+        for owner_id in ids:
+            bump_dashboard_version(owner_id)
+        return
+    # One callback per atomic block, keyed by its savepoint (never reused once
+    # released or rolled back). The connection only holds a weak reference:
+    # the on_commit queue owns the callback, so a rollback that discards it
+    # also ends its reuse.
+    scope = conn.savepoint_ids[-1] if conn.savepoint_ids else None
+    slot = getattr(conn, "_dashboard_pending_bump", None)
+    pending = slot[1]() if slot is not None and slot[0] == scope else None
+    if pending is None or pending.done:
+        pending = _PendingBump()
+        conn._dashboard_pending_bump = (scope, weakref.ref(pending))
+        transaction.on_commit(pending)
+    pending.owner_ids |= ids
+
+
+def _needs_refresh(soft_expires_at: float, delta: float, now: float) -> bool:
+    """XFetch test: refresh early with a probability growing as expiry nears.
+
+    ``delta`` is how long the last recomputation took, so expensive keys start
+    refreshing sooner. ``1 - random()`` keeps the log argument in (0, 1].
+    """
+    return now - delta * XFETCH_BETA * math.log(1.0 - random.random()) >= soft_expires_at
+
+
+def _compute_and_store(
+    key: str, token: str, compute: Callable[[], Any], soft_ttl: int, hard_ttl: int
+) -> Any:
+    """Recompute under the lock identified by ``token`` and release it afterwards."""
+    lock_key = f"{key}:lock"
+    try:
+        started = time.monotonic()
+        value = compute()
+        delta = time.monotonic() - started
+        cache.set(key, (value, time.time() + soft_ttl, delta), hard_ttl)
+        return value
+    finally:
+        # Only drop our own lock, not one re-acquired after ours timed out
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def get_or_refresh(
+    key: str,
+    compute: Callable[[], Any],
+    *,
+    soft_ttl: int | None = None,
+    hard_ttl: int | None = None,
+) -> Any:
+    """Return the cached value for ``key``, recomputing it single-flight.
+
+    - Fresh entry: returned as is.
+    - Stale (or XFetch-selected) entry: the worker that wins the lock
+      recomputes; everyone else keeps getting the stale value meanwhile.
+    - No entry: the lock winner computes; others wait briefly for its result
+      and only compute themselves if it does not show up in time.
+    """
+    soft_ttl = dashboard_cache_soft_ttl() if soft_ttl is None else soft_ttl
+    hard_ttl = dashboard_cache_ttl() if hard_ttl is None else hard_ttl
+    lock_key = f"{key}:lock"
+    token = uuid.uuid4().hex
+
+    entry = cache.get(key)
+    if entry is not None:
+        value, soft_expires_at, delta = entry
+        if not _needs_refresh(soft_expires_at, delta, time.time()):
+            return value
+        if not cache.add(lock_key, token, REFRESH_LOCK_TIMEOUT):
+            return value
+        return _compute_and_store(key, token, compute, soft_ttl, hard_ttl)
+
+    if not cache.add(lock_key, token, REFRESH_LOCK_TIMEOUT):
+        deadline = time.monotonic() + MISS_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(MISS_POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+        return compute()
+    return _compute_and_store(key, token, compute, soft_ttl, hard_ttl)
+
+
+def warm_entry(
+    key: str,
+    compute: Callable[[], Any],
+    *,
+    force: bool = False,
+    soft_ttl: int | None = None,
+    hard_ttl: int | None = None,
+) -> bool:
+    """Compute and store ``key`` ahead of demand; return whether it was written.
+
+    Entries still within their soft TTL are kept unless ``force`` is set, and
+    keys another worker is already refreshing are skipped.
+    """
+    soft_ttl = dashboard_cache_soft_ttl() if soft_ttl is None else soft_ttl
+    hard_ttl = dashboard_cache_ttl() if hard_ttl is None else hard_ttl
+    if not force:
+        entry = cache.get(key)
+        if entry is not None and entry[1] > time.time():
+            return False
+    token = uuid.uuid4().hex
+    if not cache.add(f"{key}:lock", token, REFRESH_LOCK_TIMEOUT):
+        return False
+    _compute_and_store(key, token, compute, soft_ttl, hard_ttl)
+    return True
+
+
+def _panel_key(
+    user, panel: str, days: int, selected_course_id: int, granularity: str | None
+) -> tuple[str, int, str]:
+    # Panels that ignore a filter share one entry across all of its values
+    granularity = trend_granularity(days, granularity) if panel in TREND_PANELS else ""
+    days = 0 if panel in DAYLESS_PANELS else days
+    key = dashboard_cache_key(user.id, days, selected_course_id, panel, granularity)
+    return key, days, granularity
+
+
+def cached_panel(
+    user, panel: str, days: int, selected_course_id: int, granularity: str | None = None
+) -> Any:
+    """One dashboard panel behind the versioned, single-flight cache.
+
+    Every panel has its own key, so a slow panel refreshing never holds up
+    the others and cheap ones stay cached on their own schedule.
+    """
+    key, days, granularity = _panel_key(user, panel, days, selected_course_id, granularity)
+    return get_or_refresh(
+        key, lambda: compute_panel(user, panel, days, selected_course_id, granularity)
+    )
+
+
+def warm_panel(
+    user,
+    panel: str,
+    days: int,
+    selected_course_id: int,
+    granularity: str | None = None,
+    *,
+    force: bool = False,
+) -> bool:
+    """Precompute the entry ``cached_panel`` would serve."""
+    key, days, granularity = _panel_key(user, panel, days, selected_course_id, granularity)
+    return warm_entry(
+        key,
+        lambda: compute_panel(user, panel, days, selected_course_id, granularity),
+        force=force,
+    )
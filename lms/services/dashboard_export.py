@@ -0,0 +1,134 @@
+"""Teacher dashboard export rows and sheets, shared by the view and export jobs."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from django.conf import settings
+
+from lms_courses.export_jobs import ExportSource, register_export_builder
+from lms_courses.models import ExportJob
+
+from .dashboard import DashboardSnapshot, compute_dashboard_stats
+
+DEFAULT_DASHBOARD_EXPORT_COURSE_THRESHOLD = 200
+
+
+def dashboard_export_course_threshold() -> int:
+    """Dashboard exports covering more courses than this are built in the background.
+
+    Their output is one row per course, so the row threshold of the other
+    exports does not fit; what grows is the per-course stats work.
+    """
+    return int(
+        getattr(
+            settings,
+            "DASHBOARD_EXPORT_COURSE_THRESHOLD",
+            DEFAULT_DASHBOARD_EXPORT_COURSE_THRESHOLD,
+        )
+    )
+
+
+def dashboard_export_filename(days: int, course_id: int) -> str:
+    """Export file name without extension."""
+    return f"dashboard_stats_d{days}_c{course_id or 'all'}"
+
+
+def _per_course_rows(data: DashboardSnapshot) -> list[list]:
+    return [
+        [
+            row.code,
+            row.title,
+            row.year,
+            row.students_count,
+            row.upcoming_sessions,
+            row.lab_done,
+            row.lab_null,
+            row.fa_sub,
+            row.fa_grd,
+        ]
+        for row in data.per_course
+    ]
+
+
+def dashboard_csv_rows(data: DashboardSnapshot) -> list[list]:
+    return [
+        ["key", "value"],
+        ["active_courses", data.active_courses],
+        ["unique_students", data.unique_students],
+        ["upcoming_labs", data.upcoming_labs],
+        ["lab_grades_done", data.lab_grades_done],
+        ["lab_grades_null", data.lab_grades_null],
+        ["fa_submitted", data.fa_submitted],
+        ["fa_graded", data.fa_graded],
+        ["fa_avg", data.fa_avg or ""],
+        ["overdue_ungraded", data.overdue_ungraded],
+        ["no_attendance_sessions", data.no_attendance_sessions],
+        [],
+        [
+            "course_code",
+            "course_title",
+            "year",
+            "students",
+            "upcoming_sessions",
+            "lab_done",
+            "lab_null",
+            "fa_sub",
+            "fa_grd",
+        ],
+        *_per_course_rows(data),
+    ]
+
+
+def write_dashboard_sheets(wb: Any, data: DashboardSnapshot) -> None:
+    """Append the dashboard export sheets to the write-only workbook ``wb``."""
+    ws1 = wb.create_sheet("Στατιστικά")
+    ws1.append(["Κλειδί", "Τιμή"])
+    for key, val in [
+        ("Ενεργά εξάμηνα", data.active_courses),
+        ("Μοναδικοί φοιτητές", data.unique_students),
+        ("Επερχόμενα labs", data.upcoming_labs),
+        ("Lab ολοκληρωμένες", data.lab_grades_done),
+        ("Lab εκκρεμείς", data.lab_grades_null),
+        ("Final υποβολές", data.fa_submitted),
+        ("Final βαθμολογημένες", data.fa_graded),
+        ("Final μέσος βαθμός", data.fa_avg or ""),
+        ("Καθυστερημένες", data.overdue_ungraded),
+        ("Χωρίς παρουσίες", data.no_attendance_sessions),
+    ]:
+        ws1.append([key, val])
+
+    ws2 = wb.create_sheet("Ανά μάθημα")
+    ws2.append(
+        [
+            "Κωδικός",
+            "Τίτλος",
+            "Έτος",
+            "Φοιτητές",
+            "Επερχ.",
+            "Lab ✓",
+            "Lab εκκρ.",
+            "Final υποβ.",
+            "Final βαθμ.",
+        ]
+    )
+    for r in _per_course_rows(data):
+        ws2.append(r)
+
+    ws3 = wb.create_sheet("Τάση")
+    ws3.append(["Περίοδος", "Μετρήσεις"])
+    for period, v in zip(data.trend_periods, data.attendance_trend):
+        ws3.append([period, v])
+
+
+@register_export_builder(ExportJob.KIND_DASHBOARD)
+def _dashboard_source(job: ExportJob) -> ExportSource:
+    course_id = job.course_semester_id or 0  # type: ignore[attr-defined]
+    data = DashboardSnapshot.from_stats(
+        compute_dashboard_stats(job.owner, job.days, course_id, job.granularity or None)
+    )
+    return ExportSource(
+        dashboard_export_filename(job.days or 0, course_id),
+        lambda: dashboard_csv_rows(data),
+        lambda wb: write_dashboard_sheets(wb, data),
+    )
@@ -0,0 +1,117 @@
+"""Student dashboard figures computed with a fixed number of grouped queries."""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+from django.db.models import Count, OuterRef, Q, QuerySet, Subquery, Sum
+
+from lms_courses.models import (
+    CourseSemester,
+    FinalAssignmentResult,
+    LabParticipation,
+    LabReportGrade,
+    LabSession,
+)
+
+# The student home looks ahead a few weeks at most; the longer ranges are the teacher's
+STUDENT_DASHBOARD_DAYS_OPTIONS = (3, 7, 14, 30)
+
+
+def _grouped(qs: QuerySet, key: str, **aggregates) -> dict[int, dict]:
+    """Run one grouped aggregate over ``qs`` and index the rows by ``key``."""
+    return {row.pop(key): row for row in qs.order_by().values(key).annotate(**aggregates)}
+
+
+def compute_student_dashboard(user, days: int) -> dict:
+    """Return the student home context for ``user`` over the next ``days`` days.
+
+    Every per-course figure comes from one grouped query per source table, so
+    the number of queries stays the same however many courses the student
+    is enrolled in.
+    """
+    today = date.today()
+    soon = today + timedelta(days=days)
+
+    next_session = LabSession.objects.filter(
+        course_semester=OuterRef("pk"), date__gte=today
+    ).order_by("date", "pk")
+    courses = list(
+        CourseSemester.objects.filter(students=user)
+        .select_related("course")
+        .annotate(next_session_id=Subquery(next_session.values("pk")[:1]))
+        .order_by("course__code")
+    )
+    if not courses:
+        return {
+            "courses": [],
+            "per_course": [],
+            "total_courses": 0,
+            "upcoming_labs": 0,
+            "overall_avg_grade": 0,
+        }
+    ids = [cs.pk for cs in courses]
+
+    sessions = _grouped(
+        LabSession.objects.filter(course_semester_id__in=ids),
+        "course_semester_id",
+        total=Count("pk"),
+        upcoming=Count("pk", filter=Q(date__gte=today, date__lte=soon)),
+    )
+    presents = _grouped(
+        LabParticipation.objects.filter(
+            session__course_semester_id__in=ids, student=user, present=True
+        ),
+        "session__course_semester_id",
+        n=Count("pk"),
+    )
+    grades = _grouped(
+        LabReportGrade.objects.filter(
+            lab_report__session__course_semester_id__in=ids, student=user, grade__isnull=False
+        ),
+        "lab_report__session__course_semester_id",
+        graded=Count("pk"),
+        total=Sum("grade"),
+    )
+    fa_results = {
+        row["final_assignment__course_semester_id"]: row
+        for row in FinalAssignmentResult.objects.filter(
+            final_assignment__course_semester_id__in=ids, student=user
+        ).values("final_assignment__course_semester_id", "submitted", "grade")
+    }
+    next_sessions = LabSession.objects.in_bulk(
+        [cs.next_session_id for cs in courses if cs.next_session_id]
+    )
+
+    per_course = []
+    for cs in courses:
+        session_counts = sessions.get(cs.pk, {"total": 0, "upcoming": 0})
+        course_grades = grades.get(cs.pk, {"graded": 0, "total": 0})
+        fa_res = fa_results.get(cs.pk, {})
+        attendance_pct = None
+        if session_counts["total"] > 0:
+            attendance_pct = round(
+                100 * presents.get(cs.pk, {}).get("n", 0) / session_counts["total"]
+            )
+        graded = course_grades["graded"]
+        per_course.append(
+            {
+                "cs": cs,
+                "attendance_pct": attendance_pct,
+                "next_session": next_sessions.get(cs.next_session_id),
+                "graded_labs": graded,
+                "avg_grade": course_grades["total"] / graded if graded else None,
+                "fa_submitted": fa_res.get("submitted", False),
+                "fa_grade": fa_res.get("grade"),
+            }
+        )
+
+    graded_total = sum(g["graded"] for g in grades.values())
+    grade_sum = sum(g["total"] for g in grades.values())
+    return {
+        "courses": courses,
+        "per_course": per_course,
+        "total_courses": len(courses),
+        "upcoming_labs": sum(s["upcoming"] for s in sessions.values()),
+        "overall_avg_grade": round(grade_sum / graded_total, 2) if graded_total else 0,
+    }
@@ -17,6 +17,7 @@ env = environ.Env(
     OIDC_RP_CLIENT_SECRET=(str, ""),
     KEYCLOAK_ADMIN_CLIENT_ID=(str, ""),
     KEYCLOAK_ADMIN_CLIENT_SECRET=(str, ""),
+    CACHE_URL=(str, "locmemcache://"),
 )
 environ.Env.read_env(os.path.join(BASE_DIR, ".env"))
 
@@ -129,3 +130,27 @@ AUTH_USER_MODEL = "lms_users.User"
 LOGIN_URL = "/users/test-login/" if E2E_TEST_LOGIN else "/users/login/"
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/"
+
+# Dashboard versions, Keycloak group ids and the Keycloak circuit breaker must be
+# seen by every worker and management command, so production needs a shared cache:
+# CACHE_URL=rediscache://redis:6379/1, or dbcache://lms_cache after
+# `manage.py createcachetable`. The local-memory default is per process.
+CACHES = {"default": env.cache("CACHE_URL")}
+SHARED_CACHE = not CACHES["default"]["BACKEND"].endswith("LocMemCache")
+
+# Teacher dashboard entries are invalidated by version bumps, so they can live long,
+# but only if every worker sees the bumps; per-process caches keep them short
+DASHBOARD_CACHE_TTL = 6 * 60 * 60 if SHARED_CACHE else 60
+# After this, entries are served stale while one worker refreshes them
+DASHBOARD_CACHE_SOFT_TTL = 15 * 60 if SHARED_CACHE else 30
+
+# Exports estimated above this many rows are built by `manage.py run_export_jobs`
+EXPORT_JOB_ROW_THRESHOLD = 50_000
+# Dashboard exports cost a stats pass per course, so they queue above this many courses
+DASHBOARD_EXPORT_COURSE_THRESHOLD = 200
+# A job still RUNNING this long after it started has lost its worker
+EXPORT_JOB_LEASE = 60 * 60
+# Finished export jobs and their files are deleted after this long
+EXPORT_RETENTION = 7 * 24 * 60 * 60
+# Finished export files; served only through the authenticated download view
+EXPORT_ROOT = BASE_DIR / "var" / "exports"
@@ -0,0 +1,77 @@
+"""Invalidate cached teacher dashboards when the owner's course data changes."""
+
+from __future__ import annotations
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from lms.services.dashboard_cache import invalidate_owner_dashboards
+from lms_courses.models import (
+    Course,
+    CourseSemester,
+    FinalAssignment,
+    FinalAssignmentResult,
+    LabParticipation,
+    LabReportGrade,
+    LabSession,
+)
+from lms_courses.signals import course_data_bulk_changed
+from lms_users.models import User
+
+
+def _owners(**filters):
+    return CourseSemester.objects.filter(**filters).values_list("owner_id", flat=True)
+
+
+# model -> how to find the owners whose dashboards the row feeds
+OWNER_LOOKUPS = {
+    Course: lambda obj: _owners(course=obj.pk),
+    CourseSemester: lambda obj: [obj.owner_id],
+    LabSession: lambda obj: _owners(pk=obj.course_semester_id),
+    FinalAssignment: lambda obj: _owners(pk=obj.course_semester_id),
+    LabParticipation: lambda obj: _owners(sessions=obj.session_id),
+    LabReportGrade: lambda obj: _owners(sessions__report=obj.lab_report_id),
+    FinalAssignmentResult: lambda obj: _owners(final_assignment=obj.final_assignment_id),
+}
+
+
+def _changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_owner_dashboards(OWNER_LOOKUPS[sender](instance))
+
+
+for _model in OWNER_LOOKUPS:
+    post_save.connect(_changed, sender=_model, dispatch_uid=f"dash_save_{_model.__name__}")
+    post_delete.connect(_changed, sender=_model, dispatch_uid=f"dash_delete_{_model.__name__}")
+
+
+@receiver(m2m_changed, sender=CourseSemester.students.through, dispatch_uid="dash_enrollment")
+def _enrollment_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        instance._dash_owners = list(_owners(students=instance))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        invalidate_owner_dashboards([instance.owner_id])
+    elif action == "post_clear":
+        invalidate_owner_dashboards(getattr(instance, "_dash_owners", []))
+    else:
+        invalidate_owner_dashboards(_owners(pk__in=pk_set or []))
+
+
+@receiver(pre_delete, sender=User, dispatch_uid="dash_user_pre_delete")
+def _user_pre_delete(sender, instance, **kwargs):
+    # Enrollment rows vanish with the user without an m2m_changed signal
+    instance._dash_owners = list(_owners(students=instance))
+
+
+@receiver(post_delete, sender=User, dispatch_uid="dash_user_post_delete")
+def _user_post_delete(sender, instance, **kwargs):
+    invalidate_owner_dashboards(getattr(instance, "_dash_owners", []))
+
+
+@receiver(course_data_bulk_changed, dispatch_uid="dash_bulk_changed")
+def _bulk_changed(sender, course_semester_ids, **kwargs):
+    invalidate_owner_dashboards(_owners(pk__in=course_semester_ids))
@@ -0,0 +1,265 @@
+import time
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from lms.checks import check_shared_cache
+from lms.services.dashboard import PANEL_LAYOUT_VERSION
+from lms.services.dashboard_cache import (
+    bump_dashboard_version,
+    dashboard_cache_key,
+    dashboard_version,
+    get_or_refresh,
+)
+from lms_courses.models import (
+    Course,
+    CourseSemester,
+    LabParticipation,
+    LabReportGrade,
+    LabSession,
+)
+from lms_courses.stats import rebuild_stats
+from lms_users.models import Roles, User
+
+
+class TestDashboardCacheVersioning(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.teacher = User.objects.create_user("teach", password="x", role=Roles.TEACHER)
+        self.other = User.objects.create_user("other", password="x", role=Roles.TEACHER)
+        self.s1 = User.objects.create_user("s1", password="x", role=Roles.STUDENT)
+        course = Course.objects.create(code="CS500", title="Cache")
+        self.cs = CourseSemester.objects.create(
+            course=course, year=2025, semester="WINTER", owner=self.teacher
+        )
+        self.cs.students.add(self.s1)
+        self.session = LabSession.objects.create(
+            name="L1",
+            week=1,
+            date=date.today() - timedelta(days=2),
+            course_semester=self.cs,
+        )
+
+    def test_bump_changes_key(self):
+        key = dashboard_cache_key(self.teacher.pk, 7, 0)
+        self.assertEqual(key, dashboard_cache_key(self.teacher.pk, 7, 0))
+        bump_dashboard_version(self.teacher.pk)
+        self.assertNotEqual(key, dashboard_cache_key(self.teacher.pk, 7, 0))
+
+    def test_layout_version_changes_key(self):
+        key = dashboard_cache_key(self.teacher.pk, 7, 0)
+        with mock.patch(
+            "lms.services.dashboard_cache.PANEL_LAYOUT_VERSION", PANEL_LAYOUT_VERSION + 1
+        ):
+            self.assertNotEqual(key, dashboard_cache_key(self.teacher.pk, 7, 0))
+
+    def test_version_survives_eviction_without_reuse(self):
+        before = dashboard_version(self.teacher.pk)
+        cache.delete(f"dash:ver:{self.teacher.pk}")
+        self.assertNotEqual(before, dashboard_version(self.teacher.pk))
+
+    def test_writes_bump_only_the_owner_after_commit(self):
+        mine = dashboard_version(self.teacher.pk)
+        theirs = dashboard_version(self.other.pk)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                LabParticipation.objects.create(session=self.session, student=self.s1, present=True)
+                LabReportGrade.objects.create(
+                    lab_report=self.session.report, student=self.s1, grade=6
+                )
+                # Not visible before commit
+                self.assertEqual(dashboard_version(self.teacher.pk), mine)
+        # One deduplicated callback for the whole transaction
+        self.assertEqual(len(callbacks), 1)
+        self.assertNotEqual(dashboard_version(self.teacher.pk), mine)
+        self.assertEqual(dashboard_version(self.other.pk), theirs)
+
+    def test_enrollment_changes_bump(self):
+        for change in (
+            lambda: self.cs.students.remove(self.s1),
+            lambda: self.s1.enrolled_course_semesters.add(self.cs),
+            lambda: self.s1.enrolled_course_semesters.clear(),
+        ):
+            before = dashboard_version(self.teacher.pk)
+            with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+                change()
+            self.assertNotEqual(dashboard_version(self.teacher.pk), before)
+
+    def assert_bumps(self, change):
+        before = dashboard_version(self.teacher.pk)
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            change()
+        self.assertNotEqual(dashboard_version(self.teacher.pk), before)
+
+    def test_course_rename_bumps(self):
+        course = self.cs.course
+        course.title = "Cache v2"
+        self.assert_bumps(course.save)
+
+    def test_stats_rebuild_bumps(self):
+        self.assert_bumps(lambda: rebuild_stats([self.cs.pk]))
+
+    def test_student_delete_bumps(self):
+        self.assert_bumps(self.s1.delete)
+
+    def test_rolled_back_block_does_not_swallow_later_bumps(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        LabParticipation.objects.create(session=self.session, student=self.s1)
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                before = dashboard_version(self.teacher.pk)
+                LabReportGrade.objects.create(
+                    lab_report=self.session.report, student=self.s1, grade=6
+                )
+        self.assertEqual(len(callbacks), 1)
+        self.assertNotEqual(dashboard_version(self.teacher.pk), before)
+
+    def test_dashboard_reflects_grading_immediately(self):
+        self.client.force_login(self.teacher)
+        resp1 = self.client.get("/teacher/panels/kpis/")
+        self.assertEqual(resp1.context["lab_grades_done"], 0)
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            LabReportGrade.objects.create(lab_report=self.session.report, student=self.s1, grade=9)
+        resp2 = self.client.get("/teacher/panels/kpis/")
+        self.assertEqual(resp2.context["lab_grades_done"], 1)
+
+
+class TestGetOrRefresh(TestCase):
+    KEY = "swr:test"
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return f"value-{self.calls}"
+
+    def store(self, value, soft_in, delta=0.0):
+        cache.set(self.KEY, (value, time.time() + soft_in, delta), 600)
+
+    def test_miss_computes_and_caches(self):
+        self.assertEqual(get_or_refresh(self.KEY, self.compute), "value-1")
+        self.assertEqual(get_or_refresh(self.KEY, self.compute), "value-1")
+        self.assertEqual(self.calls, 1)
+        self.assertIsNone(cache.get(f"{self.KEY}:lock"))
+
+    def test_stale_entry_served_while_another_worker_refreshes(self):
+        self.store("old", soft_in=-1)
+        cache.add(f"{self.KEY}:lock", "other-worker", 30)
+        self.assertEqual(get_or_refresh(self.KEY, self.compute), "old")
+        self.assertEqual(self.calls, 0)
+
+    def test_stale_entry_refreshed_by_lock_winner(self):
+        self.store("old", soft_in=-1)
+        self.assertEqual(get_or_refresh(self.KEY, self.compute), "value-1")
+        self.assertEqual(cache.get(self.KEY)[0], "value-1")
+
+    def test_xfetch_refreshes_expensive_keys_early(self):
+        # 10s left, but the last recompute took 20s and the draw is unlucky
+        self.store("old", soft_in=10, delta=20.0)
+        with mock.patch("lms.services.dashboard_cache.random.random", return_value=0.9):
+            self.assertEqual(get_or_refresh(self.KEY, self.compute), "value-1")
+        # A cheap key with the same draw stays put
+        self.store("cheap", soft_in=10, delta=0.001)
+        with mock.patch("lms.services.dashboard_cache.random.random", return_value=0.9):
+            self.assertEqual(get_or_refresh(self.KEY, self.compute), "cheap")
+
+    def test_miss_waits_for_lock_holder_instead_of_recomputing(self):
+        cache.add(f"{self.KEY}:lock", "other-worker", 30)
+
+        def winner_finishes(_seconds):
+            self.store("from-winner", soft_in=60)
+
+        with mock.patch("lms.services.dashboard_cache.time.sleep", side_effect=winner_finishes):
+            self.assertEqual(get_or_refresh(self.KEY, self.compute), "from-winner")
+        self.assertEqual(self.calls, 0)
+
+    def test_miss_falls_back_to_compute_when_lock_holder_stalls(self):
+        cache.add(f"{self.KEY}:lock", "other-worker", 30)
+        with (
+            mock.patch("lms.services.dashboard_cache.MISS_WAIT_SECONDS", 0.0),
+            mock.patch("lms.services.dashboard_cache.time.sleep"),
+        ):
+            self.assertEqual(get_or_refresh(self.KEY, self.compute), "value-1")
+
+
+class TestSharedCacheCheck(SimpleTestCase):
+    def test_warns_about_long_ttl_on_local_memory_cache(self):
+        with override_settings(DASHBOARD_CACHE_TTL=6 * 60 * 60):
+            self.assertEqual([w.id for w in check_shared_cache(None)], ["lms.W001"])
+        with override_settings(DASHBOARD_CACHE_TTL=60):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_shared_cache_allows_long_ttl(self):
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}
+        with override_settings(CACHES=redis, DASHBOARD_CACHE_TTL=6 * 60 * 60):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class TestWarmDashboardCaches(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # The test cache is local memory; pretend it is the shared production cache
+        patcher = mock.patch(
+            "lms.management.commands.warm_dashboard_caches.cache_is_shared", return_value=True
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.teacher = User.objects.create_user("teach", password="x", role=Roles.TEACHER)
+        User.objects.create_user("idle", password="x", role=Roles.TEACHER)
+        for code in ("CS1", "CS2"):
+            CourseSemester.objects.create(
+                course=Course.objects.create(code=code, title=code),
+                year=2025,
+                semester="WINTER",
+                owner=self.teacher,
+            )
+
+    def warm(self, *args) -> str:
+        out = StringIO()
+        call_command("warm_dashboard_caches", *args, stdout=out)
+        return out.getvalue()
+
+    def test_warms_all_ranges_and_each_course(self):
+        output = self.warm("--batch-size", "1")
+        # All courses: kpis + courses + trend for 6 day ranges, overdue once (19);
+        # each of the 2 courses: all four panels at the default range (8)
+        self.assertIn("teach: warmed 27 in", output)
+        self.assertNotIn("idle", output)
+        self.assertIn("Warmed 27 dashboard cache entries for 1 owner(s)", output)
+
+        self.client.force_login(self.teacher)
+        course = CourseSemester.objects.first().pk
+        with mock.patch("lms.services.dashboard_cache.compute_panel") as compute:
+            resp = self.client.get("/teacher/panels/kpis/?days=30&granularity=week")
+            for panel in ("courses", "trend", "overdue"):
+                self.client.get(f"/teacher/panels/{panel}/?days=3")
+                self.client.get(f"/teacher/panels/{panel}/?course={course}")
+        compute.assert_not_called()
+        self.assertEqual(resp.context["active_courses"], 2)
+
+    def test_fresh_entries_skipped_unless_forced(self):
+        self.warm()
+        self.assertIn("Warmed 0 dashboard", self.warm())
+        self.assertIn("Warmed 27 dashboard", self.warm("--force"))
+
+    def test_refuses_to_warm_a_process_local_cache(self):
+        with mock.patch(
+            "lms.management.commands.warm_dashboard_caches.cache_is_shared", return_value=False
+        ):
+            with self.assertRaisesMessage(CommandError, "set CACHE_URL"):
+                self.warm()
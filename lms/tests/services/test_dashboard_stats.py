@@ -2,15 +2,17 @@ from datetime import date, timedelta
 
 from django.test import TestCase
 
-from lms.services.dashboard import compute_dashboard_stats
+from lms.services.dashboard import activity_trend, compute_dashboard_stats, per_course_stats
 from lms_courses.models import (
     Course,
     CourseSemester,
     FinalAssignment,
+    FinalAssignmentResult,
     LabParticipation,
     LabReportGrade,
     LabSession,
 )
+from lms_courses.stats import rebuild_stats
 from lms_users.models import Roles, User
 
 
@@ -103,8 +105,8 @@ class TestDashboardStatsComputation(TestCase):
         self.assertEqual(data["overdue_ungraded"], 1)
         # Sessions with no attendance: includes sessions without any participations
         self.assertEqual(data["no_attendance_sessions"], 3)
-        # Trend returns 4 numbers
-        self.assertEqual(len(data["attendance_trend"]), 4)
+        # Trend has one bucket per day of the 7-day range
+        self.assertEqual(len(data["attendance_trend"]), 7)
         # Per-course annotations available
         self.assertGreaterEqual(data["per_course"].count(), 2)
 
@@ -116,3 +118,143 @@ class TestDashboardStatsComputation(TestCase):
         self.assertEqual(data["upcoming_labs"], 2)
         # Per-course should have exactly one row
         self.assertEqual(data["per_course"].count(), 1)
+
+    def test_headline_kpis_two_round_trips(self):
+        # All courses: one aggregate query for the counters, one for the trend
+        with self.assertNumQueries(2):
+            data = compute_dashboard_stats(self.teacher, days=7, selected_course_id=0)
+        self.assertEqual(data["fa_avg"], 9)
+        # Selected course adds only the ownership check
+        with self.assertNumQueries(3):
+            compute_dashboard_stats(self.teacher, days=7, selected_course_id=self.cs1.pk)
+
+    def test_trend_buckets_follow_range_and_granularity(self):
+        past = LabSession.objects.create(
+            name="Lp",
+            week=4,
+            date=date.today() - timedelta(days=8),
+            course_semester=self.cs2,
+        )
+        LabReportGrade.objects.create(lab_report=past.report, student=self.s1, grade=5)
+        data = compute_dashboard_stats(self.teacher, days=7, selected_course_id=0)
+        # 8 days ago is outside the 7-day range
+        self.assertEqual(data["attendance_trend"], [0] * 7)
+        data = compute_dashboard_stats(self.teacher, days=14, selected_course_id=0)
+        self.assertEqual(data["attendance_trend"][-9], 1)
+        weekly = compute_dashboard_stats(self.teacher, 30, 0, granularity="week")
+        self.assertEqual(sum(weekly["attendance_trend"]), 1)
+        self.assertEqual(data["lab_grades_done"], 2)
+
+    def test_no_courses_yields_zeroes(self):
+        other = User.objects.create_user("lonely", password="x", role=Roles.TEACHER)
+        data = compute_dashboard_stats(other, days=7, selected_course_id=0)
+        self.assertEqual(data["active_courses"], 0)
+        self.assertEqual(data["unique_students"], 0)
+        self.assertIsNone(data["fa_avg"])
+        self.assertEqual(data["attendance_trend"], [0] * 7)
+
+    def test_activity_trend_any_range_and_granularity(self):
+        cs_qs = CourseSemester.objects.filter(owner=self.teacher)
+        old = LabSession.objects.create(
+            name="Lold", week=9, date=date(2024, 3, 13), course_semester=self.cs2
+        )
+        LabParticipation.objects.create(session=old, student=self.s1, present=True)
+        LabReportGrade.objects.create(lab_report=old.report, student=self.s2, grade=7)
+
+        with self.assertNumQueries(2):  # one range scan per call
+            months = activity_trend(cs_qs, date(2024, 1, 15), date(2024, 4, 2), "month")
+            days = activity_trend(cs_qs, date(2024, 3, 12), date(2024, 3, 14), "day")
+        self.assertEqual(
+            [row["period"] for row in months][::3], [date(2024, 1, 1), date(2024, 4, 1)]
+        )
+        self.assertEqual(
+            [(row["presences"], row["grades_entered"]) for row in months],
+            [(0, 0), (0, 0), (1, 1), (0, 0)],
+        )
+        self.assertEqual([row["presences"] for row in days], [0, 1, 0])
+
+        weeks = activity_trend(cs_qs, date(2024, 3, 13), date(2024, 3, 20))
+        # ISO weeks start on Monday
+        self.assertEqual([row["period"] for row in weeks], [date(2024, 3, 11), date(2024, 3, 18)])
+        self.assertEqual(weeks[0]["grades_entered"], 1)
+        with self.assertRaises(ValueError):
+            activity_trend(cs_qs, date(2024, 1, 1), date(2024, 2, 1), "hour")
+
+
+class TestPerCourseStats(TestCase):
+    """Per-course counters on a seeded dataset large enough to expose join fan-out."""
+
+    STUDENTS = 40
+    SESSIONS = 8
+
+    def setUp(self):
+        self.teacher = User.objects.create_user("owner", password="x", role=Roles.TEACHER)
+        students = User.objects.bulk_create(
+            [User(username=f"st{i:03d}", role=Roles.STUDENT) for i in range(self.STUDENTS)]
+        )
+        self.expected = {}
+        for idx, code in enumerate(("BIG1", "BIG2")):
+            course = Course.objects.create(code=code, title=code)
+            cs = CourseSemester.objects.create(
+                course=course, year=2025, semester="WINTER", owner=self.teacher
+            )
+            roster = students[: self.STUDENTS - 10 * idx]
+            cs.students.add(*roster)
+            done = null = 0
+            for week in range(1, self.SESSIONS + 1):
+                sess = LabSession.objects.create(
+                    name=f"L{week}",
+                    week=week,
+                    date=date.today() + timedelta(days=week),
+                    course_semester=cs,
+                )
+                LabParticipation.objects.bulk_create(
+                    [LabParticipation(session=sess, student=s, present=True) for s in roster]
+                )
+                graded = [
+                    LabReportGrade(
+                        lab_report=sess.report, student=s, grade=None if n % 3 == 0 else 5
+                    )
+                    for n, s in enumerate(roster)
+                ]
+                LabReportGrade.objects.bulk_create(graded)
+                null += sum(1 for g in graded if g.grade is None)
+                done += sum(1 for g in graded if g.grade is not None)
+            fa = FinalAssignment.objects.create(
+                title="FA", max_grade=10, due_date=date.today(), course_semester=cs
+            )
+            fa.results.bulk_create(  # type: ignore[attr-defined]
+                [
+                    FinalAssignmentResult(
+                        final_assignment=fa, student=s, submitted=True, grade=None if n % 2 else 8
+                    )
+                    for n, s in enumerate(roster)
+                ]
+            )
+            self.expected[code] = {
+                "students_count": len(roster),
+                "upcoming_sessions": 7,
+                "lab_done": done,
+                "lab_null": null,
+                "fa_sub": len(roster),
+                "fa_grd": (len(roster) + 1) // 2,
+            }
+        # bulk_create bypasses the stats signals, as any bulk loader would
+        rebuild_stats()
+
+    def test_counts_match_ground_truth(self):
+        cs_qs = CourseSemester.objects.filter(owner=self.teacher)
+        with self.assertNumQueries(1):
+            rows = list(per_course_stats(cs_qs, days=7))
+        self.assertEqual([r.course.code for r in rows], ["BIG1", "BIG2"])
+        for row in rows:
+            actual = {key: getattr(row, key) for key in self.expected[row.course.code]}
+            self.assertEqual(actual, self.expected[row.course.code])
+
+    def test_headline_totals_agree_with_per_course_rows(self):
+        data = compute_dashboard_stats(self.teacher, days=7, selected_course_id=0)
+        rows = list(data["per_course"])
+        self.assertEqual(data["lab_grades_done"], sum(r.lab_done for r in rows))
+        self.assertEqual(data["lab_grades_null"], sum(r.lab_null for r in rows))
+        self.assertEqual(data["fa_submitted"], sum(r.fa_sub for r in rows))
+        self.assertEqual(data["unique_students"], self.STUDENTS)
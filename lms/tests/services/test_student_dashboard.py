@@ -0,0 +1,95 @@
+from datetime import date, timedelta
+
+from django.test import TestCase
+
+from lms.services.student_dashboard import compute_student_dashboard
+from lms_courses.models import (
+    Course,
+    CourseSemester,
+    FinalAssignment,
+    LabParticipation,
+    LabReportGrade,
+    LabSession,
+)
+from lms_users.models import Roles, User
+
+
+class TestStudentDashboard(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user("teach", password="x", role=Roles.TEACHER)
+        self.student = User.objects.create_user("stud", password="x", role=Roles.STUDENT)
+        self.other = User.objects.create_user("other", password="x", role=Roles.STUDENT)
+        self.today = date.today()
+
+    def add_course(self, code: str, sessions: int = 2) -> CourseSemester:
+        cs = CourseSemester.objects.create(
+            course=Course.objects.create(code=code, title=f"{code} title"),
+            year=2025,
+            semester="WINTER",
+            owner=self.teacher,
+        )
+        cs.students.add(self.student, self.other)
+        for week in range(sessions):
+            LabSession.objects.create(
+                name=f"L{week}",
+                week=week + 1,
+                date=self.today + timedelta(days=7 * week - 3),
+                course_semester=cs,
+            )
+        return cs
+
+    def test_per_course_figures(self):
+        cs = self.add_course("CS1", sessions=3)
+        empty = self.add_course("CS0", sessions=0)
+        past, upcoming, later = cs.sessions.order_by("date")  # type: ignore
+        LabParticipation.objects.create(session=past, student=self.student, present=True)
+        LabParticipation.objects.create(session=upcoming, student=self.other, present=True)
+        LabReportGrade.objects.create(lab_report=past.report, student=self.student, grade=6)
+        LabReportGrade.objects.create(lab_report=upcoming.report, student=self.student, grade=9)
+        LabReportGrade.objects.create(lab_report=later.report, student=self.student, grade=None)
+        LabReportGrade.objects.create(lab_report=past.report, student=self.other, grade=1)
+        fa = FinalAssignment.objects.create(
+            title="FA", max_grade=10, due_date=self.today, course_semester=cs
+        )
+        fa.results.create(student=self.student, submitted=True, grade=7)  # type: ignore
+
+        data = compute_student_dashboard(self.student, days=7)
+        self.assertEqual(data["total_courses"], 2)
+        self.assertEqual(data["upcoming_labs"], 1)
+        self.assertEqual(data["overall_avg_grade"], 7.5)
+
+        row_empty, row = data["per_course"]
+        self.assertEqual(row_empty["cs"], empty)
+        self.assertIsNone(row_empty["attendance_pct"])
+        self.assertIsNone(row_empty["next_session"])
+        self.assertIsNone(row_empty["avg_grade"])
+        self.assertFalse(row_empty["fa_submitted"])
+
+        self.assertEqual(row["attendance_pct"], 33)
+        self.assertEqual(row["next_session"], upcoming)
+        self.assertEqual(row["graded_labs"], 2)
+        self.assertEqual(row["avg_grade"], 7.5)
+        self.assertTrue(row["fa_submitted"])
+        self.assertEqual(row["fa_grade"], 7)
+
+    def test_query_budget_independent_of_enrollments(self):
+        self.add_course("CS1")
+        with self.assertNumQueries(6):
+            compute_student_dashboard(self.student, days=7)
+        for n in range(2, 9):
+            cs = self.add_course(f"CS{n}")
+            FinalAssignment.objects.create(
+                title="FA", max_grade=10, due_date=self.today, course_semester=cs
+            ).results.create(  # type: ignore
+                student=self.student, submitted=True
+            )
+        with self.assertNumQueries(6):
+            data = compute_student_dashboard(self.student, days=7)
+        self.assertEqual(data["total_courses"], 8)
+        self.assertTrue(all(row["next_session"] for row in data["per_course"]))
+
+    def test_no_enrollments_single_query(self):
+        with self.assertNumQueries(1):
+            data = compute_student_dashboard(self.student, days=7)
+        self.assertEqual(data["per_course"], [])
+        self.assertEqual(data["overall_avg_grade"], 0)
@@ -1,9 +1,12 @@
+import shutil
+import tempfile
 from datetime import date, timedelta
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
-from lms_courses.models import Course, CourseSemester, LabSession
+from lms_courses.export_jobs import run_export_job
+from lms_courses.models import Course, CourseSemester, ExportJob, LabSession
 from lms_users.models import Roles, User
 
 
@@ -32,7 +35,7 @@ class TestDashboardExports(TestCase):
         resp = self.client.get(url)
         self.assertEqual(resp.status_code, 200)
         self.assertIn("text/csv", resp["Content-Type"])  # type: ignore[index]
-        body = resp.content.decode("utf-8-sig")
+        body = resp.getvalue().decode("utf-8-sig")
         # Headers and some keys
         self.assertIn("key,value", body)
         self.assertIn("active_courses", body)
@@ -48,7 +51,7 @@ class TestDashboardExports(TestCase):
             resp["Content-Type"],
         )  # type: ignore[index]
         # Basic sanity: non-empty binary and filename disposition
-        self.assertGreater(len(resp.content), 100)  # binary workbook should be >100 bytes
+        self.assertGreater(len(resp.getvalue()), 100)  # binary workbook should be >100 bytes
         self.assertIn(
             "attachment; filename=dashboard_stats_",
             resp["Content-Disposition"],
@@ -61,3 +64,45 @@ class TestDashboardExports(TestCase):
         url = reverse("teacher_export_dashboard")
         resp = self.client.get(url)
         self.assertEqual(resp.status_code, 403)
+
+    def test_export_dashboard_switches_to_job_above_threshold(self):
+        export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_root, ignore_errors=True)
+        url = reverse("teacher_export_dashboard")
+        with override_settings(DASHBOARD_EXPORT_COURSE_THRESHOLD=0, EXPORT_ROOT=export_root):
+            resp = self.client.get(url, {"days": 14, "course": self.cs1.pk})
+            job = ExportJob.objects.get()
+            self.assertRedirects(
+                resp, reverse("lms_courses_teacher:export_job_detail", args=[job.pk])
+            )
+            self.assertEqual((job.kind, job.days, job.course_semester), ("dashboard", 14, self.cs1))
+            self.assertEqual(job.granularity, "day")
+
+            self.assertTrue(run_export_job(job))
+            job.refresh_from_db()
+            self.assertEqual(job.status, ExportJob.DONE)
+            self.assertTrue(job.file.name.endswith(f"dashboard_stats_d14_c{self.cs1.pk}.csv"))
+            with job.file.open("rb") as f:
+                body = f.read().decode("utf-8-sig")
+        self.assertIn("course_code,course_title,year,students", body)
+        self.assertIn("CSX", body)
+
+    def test_export_job_keeps_the_trend_granularity(self):
+        from openpyxl import load_workbook
+
+        export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_root, ignore_errors=True)
+        url = reverse("teacher_export_dashboard")
+        params = {"days": 30, "granularity": "week", "format": "xlsx"}
+        with override_settings(DASHBOARD_EXPORT_COURSE_THRESHOLD=0, EXPORT_ROOT=export_root):
+            self.client.get(url, params)
+            job = ExportJob.objects.get()
+            self.assertEqual(job.granularity, "week")
+            self.assertTrue(run_export_job(job))
+            job.refresh_from_db()
+            with job.file.open("rb") as f:
+                rows = list(load_workbook(f)["Τάση"].iter_rows(values_only=True))
+        periods = [row[0].date() for row in rows[1:]]
+        self.assertTrue(all(p.weekday() == 0 for p in periods))  # weeks start on Monday
+        self.assertEqual(periods, sorted(periods))
+        self.assertLessEqual(periods[0], date.today() - timedelta(days=29))
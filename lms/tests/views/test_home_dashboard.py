@@ -1,9 +1,11 @@
 from datetime import date, timedelta
+from unittest import mock
 
 from django.core.cache import cache
 from django.test import TestCase
 
-from lms_courses.models import Course, CourseSemester, LabSession
+from lms.services.dashboard_cache import dashboard_cache_key
+from lms_courses.models import Course, CourseSemester, LabReportGrade, LabSession
 from lms_users.models import Roles, User
 
 
@@ -11,23 +13,100 @@ class TestHomeDashboard(TestCase):
     def setUp(self):
         self.teacher = User.objects.create_user(username="teach", password="x", role=Roles.TEACHER)
         self.client.login(username="teach", password="x")
+        self.addCleanup(cache.clear)
+
+    def panel(self, name, query=""):
+        return self.client.get(f"/teacher/panels/{name}/{query}")
 
     def test_dashboard_renders_for_teacher(self):
-        # No data, but the stat cards should render
         # Teacher visiting '/' will be redirected to teacher_home
         resp = self.client.get("/", follow=True)
         self.assertEqual(resp.status_code, 200)
+        for name in ("kpis", "trend", "overdue", "courses"):
+            self.assertContains(
+                resp, f'data-panel-url="/teacher/panels/{name}/?days=7&granularity=day"'
+            )
+        # No data, but the stat cards should render in their panel
+        resp = self.panel("kpis")
         self.assertContains(resp, 'data-testid="stat-active-courses"')
         self.assertContains(resp, 'data-testid="stat-unique-students"')
         self.assertContains(resp, 'data-testid="stat-upcoming-labs"')
 
+    def test_shell_does_not_compute_panels(self):
+        Course.objects.create(code="CS100", title="Intro")
+        with mock.patch("lms.services.dashboard_cache.compute_panel") as compute:
+            resp = self.client.get("/teacher/")
+        self.assertEqual(resp.status_code, 200)
+        compute.assert_not_called()
+
     def test_course_rows_present(self):
         c = Course.objects.create(code="CS100", title="Intro")
         CourseSemester.objects.create(course=c, year=2025, semester="WINTER", owner=self.teacher)
-        resp = self.client.get("/", follow=True)
-        self.assertContains(resp, "CS100")
+        resp = self.panel("courses")
+        self.assertContains(resp, '<td class="px-4 py-2">CS100</td>', html=False)
         self.assertContains(resp, "Intro")
 
+    def test_unknown_panel_404(self):
+        self.assertEqual(self.panel("nope").status_code, 404)
+
+    def test_panels_require_teacher(self):
+        self.client.logout()
+        User.objects.create_user(username="stud2", password="x", role=Roles.STUDENT)
+        self.client.login(username="stud2", password="x")
+        self.assertEqual(self.panel("kpis").status_code, 403)
+
+    def test_trend_and_overdue_panels(self):
+        cache.clear()
+        s1 = User.objects.create_user(username="s1", password="x", role=Roles.STUDENT)
+        cs = CourseSemester.objects.create(
+            course=Course.objects.create(code="CS110", title="Late"),
+            year=2025,
+            semester="WINTER",
+            owner=self.teacher,
+        )
+        late = LabSession.objects.create(
+            name="Late lab", week=1, date=date.today() - timedelta(days=10), course_semester=cs
+        )
+        LabReportGrade.objects.create(lab_report=late.report, student=s1, grade=None)
+        recent = LabSession.objects.create(
+            name="Recent", week=2, date=date.today(), course_semester=cs
+        )
+        LabReportGrade.objects.create(lab_report=recent.report, student=s1, grade=4)
+
+        resp = self.panel("overdue")
+        self.assertContains(resp, "CS110 — Late lab")
+        self.assertContains(resp, f"/teacher/courses/{cs.pk}/sessions/{late.pk}/manage/")
+        self.assertEqual(resp.context["overdue"][0].ungraded, 1)
+
+        # The default 7-day range is bucketed per day, today last
+        resp = self.panel("trend")
+        trend = resp.context["trend"]
+        self.assertEqual(len(trend), 7)
+        self.assertEqual(trend[-1]["grades_entered"], 1)
+
+        resp = self.panel("trend", "?days=30&granularity=week")
+        self.assertEqual(resp.context["filter_granularity"], "week")
+        self.assertEqual(resp.context["trend"][-1]["grades_entered"], 1)
+        # The KPI sparkline uses the same buckets as the panel
+        kpis = self.panel("kpis", "?days=30&granularity=week").context["attendance_trend"]
+        self.assertEqual(kpis, [row["grades_entered"] for row in resp.context["trend"]])
+
+        # An unknown granularity falls back to the range's default
+        resp = self.panel("trend", "?days=365&granularity=hour")
+        self.assertEqual(resp.context["filter_granularity"], "month")
+
+    def test_panels_cached_on_separate_keys(self):
+        cache.clear()
+        self.panel("kpis", "?days=3")
+        self.panel("trend", "?days=3")
+        self.panel("overdue", "?days=3")
+        owner = self.teacher.pk
+        self.assertIsNotNone(cache.get(dashboard_cache_key(owner, 3, 0, "kpis", "day")))
+        self.assertIsNone(cache.get(dashboard_cache_key(owner, 3, 0, panel="courses")))
+        self.assertIsNotNone(cache.get(dashboard_cache_key(owner, 3, 0, "trend", "day")))
+        # Overdue sessions ignore both filters and share one entry
+        self.assertIsNotNone(cache.get(dashboard_cache_key(owner, 0, 0, panel="overdue")))
+
     def test_filters_and_caching(self):
         cache.clear()
         # Two courses, only one has a lab in the next 3 days
@@ -56,19 +135,23 @@ class TestHomeDashboard(TestCase):
         )
 
         # First request computes and caches
-        resp1 = self.client.get(f"/teacher/?days=3&course={cs1.pk}", follow=True)
+        resp1 = self.panel("kpis", f"?days=3&course={cs1.pk}")
         self.assertEqual(resp1.status_code, 200)
         # Upcoming labs should count only cs1 within 3 days
         self.assertIn("upcoming_labs", resp1.context)
         self.assertEqual(resp1.context["upcoming_labs"], 1)
         # Only one course row due to filter
-        content1 = resp1.content.decode("utf-8")
+        content1 = self.panel("courses", f"?days=3&course={cs1.pk}").content.decode("utf-8")
         self.assertIn("CS101", content1)
-        # Ensure CS102 is not present as a table cell (it will still appear in the filter dropdown)
-        self.assertNotIn('<td class="px-4 py-2">CS102</td>', content1)
+        self.assertNotIn("CS102", content1)
+        # Both courses stay in the shell's filter dropdown
+        shell = self.client.get(f"/teacher/?days=3&course={cs1.pk}").content.decode("utf-8")
+        self.assertIn("CS102 — DB @ 2025", shell)
 
         # Second request hits cache branch
-        resp2 = self.client.get(f"/teacher/?days=3&course={cs1.pk}", follow=True)
+        with mock.patch("lms.services.dashboard_cache.compute_panel") as compute:
+            resp2 = self.panel("kpis", f"?days=3&course={cs1.pk}")
+        compute.assert_not_called()
         self.assertEqual(resp2.status_code, 200)
         self.assertEqual(resp2.context["upcoming_labs"], 1)
 
@@ -92,7 +175,7 @@ class TestHomeDashboard(TestCase):
         c2 = Course.objects.create(code="CS202", title="Physics")
         CourseSemester.objects.create(course=c1, year=2025, semester="WINTER", owner=self.teacher)
         CourseSemester.objects.create(course=c2, year=2025, semester="WINTER", owner=self.teacher)
-        resp = self.client.get("/?course=999999&days=7", follow=True)
+        resp = self.panel("courses", "?course=999999&days=7")
         content = resp.content.decode("utf-8")
         self.assertIn("CS201", content)
         self.assertIn("CS202", content)
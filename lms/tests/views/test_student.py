@@ -42,6 +42,11 @@ class TestStudentHome(TestCase):
         self.assertContains(resp, "Student Course")
         self.assertIn("per_course", resp.context)
 
+    def test_student_home_offers_only_the_student_day_ranges(self):
+        resp = self.client.get(reverse("student_home"), {"days": 90})
+        self.assertEqual(resp.context["filter_days"], 7)
+        self.assertEqual(resp.context["filter_days_options"], [3, 7, 14, 30])
+
     def test_student_home_forbidden_for_teacher(self):
         self.client.logout()
         self.client.login(username="teach", password="x")
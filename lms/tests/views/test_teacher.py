@@ -143,6 +143,7 @@ class TestLmsViewsTeacher(TestCase):
             title = "LMS T"
 
         class FakeCS:
+            id = 1
             course = FakeCourse()
             year = 2025
             students_count = 1
@@ -174,7 +175,7 @@ class TestLmsViewsTeacher(TestCase):
                 pass
 
         class DummyWB:
-            def __init__(self):
+            def __init__(self, write_only=False):
                 self.active = DummyWS()
 
             def create_sheet(self, _name):
@@ -214,6 +215,7 @@ class TestLmsViewsTeacher(TestCase):
             title = "Title"
 
         class FakeCS:
+            id = 1
             course = FakeCourse()
             year = 2025
             students_count = 2
@@ -245,7 +247,7 @@ class TestLmsViewsTeacher(TestCase):
             )
             resp = teacher_export_dashboard(req)
             self.assertEqual(resp.status_code, 200)
-            body = resp.content.decode("utf-8-sig")
+            body = resp.getvalue().decode("utf-8-sig")
             self.assertIn("key,value", body)
             self.assertIn("course_code,course_title,year,students", body)
             self.assertIn("CSXYZ,Title,2025,2", body)
@@ -293,7 +295,7 @@ class TestLmsViewsTeacher(TestCase):
                 pass
 
         class DummyWB:
-            def __init__(self):
+            def __init__(self, write_only=False):
                 self.active = DummyWS()
 
             def create_sheet(self, _name):
@@ -359,7 +361,7 @@ class TestLmsViewsTeacher(TestCase):
                 pass
 
         class DummyWB:
-            def __init__(self):
+            def __init__(self, write_only=False):
                 self.active = DummyWS()
 
             def create_sheet(self, _name):
@@ -441,7 +443,7 @@ class TestLmsViewsTeacher(TestCase):
                 pass
 
         class DummyWB:
-            def __init__(self):
+            def __init__(self, write_only=False):
                 self.active = DummyWS()
 
             def create_sheet(self, _name):
@@ -4,7 +4,13 @@ from django.urls import include, path
 
 from lms_courses import urls as course_urls
 
-from .views import home, student_home, teacher_export_dashboard, teacher_home
+from .views import (
+    home,
+    student_home,
+    teacher_dashboard_panel,
+    teacher_export_dashboard,
+    teacher_home,
+)
 
 urlpatterns = [
     path("oidc/", include("mozilla_django_oidc.urls")),
@@ -23,6 +29,7 @@ urlpatterns = [
         ),
     ),
     path("teacher/", teacher_home, name="teacher_home"),
+    path("teacher/panels/<slug:panel>/", teacher_dashboard_panel, name="teacher_dashboard_panel"),
     path("student/", student_home, name="student_home"),
     path("export", teacher_export_dashboard, name="teacher_export_dashboard"),
     path("", home, name="home"),
@@ -1,9 +1,10 @@
 from .base import home
 from .student import student_home
-from .teacher import teacher_export_dashboard, teacher_home
+from .teacher import teacher_dashboard_panel, teacher_export_dashboard, teacher_home
 
 __all__ = [
     "teacher_home",
+    "teacher_dashboard_panel",
     "teacher_export_dashboard",
     "student_home",
     "home",
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
-from datetime import date, timedelta
-
-from django.db.models import Avg
 from django.http import HttpResponse
 from django.shortcuts import render
 
+from lms.services.dashboard import DEFAULT_DASHBOARD_DAYS
+from lms.services.student_dashboard import (
+    STUDENT_DASHBOARD_DAYS_OPTIONS,
+    compute_student_dashboard,
+)
 from lms_users.decorators import role_required
 from lms_users.permissions import Roles
 
@@ -18,88 +20,18 @@ def student_home(request):
         return HttpResponse(status=403)
 
     try:
-        days = int(request.GET.get("days", 7))
-    except Exception:
-        days = 7
-    if days not in (3, 7, 14, 30):
-        days = 7
-
-    today = date.today()
-    soon = today + timedelta(days=days)
-
-    from lms_courses.models import (
-        CourseSemester,
-        FinalAssignmentResult,
-        LabParticipation,
-        LabReportGrade,
-        LabSession,
-    )
-
-    courses = list(
-        CourseSemester.objects.filter(students=user)
-        .select_related("course")
-        .order_by("course__code")
-    )
-
-    upcoming_count = LabSession.objects.filter(
-        course_semester__in=courses, date__gte=today, date__lte=soon
-    ).count()
-
-    grades_qs = LabReportGrade.objects.filter(
-        student=user, lab_report__session__course_semester__in=courses
-    )
-    try:
-        overall_avg = round(
-            grades_qs.exclude(grade__isnull=True).aggregate(avg=Avg("grade"))["avg"] or 0,
-            2,
-        )
+        days = int(request.GET.get("days", DEFAULT_DASHBOARD_DAYS))
     except Exception:
-        overall_avg = None
-
-    per_course = []
-    for cs in courses:
-        sessions_total = LabSession.objects.filter(course_semester=cs).count()
-        presents = LabParticipation.objects.filter(
-            session__course_semester=cs, student=user, present=True
-        ).count()
-        attendance_pct = None
-        if sessions_total > 0:
-            attendance_pct = round(100 * presents / sessions_total)
-
-        next_session = (
-            LabSession.objects.filter(course_semester=cs, date__gte=today).order_by("date").first()
-        )
-
-        course_grades = LabReportGrade.objects.filter(
-            lab_report__session__course_semester=cs, student=user
-        )
-        graded = course_grades.exclude(grade__isnull=True).count()
-        avg_grade = course_grades.exclude(grade__isnull=True).aggregate(avg=Avg("grade"))["avg"]
-
-        fa_res = FinalAssignmentResult.objects.filter(
-            final_assignment__course_semester=cs, student=user
-        ).first()
+        days = DEFAULT_DASHBOARD_DAYS
+    if days not in STUDENT_DASHBOARD_DAYS_OPTIONS:
+        days = DEFAULT_DASHBOARD_DAYS
 
-        per_course.append(
-            {
-                "cs": cs,
-                "attendance_pct": attendance_pct,
-                "next_session": next_session,
-                "graded_labs": graded,
-                "avg_grade": avg_grade,
-                "fa_submitted": getattr(fa_res, "submitted", False),
-                "fa_grade": getattr(fa_res, "grade", None),
-            }
-        )
+    computed = compute_student_dashboard(user, days)
 
     ctx = {
         "is_student": True,
-        "courses": courses,
-        "per_course": per_course,
-        "total_courses": len(courses),
-        "upcoming_labs": upcoming_count,
-        "overall_avg_grade": overall_avg,
+        **computed,
         "filter_days": days,
-        "filter_days_options": [3, 7, 14, 30],
+        "filter_days_options": list(STUDENT_DASHBOARD_DAYS_OPTIONS),
     }
     return render(request, "lms_courses/student/home.html", ctx)
@@ -3,6 +3,7 @@ from django.contrib import admin
 from .models import (
     Course,
     CourseSemester,
+    ExportJob,
     FinalAssignment,
     FinalAssignmentResult,
     LabParticipation,
@@ -57,6 +58,17 @@ class LabSessionAdmin(admin.ModelAdmin):
     autocomplete_fields = ("course_semester",)
     readonly_fields = ("present_count", "graded_count")
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_counts()
+
+    @admin.display(description="present count", ordering="present_total")
+    def present_count(self, obj):
+        return obj.present_count
+
+    @admin.display(description="graded count", ordering="graded_total")
+    def graded_count(self, obj):
+        return obj.graded_count
+
 
 class LabSessionInline(admin.TabularInline):
     model = LabSession
@@ -88,10 +100,13 @@ class CourseSemesterAdmin(admin.ModelAdmin):
     inlines = [FinalAssignmentInline, LabSessionInline]
     autocomplete_fields = ("course", "owner")
     filter_horizontal = ("students",)
+    list_select_related = ("course", "owner", "stats")
 
     @admin.display(description="Students")
     def students_count(self, obj: CourseSemester) -> int:  # type: ignore[name-defined]
-        return obj.students.count()
+        # Read the pre-aggregated counter; fall back to counting if never built
+        stats = getattr(obj, "stats", None)
+        return stats.students if stats is not None else obj.students.count()
 
 
 class FinalAssignmentResultInline(admin.TabularInline):
@@ -174,3 +189,11 @@ class FinalAssignmentResultAdmin(admin.ModelAdmin):
         "final_assignment__course_semester__course__code",
     )
     autocomplete_fields = ("final_assignment", "student")
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ("pk", "owner", "kind", "fmt", "status", "rows_done", "created_at")
+    list_filter = ("status", "kind", "fmt")
+    search_fields = ("owner__username", "course_semester__course__code")
+    readonly_fields = ("etag", "created_at", "started_at", "finished_at")
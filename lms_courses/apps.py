@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LmsCoursesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "lms_courses"
+
+    def ready(self):
+        from . import signals  # noqa: F401
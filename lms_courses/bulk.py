@@ -0,0 +1,220 @@
+"""Batched writers for the teacher grading grids.
+
+A writer loads the existing rows with one query, diffs them against the
+submitted values in memory and applies inserts and updates in bulk inside a
+single transaction, so its query count does not grow with the cohort size.
+Bulk writes send no model signals; writers pass the rows they wrote to
+``bulk_changed`` instead, which applies the same counter deltas. When
+another request inserted one of the rows in the meantime its previous state
+is unknown, and the writer has the semester's counters rebuilt instead.
+"""
+
+from __future__ import annotations
+
+from typing import Mapping, NamedTuple, TypedDict
+
+from django.db import transaction
+
+from .models import (
+    FinalAssignment,
+    FinalAssignmentResult,
+    LabParticipation,
+    LabReport,
+    LabReportGrade,
+    LabSession,
+)
+from .signals import bulk_changed
+
+
+class BulkWriteResult(NamedTuple):
+    created: int
+    updated: int
+    unchanged: int
+
+
+class GridCell(TypedDict, total=False):
+    """Changed values of one student's row in the lab session grid."""
+
+    present: bool
+    grade: int | None
+
+
+def clamp_grade(grade: int | None, max_grade: int) -> int | None:
+    """Clamp ``grade`` into ``[0, max_grade]``; ``None`` means ungraded."""
+    if grade is None:
+        return None
+    return min(max(grade, 0), max_grade)
+
+
+def _insert(
+    model, rows: list, defaults: set[int], unique_fields: list[str], update_fields: list[str]
+) -> set[int]:
+    """Insert new grid rows, resolving conflicts with rows inserted concurrently.
+
+    ``rows`` were missing when the writer loaded the grid; their keys are
+    selected again here, and the students whose row another request inserted
+    meanwhile are returned. Rows carrying submitted values overwrite such a
+    row; rows only holding the model default (students in ``defaults``) keep it.
+    """
+    if not rows:
+        return set()
+    parent = unique_fields[0]
+    taken = set(
+        model.objects.filter(
+            **{parent: getattr(rows[0], f"{parent}_id")},
+            student_id__in=[r.student_id for r in rows],
+        ).values_list("student_id", flat=True)
+    )
+    submitted = [r for r in rows if r.student_id not in defaults]
+    if submitted:
+        model.objects.bulk_create(
+            submitted,
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=update_fields,
+        )
+    fresh_defaults = [r for r in rows if r.student_id in defaults and r.student_id not in taken]
+    if fresh_defaults:
+        model.objects.bulk_create(fresh_defaults, ignore_conflicts=True)
+    return taken
+
+
+def write_final_assignment_results(
+    fa: FinalAssignment, results: Mapping[int, tuple[bool, int | None]]
+) -> BulkWriteResult:
+    """Upsert ``{student_id: (submitted, grade)}`` for ``fa``; grades are clamped."""
+    with transaction.atomic():
+        existing = {
+            r.student_id: r  # type: ignore[attr-defined]
+            for r in FinalAssignmentResult.objects.filter(final_assignment=fa)
+        }
+        new, changed = [], []
+        for student_id, (submitted, grade) in results.items():
+            grade = clamp_grade(grade, fa.max_grade)
+            row = existing.get(student_id)
+            if row is None:
+                new.append(
+                    FinalAssignmentResult(
+                        final_assignment=fa, student_id=student_id, submitted=submitted, grade=grade
+                    )
+                )
+            elif (row.submitted, row.grade) != (submitted, grade):
+                row.submitted, row.grade = submitted, grade
+                changed.append(row)
+
+        # Upsert, so a row inserted concurrently is updated instead of failing
+        taken = _insert(
+            FinalAssignmentResult,
+            new,
+            set(),
+            ["final_assignment", "student"],
+            ["submitted", "grade"],
+        )
+        if changed:
+            FinalAssignmentResult.objects.bulk_update(changed, ["submitted", "grade"])
+        cs_ids = [fa.course_semester_id]  # type: ignore[attr-defined]
+        if taken:
+            # The concurrent rows' previous values are unknown, so no delta applies
+            bulk_changed(cs_ids)
+        elif new or changed:
+            bulk_changed(cs_ids, created=new, updated=changed)
+    created = len(new) - len(taken)
+    updated = len(changed) + len(taken)
+    return BulkWriteResult(created, updated, len(results) - created - updated)
+
+
+def write_lab_session_grid(
+    session: LabSession, report: LabReport | None, cells: Mapping[int, GridCell]
+) -> BulkWriteResult:
+    """Upsert attendance and report grades for the students in ``cells``.
+
+    Only the keys present in a cell are written, so callers can send just the
+    values that changed; rows created for a missing key get the model default,
+    which never overwrites a row another request inserted meanwhile.
+    Students not in ``cells`` are left untouched. Counts are per row written
+    (one participation and one grade row per student). Without a ``report``
+    the session's default report is created in the same transaction.
+    """
+    with transaction.atomic():
+        if report is None:
+            report, _ = LabReport.objects.get_or_create(
+                session=session,
+                defaults={
+                    "title": f"Report: {session.name}",
+                    "max_grade": 10,
+                    "due_date": session.date,
+                },
+            )
+        ids = list(cells)
+        parts = {
+            p.student_id: p  # type: ignore[attr-defined]
+            for p in LabParticipation.objects.filter(session=session, student_id__in=ids)
+        }
+        grades = {
+            g.student_id: g  # type: ignore[attr-defined]
+            for g in LabReportGrade.objects.filter(lab_report=report, student_id__in=ids)
+        }
+        new_parts, changed_parts, new_grades, changed_grades = [], [], [], []
+        # Students whose new row only carries the model default
+        default_parts: set[int] = set()
+        default_grades: set[int] = set()
+        unchanged = 0
+        for student_id, cell in cells.items():
+            present = cell.get("present")
+            part = parts.get(student_id)
+            if part is None:
+                new_parts.append(
+                    LabParticipation(session=session, student_id=student_id, present=bool(present))
+                )
+                if present is None:
+                    default_parts.add(student_id)
+            elif present is not None and part.present != present:
+                part.present = present
+                changed_parts.append(part)
+            else:
+                unchanged += 1
+
+            grade = clamp_grade(cell.get("grade"), report.max_grade)
+            gr = grades.get(student_id)
+            if gr is None:
+                new_grades.append(
+                    LabReportGrade(lab_report=report, student_id=student_id, grade=grade)
+                )
+                if "grade" not in cell:
+                    default_grades.add(student_id)
+            elif "grade" in cell and gr.grade != grade:
+                gr.grade = grade
+                changed_grades.append(gr)
+            else:
+                unchanged += 1
+
+        taken_parts = _insert(
+            LabParticipation, new_parts, default_parts, ["session", "student"], ["present"]
+        )
+        taken_grades = _insert(
+            LabReportGrade, new_grades, default_grades, ["lab_report", "student"], ["grade"]
+        )
+        if changed_parts:
+            LabParticipation.objects.bulk_update(changed_parts, ["present"])
+        if changed_grades:
+            LabReportGrade.objects.bulk_update(changed_grades, ["grade"])
+        cs_ids = [session.course_semester_id]  # type: ignore[attr-defined]
+        if taken_parts or taken_grades:
+            # The concurrent rows' previous values are unknown, so no delta applies
+            bulk_changed(cs_ids)
+        elif new_parts or new_grades or changed_parts or changed_grades:
+            bulk_changed(
+                cs_ids,
+                created=[*new_parts, *new_grades],
+                updated=[*changed_parts, *changed_grades],
+            )
+    # A concurrent row counts as updated when this write overwrote it
+    created = len(new_parts) + len(new_grades) - len(taken_parts) - len(taken_grades)
+    updated = (
+        len(changed_parts)
+        + len(changed_grades)
+        + len(taken_parts - default_parts)
+        + len(taken_grades - default_grades)
+    )
+    unchanged += len(taken_parts & default_parts) + len(taken_grades & default_grades)
+    return BulkWriteResult(created, updated, unchanged)
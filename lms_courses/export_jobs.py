@@ -0,0 +1,272 @@
+"""Background export jobs.
+
+Exports estimated above ``EXPORT_JOB_ROW_THRESHOLD`` rows are not built in
+the request: the view queues an ``ExportJob`` and redirects to its status
+page, and ``manage.py run_export_jobs`` builds the file into local storage.
+Each export kind registers a builder returning an ``ExportSource``; the
+runner writes it as CSV or XLSX and records progress as rows are written.
+A finished file is reused for identical requests while its ETag still
+matches the data (see ``finished_export``). A job left RUNNING past
+``EXPORT_JOB_LEASE`` seconds is taken to have lost its worker and is failed
+by ``fail_stale_jobs``; finished jobs and their files are deleted after
+``EXPORT_RETENTION`` seconds by ``purge_expired_exports``.
+"""
+
+from __future__ import annotations
+
+import logging
+import tempfile
+from datetime import timedelta
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Sequence
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Q
+from django.utils import timezone
+
+from .exports import (
+    course_semester_csv_rows,
+    course_semester_fingerprint,
+    gradebook_rows,
+    iter_csv,
+    write_course_semester_sheets,
+    write_gradebook_sheet,
+)
+from .models import CourseSemester, ExportJob
+from .stats import stats_for
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXPORT_JOB_ROW_THRESHOLD = 50_000
+# A RUNNING job older than this has lost its worker
+DEFAULT_EXPORT_JOB_LEASE = 60 * 60
+DEFAULT_EXPORT_RETENTION = 7 * 24 * 60 * 60
+# Progress is written to the job row once per this many rows
+PROGRESS_EVERY = 5000
+
+
+class ExportSource(NamedTuple):
+    """What a builder produces for one job; the runner picks by ``job.fmt``."""
+
+    filename: str  # without extension
+    rows: Callable[[], Iterable[Sequence]]
+    fill_workbook: Callable[[Any], None]
+    etag: str = ""  # fingerprint of the exported data, taken before it is read
+
+
+ExportBuilder = Callable[[ExportJob], ExportSource]
+_BUILDERS: dict[str, ExportBuilder] = {}
+
+
+def register_export_builder(kind: str) -> Callable[[ExportBuilder], ExportBuilder]:
+    def decorator(builder: ExportBuilder) -> ExportBuilder:
+        _BUILDERS[kind] = builder
+        return builder
+
+    return decorator
+
+
+def export_job_row_threshold() -> int:
+    return int(getattr(settings, "EXPORT_JOB_ROW_THRESHOLD", DEFAULT_EXPORT_JOB_ROW_THRESHOLD))
+
+
+def export_job_lease() -> int:
+    return int(getattr(settings, "EXPORT_JOB_LEASE", DEFAULT_EXPORT_JOB_LEASE))
+
+
+def export_retention() -> int:
+    return int(getattr(settings, "EXPORT_RETENTION", DEFAULT_EXPORT_RETENTION))
+
+
+def _live_jobs():
+    """PENDING jobs and RUNNING jobs still within their lease."""
+    lease_start = timezone.now() - timedelta(seconds=export_job_lease())
+    return ExportJob.objects.filter(
+        Q(status=ExportJob.PENDING) | Q(status=ExportJob.RUNNING, started_at__gte=lease_start)
+    )
+
+
+def xlsx_available() -> bool:
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def course_semester_export_rows(cs: CourseSemester) -> int:
+    """Estimate the course semester export size from its stats row, without scanning."""
+    stats = stats_for(cs)
+    # One participation row and one grade row per graded slot, one result per student
+    return 2 * (stats.lab_graded + stats.lab_ungraded) + stats.students
+
+
+def enqueue_export(
+    owner,
+    kind: str,
+    fmt: str,
+    *,
+    course_semester: CourseSemester | None = None,
+    days: int | None = None,
+    granularity: str = "",
+    rows_total: int = 0,
+) -> ExportJob:
+    """Queue an export, reusing an identical one that is queued or still being built."""
+    fields = dict(
+        owner=owner,
+        kind=kind,
+        fmt=fmt,
+        course_semester=course_semester,
+        days=days,
+        granularity=granularity,
+    )
+    job = _live_jobs().filter(**fields).first()
+    if job is None:
+        job = ExportJob.objects.create(rows_total=rows_total, **fields)
+    return job
+
+
+def finished_export(
+    owner, kind: str, fmt: str, course_semester: CourseSemester, etag: str
+) -> ExportJob | None:
+    """Return the latest finished export of exactly this data, if its file is still stored."""
+    job = (
+        ExportJob.objects.filter(
+            owner=owner,
+            kind=kind,
+            fmt=fmt,
+            course_semester=course_semester,
+            status=ExportJob.DONE,
+            etag=etag,
+        )
+        .order_by("-finished_at", "-pk")
+        .first()
+    )
+    if job is None or not job.file or not job.file.storage.exists(job.file.name):
+        return None
+    return job
+
+
+class _Progress:
+    """Counts written rows and flushes the count to the job every ``PROGRESS_EVERY``."""
+
+    def __init__(self, job: ExportJob):
+        self.job = job
+        self.count = 0
+
+    def tick(self) -> None:
+        self.count += 1
+        if self.count % PROGRESS_EVERY == 0:
+            ExportJob.objects.filter(pk=self.job.pk).update(rows_done=self.count)
+
+    def rows(self, rows: Iterable[Sequence]) -> Iterator[Sequence]:
+        for row in rows:
+            self.tick()
+            yield row
+
+    def workbook(self, wb: Any) -> Any:
+        progress = self
+
+        class Sheet:
+            def __init__(self, ws):
+                self.ws = ws
+
+            def append(self, row):
+                progress.tick()
+                self.ws.append(row)
+
+        class Workbook:
+            def create_sheet(self, title):
+                return Sheet(wb.create_sheet(title))
+
+        return Workbook()
+
+
+def run_export_job(job: ExportJob) -> bool:
+    """Build ``job``'s file; return False if another worker claimed it first."""
+    # Conditional update as the claim, so two workers never build the same job
+    claimed = ExportJob.objects.filter(pk=job.pk, status=ExportJob.PENDING).update(
+        status=ExportJob.RUNNING, started_at=timezone.now()
+    )
+    if not claimed:
+        return False
+
+    progress = _Progress(job)
+    try:
+        source = _BUILDERS[job.kind](job)
+        with tempfile.TemporaryFile() as out:
+            if job.fmt == "xlsx":
+                from openpyxl import Workbook
+
+                wb = Workbook(write_only=True)
+                source.fill_workbook(progress.workbook(wb))
+                wb.save(out)
+            else:
+                for chunk in iter_csv(progress.rows(source.rows())):
+                    out.write(chunk.encode("utf-8"))
+            out.seek(0)
+            job.file.save(f"{source.filename}.{job.fmt}", File(out), save=False)
+    except Exception as exc:
+        logger.exception("Export job %s failed", job.pk)
+        job.status, job.error = ExportJob.FAILED, str(exc) or exc.__class__.__name__
+    else:
+        job.status, job.etag = ExportJob.DONE, source.etag
+    job.rows_done = progress.count
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "etag", "file", "rows_done", "finished_at"])
+    return True
+
+
+def pending_jobs():
+    return ExportJob.objects.filter(status=ExportJob.PENDING).order_by("created_at", "pk")
+
+
+def fail_stale_jobs() -> int:
+    """Fail RUNNING jobs past their lease, whose worker died mid-build.
+
+    They are not re-queued: a job that brought its worker down would
+    otherwise do so again on every run. Returns the number of jobs failed.
+    """
+    lease_start = timezone.now() - timedelta(seconds=export_job_lease())
+    return ExportJob.objects.filter(status=ExportJob.RUNNING, started_at__lt=lease_start).update(
+        status=ExportJob.FAILED,
+        error="The export worker stopped before finishing.",
+        finished_at=timezone.now(),
+    )
+
+
+def purge_expired_exports() -> int:
+    """Delete finished jobs older than the retention period, with their files."""
+    cutoff = timezone.now() - timedelta(seconds=export_retention())
+    expired = ExportJob.objects.filter(
+        status__in=(ExportJob.DONE, ExportJob.FAILED), finished_at__lt=cutoff
+    )
+    count = 0
+    for job in expired.iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        count += 1
+    return count
+
+
+@register_export_builder(ExportJob.KIND_COURSE_SEMESTER)
+def _course_semester_source(job: ExportJob) -> ExportSource:
+    cs = CourseSemester.objects.select_related("course").get(pk=job.course_semester_id)
+    return ExportSource(
+        f"course_semester_{cs.pk}",
+        lambda: course_semester_csv_rows(cs),
+        lambda wb: write_course_semester_sheets(wb, cs),
+        course_semester_fingerprint(cs, f"{job.kind}.{job.fmt}").etag,
+    )
+
+
+@register_export_builder(ExportJob.KIND_GRADEBOOK)
+def _gradebook_source(job: ExportJob) -> ExportSource:
+    cs = CourseSemester.objects.select_related("course").get(pk=job.course_semester_id)
+    return ExportSource(
+        f"course_semester_{cs.pk}_gradebook",
+        lambda: gradebook_rows(cs),
+        lambda wb: write_gradebook_sheet(wb, cs),
+        course_semester_fingerprint(cs, f"{job.kind}.{job.fmt}").etag,
+    )
@@ -0,0 +1,274 @@
+"""Row sources and streaming responses for the CSV and XLSX exports.
+
+Rows are produced lazily from ``QuerySet.iterator`` so an export holds one
+chunk of rows in memory at a time. CSV responses start as soon as the first
+rows are ready; workbooks are written by write-only openpyxl sheets into a
+spooled temporary file that is served as-is.
+
+``course_semester_fingerprint`` summarises what an export of a course
+semester depends on, so the export views can answer conditional requests
+with ``304 Not Modified`` instead of rebuilding the file.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import tempfile
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterable, Iterator, NamedTuple, Sequence
+
+from django.http import FileResponse, HttpResponseBase, StreamingHttpResponse
+from django.utils.http import http_date, quote_etag
+
+from .models import (
+    CourseSemester,
+    CourseSemesterStats,
+    FinalAssignmentResult,
+    LabParticipation,
+    LabReportGrade,
+)
+from .stats import rebuild_stats
+
+EXPORT_CHUNK_SIZE = 2000
+# Rows joined into each streamed chunk; one write per row would flood the socket
+ROWS_PER_CHUNK = 500
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# Workbooks up to this size stay in memory; larger ones roll over to disk
+XLSX_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+class _Echo:
+    """File-like object whose ``write`` returns the line instead of storing it."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def iter_csv(rows: Iterable[Sequence]) -> Iterator[str]:
+    """Yield CSV text for ``rows`` in chunks, led by the UTF-8 BOM Excel expects."""
+    writer = csv.writer(_Echo())
+    yield "\ufeff"
+    chunk = []
+    for row in rows:
+        chunk.append(writer.writerow(row))
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def streaming_csv_response(rows: Iterable[Sequence], filename: str) -> StreamingHttpResponse:
+    resp = StreamingHttpResponse(iter_csv(rows), content_type="text/csv; charset=utf-8")
+    resp["Content-Disposition"] = f"attachment; filename={filename}"
+    return resp
+
+
+def xlsx_response(wb, filename: str) -> FileResponse:
+    """Save ``wb`` into a spooled temporary file and serve it without copying."""
+    out = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX_SIZE)
+    wb.save(out)
+    out.seek(0)
+    # FileResponse closes (and so deletes) the temporary file when it is done
+    resp = FileResponse(out, content_type=XLSX_CONTENT_TYPE)
+    resp["Content-Disposition"] = f"attachment; filename={filename}"
+    return resp
+
+
+class ExportFingerprint(NamedTuple):
+    etag: str
+    last_modified: datetime | None
+
+
+def course_semester_fingerprint(cs: CourseSemester, variant: str) -> ExportFingerprint:
+    """Fingerprint the data behind an export of ``cs`` from its stats row.
+
+    The row's ``data_version`` moves on every write the export can see (see
+    ``lms_courses.signals``), so one primary-key lookup replaces scanning the
+    source tables. ``variant`` (kind and format) keeps the ETags of different
+    files apart; the course fields shown in the export header are hashed in.
+    """
+    row = CourseSemesterStats.objects.filter(pk=cs.pk).values_list(
+        "data_version", "data_changed_at"
+    )
+    state = row.first()
+    if state is None:
+        rebuild_stats([cs.pk])
+        state = row.get()
+    version, changed_at = state
+    key = [variant, cs.course.code, cs.course.title, cs.year, cs.semester, version]
+    etag = hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+    return ExportFingerprint(etag, changed_at)
+
+
+def with_fingerprint(resp: HttpResponseBase, fingerprint: ExportFingerprint) -> HttpResponseBase:
+    """Set the ``ETag`` and ``Last-Modified`` validators of ``fingerprint`` on ``resp``."""
+    resp["ETag"] = quote_etag(fingerprint.etag)
+    if fingerprint.last_modified is not None:
+        resp["Last-Modified"] = http_date(fingerprint.last_modified.timestamp())
+    return resp
+
+
+def _sessions(cs: CourseSemester) -> Iterator[tuple]:
+    for s in cs.sessions.with_counts():  # type: ignore[attr-defined]
+        yield s.week, s.name, getattr(s, "date", ""), s.present_count, s.graded_count
+
+
+def _participations(cs: CourseSemester) -> Iterator[tuple]:
+    return (
+        LabParticipation.objects.filter(session__course_semester=cs)
+        .order_by("session__week", "student__username")
+        .values_list("session__week", "student__username", "present")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def _lab_grades(cs: CourseSemester) -> Iterator[tuple]:
+    return (
+        LabReportGrade.objects.filter(lab_report__session__course_semester=cs)
+        .order_by("lab_report__session__week", "student__username")
+        .values_list("lab_report__session__week", "student__username", "grade")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def _final_results(cs: CourseSemester) -> Iterator[tuple]:
+    return (
+        FinalAssignmentResult.objects.filter(final_assignment__course_semester=cs)
+        .order_by("student__username")
+        .values_list("student__username", "submitted", "grade")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def course_semester_csv_rows(cs: CourseSemester) -> Iterator[Sequence]:
+    """Yield the rows of the course semester CSV export, one section after another."""
+    yield ["course_code", "course_title", "year", "semester"]
+    yield [cs.course.code, cs.course.title, cs.year, cs.get_semester_display()]
+    yield []
+    yield ["sessions: week", "name", "date", "present_count", "graded_count"]
+    yield from _sessions(cs)
+    yield []
+    yield ["participations: week", "student", "present"]
+    for week, username, present in _participations(cs):
+        yield [week, username, int(bool(present))]
+    yield []
+    yield ["lab_grades: week", "student", "grade"]
+    for week, username, grade in _lab_grades(cs):
+        yield [week, username, grade or ""]
+    yield []
+    yield ["final_assignment: student", "submitted", "grade"]
+    for username, submitted, grade in _final_results(cs):
+        yield [username, int(bool(submitted)), grade or ""]
+
+
+def write_course_semester_sheets(wb, cs: CourseSemester) -> None:
+    """Append the course semester export sheets to the write-only workbook ``wb``."""
+    ws = wb.create_sheet("Στοιχεία")
+    ws.append(["Πεδίο", "Τιμή"])
+    ws.append(["Μάθημα", f"{cs.course.code} — {cs.course.title}"])
+    ws.append(["Έτος", cs.year])
+    ws.append(["Εξάμηνο", cs.get_semester_display()])
+
+    ws = wb.create_sheet("Συνεδρίες")
+    ws.append(["Εβδομάδα", "Όνομα", "Ημερομηνία", "Παρόντες", "Βαθμολογημένα"])
+    for row in _sessions(cs):
+        ws.append(list(row))
+
+    ws = wb.create_sheet("Παρουσίες")
+    ws.append(["Εβδομάδα", "Φοιτητής", "Παρουσία"])
+    for week, username, present in _participations(cs):
+        ws.append([week, username, "Ναι" if present else "Όχι"])
+
+    ws = wb.create_sheet("Βαθμοί εργαστηρίων")
+    ws.append(["Εβδομάδα", "Φοιτητής", "Βαθμός"])
+    for week, username, grade in _lab_grades(cs):
+        ws.append([week, username, grade or ""])
+
+    ws = wb.create_sheet("Τελική εργασία")
+    ws.append(["Φοιτητής", "Υποβλήθηκε", "Βαθμός"])
+    for username, submitted, grade in _final_results(cs):
+        ws.append([username, "Ναι" if submitted else "Όχι", grade or ""])
+
+
+def _by_student(rows: Iterator[tuple]) -> Iterator[tuple[int, dict]]:
+    """Group ``(student_id, session_id, value)`` rows into ``(student_id, {session_id: value})``."""
+    for student_id, group in groupby(rows, key=itemgetter(0)):
+        yield student_id, {session_id: value for _, session_id, value in group}
+
+
+def gradebook_rows(cs: CourseSemester) -> Iterator[Sequence]:
+    """Yield the wide gradebook: one row per enrolled student, two columns per session.
+
+    Students, participations, grades and final results are read as separate
+    cursors in the same student order and merged here, so only the current
+    student's cells are held in memory. Every cursor is limited to enrolled
+    students, which lets the merge match rows by id alone and never compare
+    usernames in Python (the database collation decides the order).
+    """
+    sessions = list(
+        cs.sessions.order_by("week", "pk").values_list("pk", "week", "name")  # type: ignore
+    )
+    yield [
+        "student",
+        *(f"W{week} {name}: {col}" for _, week, name in sessions for col in ("present", "grade")),
+        "fa_submitted",
+        "fa_grade",
+    ]
+
+    enrolled = {"student__enrolled_course_semesters": cs}
+    order = ("student__username",)
+    students = (
+        cs.students.order_by("username")  # type: ignore[attr-defined]
+        .values_list("pk", "username")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    parts = _by_student(
+        LabParticipation.objects.filter(session__course_semester=cs, **enrolled)
+        .order_by(*order)
+        .values_list("student_id", "session_id", "present")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    grades = _by_student(
+        LabReportGrade.objects.filter(lab_report__session__course_semester=cs, **enrolled)
+        .order_by(*order)
+        .values_list("student_id", "lab_report__session_id", "grade")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    results = (
+        FinalAssignmentResult.objects.filter(final_assignment__course_semester=cs, **enrolled)
+        .order_by(*order)
+        .values_list("student_id", "submitted", "grade")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+    next_parts, next_grades, next_result = (
+        next(parts, None),
+        next(grades, None),
+        next(results, None),
+    )
+    for student_id, username in students:
+        present, graded, result = {}, {}, (None, False, None)
+        if next_parts and next_parts[0] == student_id:
+            present, next_parts = next_parts[1], next(parts, None)
+        if next_grades and next_grades[0] == student_id:
+            graded, next_grades = next_grades[1], next(grades, None)
+        if next_result and next_result[0] == student_id:
+            result, next_result = next_result, next(results, None)
+
+        row: list = [username]
+        for session_id, _, _ in sessions:
+            p = present.get(session_id)
+            g = graded.get(session_id)
+            row += ["" if p is None else int(p), "" if g is None else g]
+        row += [int(bool(result[1])), "" if result[2] is None else result[2]]
+        yield row
+
+
+def write_gradebook_sheet(wb, cs: CourseSemester) -> None:
+    ws = wb.create_sheet("Βαθμολόγιο")
+    for row in gradebook_rows(cs):
+        ws.append(row)
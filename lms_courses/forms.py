@@ -4,15 +4,14 @@ from django import forms
 from django.conf import settings
 
 from lms_users.models import Roles, User
-from lms_users.services.keycloak import provision_local_student_from_kc
+from lms_users.services.keycloak import keycloak_available, provision_local_student_from_kc
 
+from .bulk import write_lab_session_grid
 from .models import (
     Course,
     CourseSemester,
     FinalAssignment,
-    LabParticipation,
     LabReport,
-    LabReportGrade,
     LabSession,
 )
 
@@ -175,6 +174,10 @@ class EnrollmentForm(forms.Form):
             else:
                 # OIDC enabled: try Keycloak lookup and local provision
                 kc_user = provision_local_student_from_kc(username)
+                if not kc_user and not keycloak_available():
+                    raise forms.ValidationError(
+                        "Identity provider unavailable, please try again shortly"
+                    )
                 if not kc_user:
                     raise forms.ValidationError("User not found")
                 user = kc_user
@@ -241,29 +244,20 @@ class LabParticipationGradeForm(forms.Form):
             )
 
     def save(self):
-        report = self.report
-        if report is None:
-            # Create a default report if missing
-            report = LabReport.objects.create(
-                session=self.session,
-                title=f"Report: {self.session.name}",
-                max_grade=10,
-                due_date=self.session.date,
-            )
-
-        for student in self.students_qs:
-            present_val = bool(self.cleaned_data.get(f"present_{student.id}") or False)
-            part, _ = LabParticipation.objects.get_or_create(
-                session=self.session, student=student, defaults={"present": present_val}
-            )
-            if part.present != present_val:
-                part.present = present_val
-                part.save()
-
-            grade_val = self.cleaned_data.get(f"grade_{student.id}")
-            gr, _ = LabReportGrade.objects.get_or_create(
-                lab_report=report, student=student, defaults={"grade": grade_val}
-            )
-            if gr.grade != grade_val:
-                gr.grade = grade_val
-                gr.save()
+        """Write attendance and grades for every student in the form.
+
+        Existing rows are loaded with one query per table and only the
+        differences are written, in bulk, so the number of queries does not
+        grow with the roster size.
+        """
+        return write_lab_session_grid(
+            self.session,
+            self.report,
+            {
+                student.id: {
+                    "present": bool(self.cleaned_data.get(f"present_{student.id}")),
+                    "grade": self.cleaned_data.get(f"grade_{student.id}"),
+                }
+                for student in self.students_qs
+            },
+        )
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from lms_courses.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute CourseSemesterStats rows from the source tables (all or selected ids)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "ids", nargs="*", type=int, help="Optional CourseSemester ids to rebuild"
+        )
+
+    def handle(self, *args: Any, **options: Any):
+        ids = options.get("ids") or None
+        written = rebuild_stats(ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {written} course semester(s)."))
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from lms_courses.export_jobs import (
+    fail_stale_jobs,
+    pending_jobs,
+    purge_expired_exports,
+    run_export_job,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fail exports whose worker died, delete expired export files, then build "
+        "queued export files, oldest first, and exit. Run it from cron or a "
+        "supervisor loop; several workers may run at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit", type=int, default=0, help="Stop after this many jobs (default: drain)"
+        )
+
+    def handle(self, *args: Any, **options: Any):
+        stale, purged = fail_stale_jobs(), purge_expired_exports()
+        if stale or purged:
+            self.stdout.write(f"Failed {stale} stale and deleted {purged} expired export job(s).")
+        limit = options["limit"]
+        built = 0
+        while not limit or built < limit:
+            job = pending_jobs().first()
+            if job is None:
+                break
+            started = time.monotonic()
+            if not run_export_job(job):
+                continue  # claimed by another worker
+            built += 1
+            elapsed_ms = (time.monotonic() - started) * 1000
+            self.stdout.write(f"{job}: {job.rows_done} rows in {elapsed_ms:.0f} ms")
+        self.stdout.write(self.style.SUCCESS(f"Built {built} export job(s)."))
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_stats(apps, schema_editor):
+    CourseSemester = apps.get_model("lms_courses", "CourseSemester")
+    CourseSemesterStats = apps.get_model("lms_courses", "CourseSemesterStats")
+    LabParticipation = apps.get_model("lms_courses", "LabParticipation")
+    LabReportGrade = apps.get_model("lms_courses", "LabReportGrade")
+    FinalAssignmentResult = apps.get_model("lms_courses", "FinalAssignmentResult")
+
+    def grouped(qs, key, **aggregates):
+        return {r.pop(key): r for r in qs.order_by().values(key).annotate(**aggregates)}
+
+    sources = [
+        grouped(
+            CourseSemester.students.through.objects.all(),
+            "coursesemester_id",
+            students=Count("pk"),
+        ),
+        grouped(
+            LabParticipation.objects.filter(present=True),
+            "session__course_semester_id",
+            present_participations=Count("pk"),
+        ),
+        grouped(
+            LabReportGrade.objects.all(),
+            "lab_report__session__course_semester_id",
+            lab_graded=Count("pk", filter=Q(grade__isnull=False)),
+            lab_ungraded=Count("pk", filter=Q(grade__isnull=True)),
+        ),
+        grouped(
+            FinalAssignmentResult.objects.all(),
+            "final_assignment__course_semester_id",
+            fa_submitted=Count("pk", filter=Q(submitted=True)),
+            fa_graded=Count("pk", filter=Q(grade__isnull=False)),
+            fa_grade_sum=Sum("grade"),
+        ),
+    ]
+    rows = []
+    for cs_id in CourseSemester.objects.values_list("pk", flat=True):
+        values = {}
+        for source in sources:
+            values.update({k: v or 0 for k, v in source.get(cs_id, {}).items()})
+        rows.append(CourseSemesterStats(course_semester_id=cs_id, **values))
+    CourseSemesterStats.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lms_courses", "0004_finalassignment_finalassignmentresult"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CourseSemesterStats",
+            fields=[
+                (
+                    "course_semester",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="lms_courses.coursesemester",
+                    ),
+                ),
+                ("students", models.IntegerField(default=0)),
+                ("present_participations", models.IntegerField(default=0)),
+                ("lab_graded", models.IntegerField(default=0)),
+                ("lab_ungraded", models.IntegerField(default=0)),
+                ("fa_submitted", models.IntegerField(default=0)),
+                ("fa_graded", models.IntegerField(default=0)),
+                ("fa_grade_sum", models.IntegerField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "course semester stats",
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_daily_activity(apps, schema_editor):
+    DailyActivity = apps.get_model("lms_courses", "CourseSemesterDailyActivity")
+    LabParticipation = apps.get_model("lms_courses", "LabParticipation")
+    LabReportGrade = apps.get_model("lms_courses", "LabReportGrade")
+    FinalAssignmentResult = apps.get_model("lms_courses", "FinalAssignmentResult")
+
+    sources = {
+        "presences": LabParticipation.objects.filter(present=True).values_list(
+            "session__course_semester_id", "session__date"
+        ),
+        "grades_entered": LabReportGrade.objects.filter(grade__isnull=False).values_list(
+            "lab_report__session__course_semester_id", "lab_report__session__date"
+        ),
+        "submissions": FinalAssignmentResult.objects.filter(submitted=True).values_list(
+            "final_assignment__course_semester_id", "final_assignment__due_date"
+        ),
+    }
+    days = {}
+    for name, qs in sources.items():
+        for cs_id, day, count in qs.order_by().annotate(n=Count("pk")):
+            days.setdefault((cs_id, day), {})[name] = count
+    DailyActivity.objects.bulk_create(
+        [
+            DailyActivity(course_semester_id=cs_id, date=day, **counters)
+            for (cs_id, day), counters in days.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lms_courses", "0005_coursesemesterstats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CourseSemesterDailyActivity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("presences", models.IntegerField(default=0)),
+                ("grades_entered", models.IntegerField(default=0)),
+                ("submissions", models.IntegerField(default=0)),
+                (
+                    "course_semester",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_activity",
+                        to="lms_courses.coursesemester",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "course semester daily activity",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("course_semester", "date"), name="uniq_daily_activity_per_semester"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_daily_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+import lms_courses.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lms_courses", "0006_coursesemesterdailyactivity"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExportJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("course_semester", "Εξάμηνο"), ("dashboard", "Πίνακας ελέγχου")],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "fmt",
+                    models.CharField(
+                        choices=[("csv", "CSV"), ("xlsx", "XLSX")], default="csv", max_length=4
+                    ),
+                ),
+                ("days", models.PositiveSmallIntegerField(blank=True, null=True)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Σε αναμονή"),
+                            ("RUNNING", "Σε εξέλιξη"),
+                            ("DONE", "Ολοκληρώθηκε"),
+                            ("FAILED", "Απέτυχε"),
+                        ],
+                        default="PENDING",
+                        max_length=10,
+                    ),
+                ),
+                ("rows_total", models.PositiveIntegerField(default=0)),
+                ("rows_done", models.PositiveIntegerField(default=0)),
+                (
+                    "file",
+                    models.FileField(
+                        blank=True, storage=lms_courses.models.export_storage, upload_to="%Y/%m/"
+                    ),
+                ),
+                ("error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "course_semester",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="export_jobs",
+                        to="lms_courses.coursesemester",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="export_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(fields=["status", "created_at"], name="export_job_queue_idx")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lms_courses", "0007_exportjob"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="exportjob",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("course_semester", "Εξάμηνο"),
+                    ("gradebook", "Βαθμολόγιο"),
+                    ("dashboard", "Πίνακας ελέγχου"),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
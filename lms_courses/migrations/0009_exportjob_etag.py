@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lms_courses", "0008_exportjob_gradebook_kind"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exportjob",
+            name="etag",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lms_courses", "0009_exportjob_etag"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="coursesemesterstats",
+            name="data_changed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="coursesemesterstats",
+            name="data_version",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
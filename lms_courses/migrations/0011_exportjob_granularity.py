@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lms_courses", "0010_coursesemesterstats_data_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exportjob",
+            name="granularity",
+            field=models.CharField(blank=True, max_length=5),
+        ),
+    ]
@@ -1,5 +1,9 @@
+import os
+
 from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 from django.db import models
+from django.db.models.functions import Coalesce
 
 
 class Course(models.Model):
@@ -41,6 +45,35 @@ class CourseSemester(models.Model):
         return f"{self.course} ({self.year} - {self.semester}) - {self.owner}"
 
 
+class LabSessionQuerySet(models.QuerySet):
+    def with_counts(self) -> "LabSessionQuerySet":
+        """Annotate ``present_total`` and ``graded_total`` for ``present_count``/``graded_count``.
+
+        Correlated subqueries rather than joined COUNTs, so participations and
+        grades are not multiplied against each other.
+        """
+        present = (
+            LabParticipation.objects.filter(session=models.OuterRef("pk"), present=True)
+            .order_by()
+            .values("session")
+            .annotate(n=models.Count("pk"))
+            .values("n")
+        )
+        graded = (
+            LabReportGrade.objects.filter(
+                lab_report__session=models.OuterRef("pk"), grade__isnull=False
+            )
+            .order_by()
+            .values("lab_report")
+            .annotate(n=models.Count("pk"))
+            .values("n")
+        )
+        return self.annotate(
+            present_total=Coalesce(models.Subquery(present), 0),
+            graded_total=Coalesce(models.Subquery(graded), 0),
+        )
+
+
 class LabSession(models.Model):
     name = models.CharField(max_length=255)
     week = models.PositiveIntegerField()
@@ -57,6 +90,8 @@ class LabSession(models.Model):
         ]
         ordering = ["week"]
 
+    objects = LabSessionQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.name} — Week {self.week} — {self.course_semester}"
 
@@ -96,6 +131,9 @@ class LabSession(models.Model):
 
     @property
     def present_count(self) -> int:
+        # Sessions loaded through LabSessionQuerySet.with_counts() need no query
+        if "present_total" in self.__dict__:
+            return self.present_total
         try:
             return self.participations.filter(present=True).count()  # type: ignore
         except Exception:
@@ -103,6 +141,8 @@ class LabSession(models.Model):
 
     @property
     def graded_count(self) -> int:
+        if "graded_total" in self.__dict__:
+            return self.graded_total
         try:
             report = getattr(self, "report", None)
             if not report:
@@ -241,3 +281,166 @@ class FinalAssignmentResult(models.Model):
             f"FinalAssignmentResult({self.student} @ {self.final_assignment} = "
             f"{sub}, {self.grade})"
         )
+
+
+class CourseSemesterStats(models.Model):
+    """Pre-aggregated counters for one CourseSemester (read model).
+
+    Kept in step with the source rows by ``lms_courses.signals`` inside the
+    writer's transaction; ``manage.py rebuild_course_semester_stats`` repairs it.
+    ``fa_graded`` doubles as the count of grades summed in ``fa_grade_sum``.
+    ``data_version`` is bumped, and ``data_changed_at`` stamped, by every write
+    to the data the semester's exports read, roster and usernames included.
+    """
+
+    course_semester = models.OneToOneField(
+        CourseSemester, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    students = models.IntegerField(default=0)
+    present_participations = models.IntegerField(default=0)
+    lab_graded = models.IntegerField(default=0)
+    lab_ungraded = models.IntegerField(default=0)
+    fa_submitted = models.IntegerField(default=0)
+    fa_graded = models.IntegerField(default=0)
+    fa_grade_sum = models.IntegerField(default=0)
+    data_version = models.PositiveBigIntegerField(default=0)
+    data_changed_at = models.DateTimeField(null=True, blank=True)
+
+    COUNTERS = (
+        "students",
+        "present_participations",
+        "lab_graded",
+        "lab_ungraded",
+        "fa_submitted",
+        "fa_graded",
+        "fa_grade_sum",
+    )
+
+    class Meta:
+        verbose_name_plural = "course semester stats"
+
+    def __str__(self) -> str:
+        return f"Stats({self.course_semester_id})"
+
+    @property
+    def fa_avg(self) -> float | None:
+        return self.fa_grade_sum / self.fa_graded if self.fa_graded else None
+
+
+class CourseSemesterDailyActivity(models.Model):
+    """Per-day activity counters for one CourseSemester (read model).
+
+    Activity is dated by the session it belongs to (presences, lab grades) or
+    by the final assignment's due date (submissions), so history can be
+    rebuilt from the source tables at any time. Maintained alongside
+    ``CourseSemesterStats`` by ``lms_courses.signals``.
+    """
+
+    course_semester = models.ForeignKey(
+        CourseSemester, on_delete=models.CASCADE, related_name="daily_activity"
+    )
+    date = models.DateField()
+    presences = models.IntegerField(default=0)
+    grades_entered = models.IntegerField(default=0)
+    submissions = models.IntegerField(default=0)
+
+    COUNTERS = ("presences", "grades_entered", "submissions")
+
+    class Meta:
+        verbose_name_plural = "course semester daily activity"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["course_semester", "date"], name="uniq_daily_activity_per_semester"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"Activity({self.course_semester_id} @ {self.date})"
+
+
+class ExportStorage(FileSystemStorage):
+    """Local storage for export files under ``settings.EXPORT_ROOT``.
+
+    It sits outside MEDIA_ROOT so nothing serves the files directly. The root
+    is read on every access, as the storage instance lives on the model field.
+    """
+
+    @property
+    def base_location(self):  # type: ignore[override]
+        return getattr(settings, "EXPORT_ROOT", settings.BASE_DIR / "var" / "exports")
+
+    @property
+    def location(self):  # type: ignore[override]
+        return os.path.abspath(self.base_location)
+
+
+def export_storage() -> FileSystemStorage:
+    return ExportStorage()
+
+
+class ExportJob(models.Model):
+    """An export too large to build in the request, queued for ``run_export_jobs``.
+
+    ``course_semester`` is the exported semester, or the dashboard course
+    filter (empty for all courses); ``days`` and ``granularity`` are the
+    dashboard day range and trend bucket size.
+    ``etag`` fingerprints the data the file was built from, so a finished
+    file can be served again until that data changes.
+    """
+
+    KIND_COURSE_SEMESTER = "course_semester"
+    KIND_GRADEBOOK = "gradebook"
+    KIND_DASHBOARD = "dashboard"
+    KIND_CHOICES = (
+        (KIND_COURSE_SEMESTER, "Εξάμηνο"),
+        (KIND_GRADEBOOK, "Βαθμολόγιο"),
+        (KIND_DASHBOARD, "Πίνακας ελέγχου"),
+    )
+    FORMAT_CHOICES = (("csv", "CSV"), ("xlsx", "XLSX"))
+    PENDING, RUNNING, DONE, FAILED = "PENDING", "RUNNING", "DONE", "FAILED"
+    STATUS_CHOICES = (
+        (PENDING, "Σε αναμονή"),
+        (RUNNING, "Σε εξέλιξη"),
+        (DONE, "Ολοκληρώθηκε"),
+        (FAILED, "Απέτυχε"),
+    )
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="export_jobs"
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    fmt = models.CharField(max_length=4, choices=FORMAT_CHOICES, default="csv")
+    course_semester = models.ForeignKey(
+        CourseSemester,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="export_jobs",
+    )
+    days = models.PositiveSmallIntegerField(null=True, blank=True)
+    granularity = models.CharField(max_length=5, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    rows_total = models.PositiveIntegerField(default=0)
+    rows_done = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to="%Y/%m/", storage=export_storage, blank=True)
+    error = models.TextField(blank=True)
+    etag = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "created_at"], name="export_job_queue_idx")]
+
+    def __str__(self) -> str:
+        return f"ExportJob({self.pk}: {self.kind}.{self.fmt} {self.status})"
+
+    @property
+    def progress(self) -> int:
+        """Percentage of the estimated rows written so far."""
+        if self.status == self.DONE:
+            return 100
+        if not self.rows_total:
+            return 0
+        return min(99, 100 * self.rows_done // self.rows_total)
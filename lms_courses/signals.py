@@ -0,0 +1,362 @@
+"""Signal handlers keeping CourseSemesterStats in step with the source rows.
+
+Each tracked model contributes a small dict of counters to the stats row of
+its course semester. Handlers apply the difference between the state loaded
+from the database (snapshotted in ``post_init``) and the state just written,
+as a single ``UPDATE ... SET x = x + delta`` inside the writer's transaction;
+the same update bumps the row's ``data_version``, which the export
+fingerprints read, so it also moves on writes that change no counter. The
+same deltas feed the CourseSemesterDailyActivity row of the day the
+activity belongs to. Course and semester edits, sessions, reports, final
+assignments, enrolments and username changes bump the version too. Paths
+that bypass model signals (``bulk_create``, ``bulk_update``,
+``QuerySet.update``) must call ``bulk_changed`` for the semesters they
+touch, passing the rows they wrote so the same deltas apply.
+"""
+
+from __future__ import annotations
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from lms_users.models import User
+
+from .models import (
+    Course,
+    CourseSemester,
+    CourseSemesterDailyActivity,
+    CourseSemesterStats,
+    FinalAssignment,
+    FinalAssignmentResult,
+    LabParticipation,
+    LabReport,
+    LabReportGrade,
+    LabSession,
+)
+from .stats import course_data_bulk_changed, rebuild_stats, version_bump
+
+
+def bulk_changed(course_semester_ids, *, created=(), updated=()) -> None:
+    """Apply the counter deltas of a bulk write and notify listeners.
+
+    ``created`` and ``updated`` are the tracked instances just written; the
+    updated ones must have been loaded from the database, so their snapshot
+    holds the previous values. Deltas are summed per parent row and applied
+    as one increment each; without any rows the semesters are recounted from
+    the source tables instead. Call once per batch, inside the writer's
+    transaction.
+    """
+    ids = set(course_semester_ids)
+    if not ids:
+        return
+    if not created and not updated:
+        rebuild_stats(ids)  # notifies listeners itself
+        return
+    deltas: dict[tuple[str, int], dict[str, int]] = {}
+    rebuild: set[tuple[str, int]] = set()
+
+    def add(scope, counters, sign=1):
+        delta = deltas.setdefault(scope, {})
+        for name, value in counters.items():
+            delta[name] = delta.get(name, 0) + sign * value
+
+    for instance in created:
+        new = instance._stats_state = _state(instance)
+        add(*new)
+    for instance in updated:
+        old = getattr(instance, "_stats_state", None)
+        new = instance._stats_state = _state(instance)
+        if old is None:
+            rebuild.add(new[0])
+            continue
+        add(*old, sign=-1)
+        add(*new)
+    for scope in rebuild:
+        _rebuild_scope(scope)
+    for scope, delta in deltas.items():
+        if scope not in rebuild:
+            _apply(scope, delta, create_missing=True)
+    course_data_bulk_changed.send(sender=CourseSemester, course_semester_ids=ids)
+
+
+def _participation_counters(p: LabParticipation) -> dict[str, int]:
+    return {"present_participations": int(bool(p.present))}
+
+
+def _lab_grade_counters(g: LabReportGrade) -> dict[str, int]:
+    return {"lab_graded": int(g.grade is not None), "lab_ungraded": int(g.grade is None)}
+
+
+def _fa_result_counters(r: FinalAssignmentResult) -> dict[str, int]:
+    return {
+        "fa_submitted": int(bool(r.submitted)),
+        "fa_graded": int(r.grade is not None),
+        "fa_grade_sum": r.grade or 0,
+    }
+
+
+# model -> (fields read, counters, lookup from CourseSemester to the parent row)
+TRACKED = {
+    LabParticipation: (("session_id", "present"), _participation_counters, "sessions"),
+    LabReportGrade: (("lab_report_id", "grade"), _lab_grade_counters, "sessions__report"),
+    FinalAssignmentResult: (
+        ("final_assignment_id", "submitted", "grade"),
+        _fa_result_counters,
+        "final_assignment",
+    ),
+}
+
+
+# stats counter -> daily activity counter it also feeds
+DAILY_COUNTERS = {
+    "present_participations": "presences",
+    "lab_graded": "grades_entered",
+    "fa_submitted": "submissions",
+}
+
+# parent lookup -> (model, field matching the parent id, field dating the activity)
+ACTIVITY_DAYS = {
+    "sessions": (LabSession, "pk", "date"),
+    "sessions__report": (LabSession, "report", "date"),
+    "final_assignment": (FinalAssignment, "pk", "due_date"),
+}
+
+
+def _state(instance) -> tuple[tuple[str, int], dict[str, int]] | None:
+    """Return (scope, counters) for ``instance``, or None if fields are deferred."""
+    fields, counters, lookup = TRACKED[type(instance)]
+    if any(name not in instance.__dict__ for name in fields):
+        return None
+    return (lookup, instance.__dict__[fields[0]]), counters(instance)
+
+
+def _rebuild_scope(scope: tuple[str, int]) -> None:
+    lookup, parent_id = scope
+    rebuild_stats(CourseSemester.objects.filter(**{lookup: parent_id}).values_list("pk", flat=True))
+
+
+def _apply(scope: tuple[str, int], delta: dict[str, int], *, create_missing: bool) -> None:
+    delta = {name: value for name, value in delta.items() if value}
+    lookup, parent_id = scope
+    updated = CourseSemesterStats.objects.filter(
+        **{f"course_semester__{lookup}": parent_id}
+    ).update(**{name: F(name) + value for name, value in delta.items()}, **version_bump())
+    if not updated and create_missing:
+        # Row never built (or lost): recompute it (and the daily rows) from the source tables
+        _rebuild_scope(scope)
+        return
+    _apply_daily(scope, delta, create_missing=create_missing)
+
+
+def _apply_daily(scope: tuple[str, int], delta: dict[str, int], *, create_missing: bool) -> None:
+    changes = {DAILY_COUNTERS[k]: v for k, v in delta.items() if k in DAILY_COUNTERS}
+    if not changes:
+        return
+    lookup, parent_id = scope
+    model, parent_field, date_field = ACTIVITY_DAYS[lookup]
+    day = (
+        model.objects.filter(**{parent_field: parent_id})
+        .values_list("course_semester_id", date_field)
+        .first()
+    )
+    if day is None:  # parent already gone (cascade delete)
+        return
+    rows = CourseSemesterDailyActivity.objects.filter(course_semester_id=day[0], date=day[1])
+    increments = {name: F(name) + value for name, value in changes.items()}
+    if not rows.update(**increments) and create_missing:
+        CourseSemesterDailyActivity.objects.get_or_create(course_semester_id=day[0], date=day[1])
+        rows.update(**increments)
+
+
+def _snapshot(sender, instance, **kwargs):
+    instance._stats_state = _state(instance)
+
+
+def _saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new = _state(instance)
+    old = None if created else getattr(instance, "_stats_state", None)
+    instance._stats_state = new
+    if new is None:  # pragma: no cover - saving a deferred instance
+        return
+    new_scope, new_counters = new
+    if created:
+        _apply(new_scope, new_counters, create_missing=True)
+    elif old is None:
+        # No loaded snapshot to diff against; fall back to recounting the semester
+        _rebuild_scope(new_scope)
+    elif old[0] != new_scope:
+        _apply(old[0], {k: -v for k, v in old[1].items()}, create_missing=False)
+        _apply(new_scope, new_counters, create_missing=True)
+    else:
+        delta = {name: value - old[1].get(name, 0) for name, value in new_counters.items()}
+        _apply(new_scope, delta, create_missing=True)
+
+
+def _deleted(sender, instance, **kwargs):
+    state = getattr(instance, "_stats_state", None) or _state(instance)
+    if state is None:  # pragma: no cover - deleting a deferred instance
+        return
+    scope, counters = state
+    # Missing rows are left alone: the semester itself may be mid-delete
+    _apply(scope, {k: -v for k, v in counters.items()}, create_missing=False)
+
+
+for _model in TRACKED:
+    post_init.connect(_snapshot, sender=_model, dispatch_uid=f"stats_init_{_model.__name__}")
+    post_save.connect(_saved, sender=_model, dispatch_uid=f"stats_save_{_model.__name__}")
+    post_delete.connect(_deleted, sender=_model, dispatch_uid=f"stats_delete_{_model.__name__}")
+
+
+# model -> fields placing its activity on a (semester, day)
+DATED_PARENTS = {
+    LabSession: ("course_semester_id", "date"),
+    FinalAssignment: ("course_semester_id", "due_date"),
+}
+
+
+def _dated_state(instance) -> tuple | None:
+    fields = DATED_PARENTS[type(instance)]
+    if any(name not in instance.__dict__ for name in fields):
+        return None
+    return tuple(instance.__dict__[name] for name in fields)
+
+
+def _snapshot_dated(sender, instance, **kwargs):
+    instance._activity_state = _dated_state(instance)
+
+
+def _dated_saved(sender, instance, created, raw=False, **kwargs):
+    old = getattr(instance, "_activity_state", None)
+    new = instance._activity_state = _dated_state(instance)
+    if raw or created or old is None or old == new:
+        return
+    # Rescheduled or moved: its activity now counts on another day/semester
+    rebuild_stats({old[0], instance.course_semester_id})
+
+
+for _model in DATED_PARENTS:
+    post_init.connect(
+        _snapshot_dated, sender=_model, dispatch_uid=f"activity_init_{_model.__name__}"
+    )
+    post_save.connect(_dated_saved, sender=_model, dispatch_uid=f"activity_save_{_model.__name__}")
+
+
+# model -> (lookup from CourseSemester, field holding its value) for rows that
+# feed the exports without feeding any counter
+EXPORTED_PARENTS = {
+    Course: ("course", "pk"),
+    CourseSemester: ("pk", "pk"),
+    LabSession: ("pk", "course_semester_id"),
+    LabReport: ("sessions", "session_id"),
+    FinalAssignment: ("pk", "course_semester_id"),
+}
+
+
+def touch_course_semesters(**filters) -> None:
+    """Bump the data version of the semesters matching ``filters`` (CourseSemester lookups)."""
+    CourseSemesterStats.objects.filter(
+        **{f"course_semester__{name}": value for name, value in filters.items()}
+    ).update(**version_bump())
+
+
+def _parent_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    lookup, field = EXPORTED_PARENTS[sender]
+    touch_course_semesters(**{lookup: getattr(instance, field)})
+
+
+for _model in EXPORTED_PARENTS:
+    post_save.connect(_parent_changed, sender=_model, dispatch_uid=f"export_save_{_model.__name__}")
+    post_delete.connect(
+        _parent_changed, sender=_model, dispatch_uid=f"export_delete_{_model.__name__}"
+    )
+
+
+@receiver(post_save, sender=CourseSemester, dispatch_uid="stats_course_semester_created")
+def _course_semester_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        CourseSemesterStats.objects.get_or_create(course_semester=instance)
+
+
+def recount_students(course_semester_ids) -> None:
+    """Refresh the ``students`` counter from the enrollment table."""
+    ids = list(course_semester_ids)
+    if not ids:
+        return
+    enrolled = (
+        CourseSemester.students.through.objects.filter(coursesemester_id=OuterRef("pk"))
+        .order_by()
+        .values("coursesemester_id")
+        .annotate(c=Count("pk"))
+        .values("c")
+    )
+    updated = CourseSemesterStats.objects.filter(pk__in=ids).update(
+        students=Coalesce(Subquery(enrolled), 0), **version_bump()
+    )
+    if updated < len(ids):
+        existing = set(CourseSemesterStats.objects.filter(pk__in=ids).values_list("pk", flat=True))
+        rebuild_stats(
+            CourseSemester.objects.filter(pk__in=set(ids) - existing).values_list("pk", flat=True)
+        )
+
+
+@receiver(m2m_changed, sender=CourseSemester.students.through, dispatch_uid="stats_enrollment")
+def _enrollment_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        instance._stats_cleared = list(
+            instance.enrolled_course_semesters.values_list("pk", flat=True)
+        )
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        recount_students([instance.pk])
+    elif action == "post_clear":
+        recount_students(getattr(instance, "_stats_cleared", []))
+    else:
+        recount_students(pk_set or [])
+
+
+@receiver(post_init, sender=User, dispatch_uid="export_user_init")
+def _user_snapshot(sender, instance, **kwargs):
+    # Read from __dict__: a deferred username must not cost a query per instance
+    instance._export_username = instance.__dict__.get("username")
+
+
+@receiver(post_save, sender=User, dispatch_uid="export_user_post_save")
+def _user_post_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Exports list usernames; saves that cannot touch it (e.g. last_login) are skipped
+    if raw or (update_fields is not None and "username" not in update_fields):
+        return
+    old, instance._export_username = instance._export_username, instance.username
+    if created or old is None or old == instance.username:
+        return
+    for lookup in (
+        "students",
+        "sessions__participations__student",
+        "sessions__report__grades__student",
+        "final_assignment__results__student",
+    ):
+        touch_course_semesters(**{lookup: instance.pk})
+
+
+@receiver(pre_delete, sender=User, dispatch_uid="stats_user_pre_delete")
+def _user_pre_delete(sender, instance, **kwargs):
+    # Enrollment rows vanish with the user without an m2m_changed signal
+    instance._stats_enrolled = list(instance.enrolled_course_semesters.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=User, dispatch_uid="stats_user_post_delete")
+def _user_post_delete(sender, instance, **kwargs):
+    recount_students(getattr(instance, "_stats_enrolled", []))
@@ -0,0 +1,139 @@
+"""Maintenance helpers for the CourseSemesterStats and daily activity read models."""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import (
+    CourseSemester,
+    CourseSemesterDailyActivity,
+    CourseSemesterStats,
+    FinalAssignmentResult,
+    LabParticipation,
+    LabReportGrade,
+)
+
+# Sent with ``course_semester_ids`` after their data changed without model
+# signals: bulk writes and stats rebuilds
+course_data_bulk_changed = Signal()
+
+REBUILD_BATCH_SIZE = 500
+
+
+def version_bump() -> dict:
+    """``update()`` kwargs marking a stats row's exported data as changed now."""
+    return {"data_version": F("data_version") + 1, "data_changed_at": timezone.now()}
+
+
+def _grouped(qs, key: str, **aggregates) -> dict[int, dict]:
+    """Run one grouped aggregate over ``qs`` and index the rows by ``key``."""
+    return {row.pop(key): row for row in qs.order_by().values(key).annotate(**aggregates)}
+
+
+def compute_stats(course_semester_ids: Iterable[int]) -> list[CourseSemesterStats]:
+    """Recompute stats rows from the source tables with one grouped pass per table."""
+    ids = list(course_semester_ids)
+    enrollments = CourseSemester.students.through.objects.filter(coursesemester_id__in=ids)
+    students = _grouped(enrollments, "coursesemester_id", students=Count("pk"))
+    participations = _grouped(
+        LabParticipation.objects.filter(session__course_semester_id__in=ids, present=True),
+        "session__course_semester_id",
+        present_participations=Count("pk"),
+    )
+    lab_grades = _grouped(
+        LabReportGrade.objects.filter(lab_report__session__course_semester_id__in=ids),
+        "lab_report__session__course_semester_id",
+        lab_graded=Count("pk", filter=Q(grade__isnull=False)),
+        lab_ungraded=Count("pk", filter=Q(grade__isnull=True)),
+    )
+    fa_results = _grouped(
+        FinalAssignmentResult.objects.filter(final_assignment__course_semester_id__in=ids),
+        "final_assignment__course_semester_id",
+        fa_submitted=Count("pk", filter=Q(submitted=True)),
+        fa_graded=Count("pk", filter=Q(grade__isnull=False)),
+        fa_grade_sum=Sum("grade"),
+    )
+
+    rows = []
+    for cs_id in ids:
+        values: dict = {}
+        for source in (students, participations, lab_grades, fa_results):
+            values.update(source.get(cs_id, {}))
+        rows.append(
+            CourseSemesterStats(
+                course_semester_id=cs_id,
+                **{name: values.get(name) or 0 for name in CourseSemesterStats.COUNTERS},
+            )
+        )
+    return rows
+
+
+def compute_daily_activity(course_semester_ids: Iterable[int]) -> list[CourseSemesterDailyActivity]:
+    """Recompute daily activity rows with one grouped pass per source table."""
+    ids = list(course_semester_ids)
+    sources = {
+        "presences": LabParticipation.objects.filter(
+            session__course_semester_id__in=ids, present=True
+        ).values_list("session__course_semester_id", "session__date"),
+        "grades_entered": LabReportGrade.objects.filter(
+            lab_report__session__course_semester_id__in=ids, grade__isnull=False
+        ).values_list("lab_report__session__course_semester_id", "lab_report__session__date"),
+        "submissions": FinalAssignmentResult.objects.filter(
+            final_assignment__course_semester_id__in=ids, submitted=True
+        ).values_list("final_assignment__course_semester_id", "final_assignment__due_date"),
+    }
+    days: dict[tuple, dict[str, int]] = {}
+    for name, qs in sources.items():
+        for cs_id, day, count in qs.order_by().annotate(n=Count("pk")):
+            days.setdefault((cs_id, day), {})[name] = count
+    return [
+        CourseSemesterDailyActivity(course_semester_id=cs_id, date=day, **counters)
+        for (cs_id, day), counters in sorted(days.items())
+    ]
+
+
+def rebuild_stats(course_semester_ids: Iterable[int] | None = None) -> int:
+    """Recompute and upsert stats rows; all course semesters when no ids are given.
+
+    The daily activity rows of the same semesters are rebuilt alongside, so
+    this is the single repair entry point for writers that bypass signals.
+    Returns the number of stats rows written.
+    """
+    if course_semester_ids is None:
+        course_semester_ids = CourseSemester.objects.values_list("pk", flat=True)
+    ids = sorted(set(course_semester_ids))
+    written = 0
+    for start in range(0, len(ids), REBUILD_BATCH_SIZE):
+        batch = ids[start : start + REBUILD_BATCH_SIZE]
+        rows = compute_stats(batch)
+        with transaction.atomic():
+            CourseSemesterStats.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["course_semester"],
+                update_fields=list(CourseSemesterStats.COUNTERS),
+            )
+            # Callers rebuild after changes the deltas could not describe
+            CourseSemesterStats.objects.filter(pk__in=batch).update(**version_bump())
+            CourseSemesterDailyActivity.objects.filter(course_semester_id__in=batch).delete()
+            CourseSemesterDailyActivity.objects.bulk_create(
+                compute_daily_activity(batch), batch_size=REBUILD_BATCH_SIZE
+            )
+        written += len(rows)
+    if ids:
+        course_data_bulk_changed.send(sender=CourseSemester, course_semester_ids=set(ids))
+    return written
+
+
+def stats_for(course_semester: CourseSemester) -> CourseSemesterStats:
+    """Return the stats row for ``course_semester``, rebuilding it when missing."""
+    stats = getattr(course_semester, "stats", None)
+    if stats is None:
+        rebuild_stats([course_semester.pk])
+        stats = CourseSemesterStats.objects.get(pk=course_semester.pk)
+    return stats
@@ -0,0 +1,107 @@
+from datetime import date
+
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from lms.services.dashboard_cache import dashboard_version
+from lms_courses.forms import LabParticipationGradeForm
+from lms_courses.models import (
+    Course,
+    CourseSemester,
+    CourseSemesterDailyActivity,
+    CourseSemesterStats,
+    LabParticipation,
+    LabReportGrade,
+    LabSession,
+)
+from lms_courses.stats import compute_stats
+from lms_users.models import Roles, User
+
+
+class TestLabParticipationGradeFormSave(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user("t", password="x", role=Roles.TEACHER)
+        self.cs = CourseSemester.objects.create(
+            course=Course.objects.create(code="CS1", title="T"),
+            year=2025,
+            semester="WINTER",
+            owner=self.teacher,
+        )
+        self.session = LabSession.objects.create(
+            name="L1", week=1, date=date(2025, 1, 10), course_semester=self.cs
+        )
+
+    def enroll(self, count: int, prefix: str = "s") -> list[User]:
+        students = User.objects.bulk_create(
+            [User(username=f"{prefix}{i}", role=Roles.STUDENT) for i in range(count)]
+        )
+        self.cs.students.add(*students)
+        return list(self.cs.students.order_by("pk"))
+
+    def save(self, data: dict) -> int:
+        """Save the grid and return the number of queries ``save()`` ran."""
+        form = LabParticipationGradeForm(
+            data,
+            session=self.session,
+            report=self.session.report,  # type: ignore[attr-defined]
+            students_qs=self.cs.students.all(),
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        with CaptureQueriesContext(connection) as ctx:
+            form.save()
+        return len(ctx.captured_queries)
+
+    def test_creates_and_updates_rows(self):
+        s1, s2, s3 = self.enroll(3)
+        self.save({f"present_{s1.pk}": "on", f"grade_{s1.pk}": "7"})
+        self.assertEqual(LabParticipation.objects.filter(session=self.session).count(), 3)
+        self.assertEqual(
+            dict(LabReportGrade.objects.values_list("student_id", "grade")),
+            {s1.pk: 7, s2.pk: None, s3.pk: None},
+        )
+
+        self.save({f"present_{s2.pk}": "on", f"grade_{s2.pk}": "5", f"grade_{s1.pk}": "7"})
+        self.assertEqual(
+            dict(LabParticipation.objects.values_list("student_id", "present")),
+            {s1.pk: False, s2.pk: True, s3.pk: False},
+        )
+        self.assertEqual(LabReportGrade.objects.get(student=s2).grade, 5)
+
+        # Read models skipped by bulk writes are rebuilt
+        [fresh] = compute_stats([self.cs.pk])
+        stats = CourseSemesterStats.objects.get(pk=self.cs.pk)
+        for name in CourseSemesterStats.COUNTERS:
+            self.assertEqual(getattr(stats, name), getattr(fresh, name), name)
+        self.assertEqual(self.cs.daily_activity.get().grades_entered, 2)  # type: ignore
+
+    def test_owner_dashboards_invalidated_after_commit(self):
+        (s1,) = self.enroll(1)
+        before = dashboard_version(self.teacher.pk)
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.save({f"present_{s1.pk}": "on"})
+        self.assertNotEqual(dashboard_version(self.teacher.pk), before)
+
+    def test_unchanged_grid_writes_nothing(self):
+        (s1,) = self.enroll(1)
+        data = {f"present_{s1.pk}": "on", f"grade_{s1.pk}": "9"}
+        self.save(data)
+        # Savepoint + the two loads, no writes or rebuilds
+        self.assertLessEqual(self.save(data), 4)
+
+    def test_query_count_independent_of_roster_size(self):
+        small = self.enroll(3, prefix="a")
+        first_small = self.save({f"present_{s.pk}": "on" for s in small})
+        update_small = self.save({f"grade_{s.pk}": "4" for s in small})
+
+        LabParticipation.objects.all().delete()
+        LabReportGrade.objects.all().delete()
+        # Start from the same state: the first save also creates the day's activity row
+        CourseSemesterDailyActivity.objects.all().delete()
+        large = self.enroll(120, prefix="b")
+        first_large = self.save({f"present_{s.pk}": "on" for s in large})
+        update_large = self.save({f"grade_{s.pk}": "4" for s in large})
+
+        self.assertEqual(first_small, first_large)
+        self.assertEqual(update_small, update_large)
+        self.assertEqual(LabReportGrade.objects.filter(grade=4).count(), len(large))
@@ -0,0 +1,88 @@
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from lms_courses.models import (
+    Course,
+    CourseSemester,
+    CourseSemesterDailyActivity,
+    CourseSemesterStats,
+    FinalAssignment,
+    LabParticipation,
+    LabReportGrade,
+    LabSession,
+)
+from lms_courses.stats import compute_daily_activity, rebuild_stats
+
+
+class TestDailyActivityMaintenance(TestCase):
+    def setUp(self):
+        U = get_user_model()
+        self.teacher = U.objects.create_user(username="t", role="TEACHER")
+        self.s1 = U.objects.create_user(username="s1", role="STUDENT")
+        self.s2 = U.objects.create_user(username="s2", role="STUDENT")
+        course = Course.objects.create(code="CS1", title="T1")
+        self.cs = CourseSemester.objects.create(
+            course=course, year=2025, semester="WINTER", owner=self.teacher
+        )
+        self.session = LabSession.objects.create(
+            name="L1", week=1, date=date(2025, 1, 10), course_semester=self.cs
+        )
+
+    def activity(self) -> dict:
+        return {
+            row.date: tuple(getattr(row, name) for name in row.COUNTERS)
+            for row in CourseSemesterDailyActivity.objects.filter(course_semester=self.cs)
+            if any(getattr(row, name) for name in row.COUNTERS)
+        }
+
+    def assertMatchesSource(self):
+        fresh = {
+            row.date: tuple(getattr(row, name) for name in row.COUNTERS)
+            for row in compute_daily_activity([self.cs.pk])
+        }
+        self.assertEqual(self.activity(), fresh)
+
+    def test_writes_land_on_the_activity_day(self):
+        LabParticipation.objects.create(session=self.session, student=self.s1, present=True)
+        LabParticipation.objects.create(session=self.session, student=self.s2, present=False)
+        grade = LabReportGrade.objects.create(lab_report=self.session.report, student=self.s1)
+        self.assertEqual(self.activity(), {date(2025, 1, 10): (1, 0, 0)})
+
+        grade = LabReportGrade.objects.get(pk=grade.pk)
+        grade.grade = 8
+        grade.save()
+        fa = FinalAssignment.objects.create(
+            title="FA", max_grade=10, due_date=date(2025, 2, 1), course_semester=self.cs
+        )
+        fa.results.create(student=self.s1, submitted=True, grade=None)  # type: ignore
+        self.assertEqual(
+            self.activity(), {date(2025, 1, 10): (1, 1, 0), date(2025, 2, 1): (0, 0, 1)}
+        )
+        self.assertMatchesSource()
+
+        grade.delete()
+        self.assertMatchesSource()
+
+    def test_rescheduling_a_session_moves_its_activity(self):
+        LabParticipation.objects.create(session=self.session, student=self.s1, present=True)
+        session = LabSession.objects.get(pk=self.session.pk)
+        session.date = date(2025, 1, 17)
+        session.save()
+        self.assertEqual(self.activity(), {date(2025, 1, 17): (1, 0, 0)})
+
+    def test_missing_stats_row_rebuilds_without_double_counting(self):
+        CourseSemesterStats.objects.all().delete()
+        LabParticipation.objects.create(session=self.session, student=self.s1, present=True)
+        self.assertEqual(self.activity(), {date(2025, 1, 10): (1, 0, 0)})
+
+    def test_rebuild_replaces_drifted_rows(self):
+        LabParticipation.objects.create(session=self.session, student=self.s1, present=True)
+        CourseSemesterDailyActivity.objects.update(presences=40)
+        CourseSemesterDailyActivity.objects.create(
+            course_semester=self.cs, date=date(2024, 12, 1), grades_entered=3
+        )
+        rebuild_stats([self.cs.pk])
+        self.assertMatchesSource()
+        self.assertEqual(self.activity(), {date(2025, 1, 10): (1, 0, 0)})
@@ -0,0 +1,121 @@
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from lms_courses.models import (
+    Course,
+    CourseSemester,
+    CourseSemesterStats,
+    FinalAssignment,
+    LabParticipation,
+    LabReportGrade,
+    LabSession,
+)
+from lms_courses.stats import compute_stats, stats_for
+
+
+class TestCourseSemesterStatsMaintenance(TestCase):
+    def setUp(self):
+        U = get_user_model()
+        self.teacher = U.objects.create_user(username="t", role="TEACHER")
+        self.s1 = U.objects.create_user(username="s1", role="STUDENT")
+        self.s2 = U.objects.create_user(username="s2", role="STUDENT")
+        course = Course.objects.create(code="CS1", title="T1")
+        self.cs = CourseSemester.objects.create(
+            course=course, year=2025, semester="WINTER", owner=self.teacher
+        )
+        self.session = LabSession.objects.create(
+            name="L1", week=1, date=date(2025, 1, 10), course_semester=self.cs
+        )
+
+    def stats(self) -> dict:
+        row = CourseSemesterStats.objects.get(pk=self.cs.pk)
+        return {name: getattr(row, name) for name in CourseSemesterStats.COUNTERS}
+
+    def assertMatchesSource(self):
+        [fresh] = compute_stats([self.cs.pk])
+        expected = {name: getattr(fresh, name) for name in CourseSemesterStats.COUNTERS}
+        self.assertEqual(self.stats(), expected)
+
+    def test_row_created_with_course_semester(self):
+        self.assertEqual(self.stats()["students"], 0)
+
+    def test_enrollment_changes_both_directions(self):
+        self.cs.students.add(self.s1, self.s2)
+        self.assertEqual(self.stats()["students"], 2)
+        self.cs.students.remove(self.s1)
+        self.assertEqual(self.stats()["students"], 1)
+        self.s1.enrolled_course_semesters.add(self.cs)
+        self.assertEqual(self.stats()["students"], 2)
+        self.s2.enrolled_course_semesters.clear()
+        self.assertEqual(self.stats()["students"], 1)
+        self.cs.students.clear()
+        self.assertEqual(self.stats()["students"], 0)
+
+    def test_participation_and_grade_deltas(self):
+        part = LabParticipation.objects.create(session=self.session, student=self.s1, present=True)
+        LabParticipation.objects.create(session=self.session, student=self.s2, present=False)
+        grade = LabReportGrade.objects.create(lab_report=self.session.report, student=self.s1)
+        self.assertEqual(self.stats()["present_participations"], 1)
+        self.assertEqual(self.stats()["lab_ungraded"], 1)
+
+        # Update through a freshly loaded instance, as the views do
+        grade = LabReportGrade.objects.get(pk=grade.pk)
+        grade.grade = 7
+        grade.save()
+        part = LabParticipation.objects.get(pk=part.pk)
+        part.present = False
+        part.save()
+        self.assertMatchesSource()
+        self.assertEqual(self.stats()["lab_graded"], 1)
+        self.assertEqual(self.stats()["present_participations"], 0)
+
+        grade.delete()
+        self.assertMatchesSource()
+
+    def test_final_assignment_results(self):
+        fa = FinalAssignment.objects.create(
+            title="FA", max_grade=10, due_date=date(2025, 2, 1), course_semester=self.cs
+        )
+        r1 = fa.results.create(student=self.s1, submitted=True, grade=8)  # type: ignore
+        fa.results.create(student=self.s2, submitted=True, grade=None)  # type: ignore
+        r1.grade = 6
+        r1.save()
+        self.assertEqual(
+            (self.stats()["fa_submitted"], self.stats()["fa_graded"]),
+            (2, 1),
+        )
+        self.assertEqual(self.stats()["fa_grade_sum"], 6)
+        self.assertEqual(CourseSemesterStats.objects.get(pk=self.cs.pk).fa_avg, 6)
+        fa.delete()
+        self.assertMatchesSource()
+
+    def test_session_and_student_deletion_cascade(self):
+        self.cs.students.add(self.s1, self.s2)
+        LabParticipation.objects.create(session=self.session, student=self.s1, present=True)
+        LabReportGrade.objects.create(lab_report=self.session.report, student=self.s2, grade=4)
+        self.s2.delete()
+        self.assertMatchesSource()
+        self.session.delete()
+        self.assertMatchesSource()
+        self.assertEqual(self.stats()["students"], 1)
+
+    def test_missing_row_rebuilt_on_write_and_read(self):
+        CourseSemesterStats.objects.all().delete()
+        LabParticipation.objects.create(session=self.session, student=self.s1, present=True)
+        self.assertEqual(self.stats()["present_participations"], 1)
+        CourseSemesterStats.objects.all().delete()
+        cs = CourseSemester.objects.get(pk=self.cs.pk)
+        self.assertEqual(stats_for(cs).present_participations, 1)
+
+    def test_rebuild_command_repairs_drift(self):
+        self.cs.students.add(self.s1)
+        CourseSemesterStats.objects.filter(pk=self.cs.pk).update(students=99, lab_graded=5)
+        out = StringIO()
+        call_command("rebuild_course_semester_stats", stdout=out)
+        self.assertIn("Rebuilt stats for 1 course semester(s).", out.getvalue())
+        self.assertMatchesSource()
+        self.assertEqual(self.stats()["students"], 1)
@@ -0,0 +1,208 @@
+from contextlib import contextmanager
+from datetime import date
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from lms_courses.bulk import (
+    BulkWriteResult,
+    clamp_grade,
+    write_final_assignment_results,
+    write_lab_session_grid,
+)
+from lms_courses.models import (
+    Course,
+    CourseSemester,
+    CourseSemesterDailyActivity,
+    CourseSemesterStats,
+    FinalAssignment,
+    FinalAssignmentResult,
+    LabParticipation,
+    LabReport,
+    LabReportGrade,
+    LabSession,
+)
+from lms_courses.stats import compute_daily_activity, compute_stats
+from lms_users.models import Roles, User
+
+
+class TestWriteFinalAssignmentResults(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user("t", password="x", role=Roles.TEACHER)
+        self.cs = CourseSemester.objects.create(
+            course=Course.objects.create(code="CS1", title="T"),
+            year=2025,
+            semester="WINTER",
+            owner=self.teacher,
+        )
+        self.fa = FinalAssignment.objects.create(
+            course_semester=self.cs, title="FA", max_grade=20, due_date=date(2025, 2, 15)
+        )
+
+    def enroll(self, count: int, prefix: str = "s") -> list[int]:
+        students = User.objects.bulk_create(
+            [User(username=f"{prefix}{i}", role=Roles.STUDENT) for i in range(count)]
+        )
+        self.cs.students.add(*students)
+        return list(self.cs.students.order_by("pk").values_list("pk", flat=True))
+
+    def write(self, results: dict) -> tuple[BulkWriteResult, int]:
+        with CaptureQueriesContext(connection) as ctx:
+            summary = write_final_assignment_results(self.fa, results)
+        return summary, len(ctx.captured_queries)
+
+    def test_counts_and_clamping(self):
+        s1, s2, s3 = self.enroll(3)
+        summary, _ = self.write({s1: (True, 25), s2: (True, -3), s3: (False, None)})
+        self.assertEqual(summary, BulkWriteResult(created=3, updated=0, unchanged=0))
+        self.assertEqual(
+            dict(FinalAssignmentResult.objects.values_list("student_id", "grade")),
+            {s1: 20, s2: 0, s3: None},
+        )
+
+        summary, _ = self.write({s1: (True, 20), s2: (True, 12), s3: (False, None)})
+        self.assertEqual(summary, BulkWriteResult(created=0, updated=1, unchanged=2))
+        self.assertEqual(FinalAssignmentResult.objects.get(student_id=s2).grade, 12)
+
+    def test_stats_follow_deltas_without_recounting(self):
+        s1, s2 = self.enroll(2)
+        with mock.patch("lms_courses.signals.rebuild_stats") as rebuild:
+            self.write({s1: (True, 15), s2: (True, None)})
+            self.write({s1: (True, 11), s2: (False, None)})
+        rebuild.assert_not_called()
+        stats = CourseSemesterStats.objects.get(pk=self.cs.pk)
+        self.assertEqual((stats.fa_submitted, stats.fa_graded, stats.fa_grade_sum), (1, 1, 11))
+        day = CourseSemesterDailyActivity.objects.get(course_semester=self.cs)
+        self.assertEqual((day.date, day.submissions), (self.fa.due_date, 1))
+
+    def test_concurrent_rows_are_recounted_not_counted_as_created(self):
+        s1, s2 = self.enroll(2)
+        row = FinalAssignmentResult(final_assignment=self.fa, student_id=s1, submitted=True)
+        with race(row):
+            summary, _ = self.write({s1: (True, 15), s2: (True, 8)})
+        self.assertEqual(summary, BulkWriteResult(created=1, updated=1, unchanged=0))
+        stats = CourseSemesterStats.objects.get(pk=self.cs.pk)
+        (expected,) = compute_stats([self.cs.pk])
+        for name in CourseSemesterStats.COUNTERS:
+            self.assertEqual(getattr(stats, name), getattr(expected, name), name)
+
+    def test_unchanged_writes_nothing(self):
+        (s1,) = self.enroll(1)
+        self.write({s1: (True, 9)})
+        summary, queries = self.write({s1: (True, 9)})
+        self.assertEqual(summary, BulkWriteResult(created=0, updated=0, unchanged=1))
+        # Savepoint pair + the single load
+        self.assertLessEqual(queries, 3)
+
+    def test_query_count_independent_of_cohort_size(self):
+        small = self.enroll(3, prefix="a")
+        _, create_small = self.write({pk: (True, None) for pk in small})
+        _, update_small = self.write({pk: (True, 7) for pk in small})
+
+        FinalAssignmentResult.objects.all().delete()
+        # Start from the same state: the first write also creates the day's activity row
+        CourseSemesterDailyActivity.objects.all().delete()
+        large = self.enroll(150, prefix="b")
+        _, create_large = self.write({pk: (True, None) for pk in large})
+        _, update_large = self.write({pk: (True, 7) for pk in large})
+
+        self.assertEqual(create_small, create_large)
+        self.assertEqual(update_small, update_large)
+        self.assertEqual(FinalAssignmentResult.objects.filter(grade=7).count(), len(large))
+
+
+@contextmanager
+def race(row):
+    """Save ``row`` after the writer loaded the grid, as a concurrent request would."""
+
+    def clamp(grade, max_grade):
+        if row.pk is None:
+            row.save()
+        return clamp_grade(grade, max_grade)
+
+    with mock.patch("lms_courses.bulk.clamp_grade", side_effect=clamp):
+        yield
+
+
+def daily_counts(rows) -> dict:
+    """{date: counters} for the days that have any activity."""
+    counts = {row.date: tuple(getattr(row, name) for name in row.COUNTERS) for row in rows}
+    return {day: values for day, values in counts.items() if any(values)}
+
+
+class TestWriteLabSessionGrid(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user("t", password="x", role=Roles.TEACHER)
+        self.cs = CourseSemester.objects.create(
+            course=Course.objects.create(code="CS1", title="T"),
+            year=2025,
+            semester="WINTER",
+            owner=self.teacher,
+        )
+        self.session = LabSession.objects.create(
+            name="Lab 1", week=1, date=date(2025, 1, 7), course_semester=self.cs
+        )
+        self.s1, self.s2 = User.objects.bulk_create(
+            [User(username=f"s{i}", role=Roles.STUDENT) for i in range(2)]
+        )
+        self.cs.students.add(self.s1, self.s2)
+
+    def assert_read_models_match_source(self):
+        stats = CourseSemesterStats.objects.get(pk=self.cs.pk)
+        (expected,) = compute_stats([self.cs.pk])
+        for name in CourseSemesterStats.COUNTERS:
+            self.assertEqual(getattr(stats, name), getattr(expected, name), name)
+        stored = CourseSemesterDailyActivity.objects.filter(course_semester=self.cs)
+        self.assertEqual(daily_counts(stored), daily_counts(compute_daily_activity([self.cs.pk])))
+
+    def test_counters_follow_deltas_without_recounting(self):
+        report = self.session.report
+        with mock.patch("lms_courses.signals.rebuild_stats") as rebuild:
+            write_lab_session_grid(
+                self.session, report, {self.s1.pk: {"present": True, "grade": 7}, self.s2.pk: {}}
+            )
+            self.assert_read_models_match_source()
+            write_lab_session_grid(
+                self.session,
+                report,
+                {self.s1.pk: {"present": False}, self.s2.pk: {"present": True, "grade": 3}},
+            )
+            self.assert_read_models_match_source()
+        rebuild.assert_not_called()
+
+    def test_default_cells_do_not_overwrite_concurrent_rows(self):
+        report = self.session.report
+        row = LabParticipation(session=self.session, student=self.s1, present=True)
+        with race(row):
+            summary = write_lab_session_grid(self.session, report, {self.s1.pk: {"grade": 6}})
+        self.assertEqual(summary, BulkWriteResult(created=1, updated=0, unchanged=1))
+        self.assertTrue(LabParticipation.objects.get(student=self.s1).present)
+        self.assert_read_models_match_source()
+
+    def test_submitted_cells_overwrite_concurrent_rows_without_double_counting(self):
+        report = self.session.report
+        row = LabReportGrade(lab_report=report, student=self.s1, grade=5)
+        with race(row):
+            summary = write_lab_session_grid(
+                self.session, report, {self.s1.pk: {"present": True, "grade": 6}}
+            )
+        self.assertEqual(summary, BulkWriteResult(created=1, updated=1, unchanged=0))
+        self.assertEqual(LabReportGrade.objects.get(student=self.s1).grade, 6)
+        self.assert_read_models_match_source()
+
+    def test_default_report_created_in_the_writer_transaction(self):
+        LabReport.objects.filter(session=self.session).delete()
+        session = LabSession.objects.get(pk=self.session.pk)
+        with mock.patch.object(
+            LabParticipation.objects, "bulk_create", side_effect=RuntimeError("boom")
+        ):
+            with self.assertRaises(RuntimeError):
+                write_lab_session_grid(session, None, {self.s1.pk: {"present": True}})
+        self.assertFalse(LabReport.objects.filter(session=session).exists())
+
+        write_lab_session_grid(session, None, {self.s1.pk: {"grade": 4}})
+        report = LabReport.objects.get(session=session)
+        self.assertEqual((report.max_grade, report.due_date), (10, session.date))
+        self.assertEqual(report.grades.get().grade, 4)
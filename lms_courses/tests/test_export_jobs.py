@@ -0,0 +1,209 @@
+import io
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from lms_courses import export_jobs
+from lms_courses.export_jobs import enqueue_export, run_export_job
+from lms_courses.models import (
+    Course,
+    CourseSemester,
+    ExportJob,
+    LabParticipation,
+    LabSession,
+)
+from lms_users.models import Roles, User
+
+
+class TestExportJobs(TestCase):
+    def setUp(self):
+        self.export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.export_root, ignore_errors=True)
+        settings_override = override_settings(
+            EXPORT_ROOT=self.export_root, EXPORT_JOB_ROW_THRESHOLD=0
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.teacher = User.objects.create_user("teach", password="x", role=Roles.TEACHER)
+        self.client.login(username="teach", password="x")
+        self.cs = CourseSemester.objects.create(
+            course=Course.objects.create(code="CS200", title="Data"),
+            year=2025,
+            semester="WINTER",
+            owner=self.teacher,
+        )
+        self.student = User.objects.create_user("s1", password="x", role=Roles.STUDENT)
+        self.cs.students.add(self.student)
+        session = LabSession.objects.create(
+            name="L1", week=1, date=date(2025, 1, 10), course_semester=self.cs
+        )
+        LabParticipation.objects.create(session=session, student=self.student, present=True)
+        self.export_url = reverse(
+            "lms_courses_teacher:course_semester_export", kwargs={"pk": self.cs.pk}
+        )
+
+    def queue(self, fmt="csv") -> ExportJob:
+        resp = self.client.get(self.export_url, {"format": fmt})
+        job = ExportJob.objects.get(fmt=fmt)
+        self.assertRedirects(resp, reverse("lms_courses_teacher:export_job_detail", args=[job.pk]))
+        return job
+
+    def status(self, job: ExportJob) -> dict:
+        url = reverse("lms_courses_teacher:export_job_status", args=[job.pk])
+        return self.client.get(url).json()
+
+    def test_large_export_is_queued_once(self):
+        job = self.queue()
+        self.assertEqual((job.status, job.course_semester, job.rows_total), ("PENDING", self.cs, 1))
+        self.queue()
+        self.assertEqual(ExportJob.objects.count(), 1)
+        self.assertEqual(self.status(job)["download_url"], None)
+
+        detail = self.client.get(reverse("lms_courses_teacher:export_job_detail", args=[job.pk]))
+        self.assertContains(detail, 'data-testid="export-job-status"')
+
+    def test_small_export_stays_inline(self):
+        with override_settings(EXPORT_JOB_ROW_THRESHOLD=1000):
+            resp = self.client.get(self.export_url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_worker_builds_csv_matching_inline_export(self):
+        job = self.queue()
+        # Built before the job finishes, so it is not served from the job's file
+        with override_settings(EXPORT_JOB_ROW_THRESHOLD=1000):
+            inline = self.client.get(self.export_url).getvalue()
+        out = io.StringIO()
+        call_command("run_export_jobs", stdout=out)
+        self.assertIn("Built 1 export job(s).", out.getvalue())
+
+        status = self.status(job)
+        self.assertEqual((status["status"], status["progress"]), ("DONE", 100))
+        download = self.client.get(status["download_url"])
+        self.assertIn(f"course_semester_{self.cs.pk}", download["Content-Disposition"])
+        self.assertEqual(download.getvalue(), inline)
+
+    def test_worker_builds_xlsx(self):
+        from openpyxl import load_workbook
+
+        job = self.queue("xlsx")
+        self.assertTrue(run_export_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.DONE)
+        with job.file.open("rb") as f:
+            wb = load_workbook(io.BytesIO(f.read()), read_only=True)
+        rows = list(wb["Παρουσίες"].iter_rows(values_only=True))
+        self.assertEqual(rows[1:], [(1, "s1", "Ναι")])
+
+    def test_finished_job_without_its_file_is_rebuilt(self):
+        job = self.queue()
+        run_export_job(job)
+        job.refresh_from_db()
+        job.file.storage.delete(job.file.name)
+
+        with override_settings(EXPORT_JOB_ROW_THRESHOLD=1000):
+            resp = self.client.get(self.export_url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"1,s1,1", resp.getvalue())
+
+        resp = self.client.get(self.export_url)
+        queued = ExportJob.objects.get(status=ExportJob.PENDING)
+        self.assertRedirects(
+            resp, reverse("lms_courses_teacher:export_job_detail", args=[queued.pk])
+        )
+
+    def test_finished_file_is_served_until_the_data_changes(self):
+        job = self.queue()
+        run_export_job(job)
+        job.refresh_from_db()
+        self.assertTrue(job.etag)
+
+        resp = self.client.get(self.export_url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["ETag"], f'"{job.etag}"')
+        self.assertIn(f"course_semester_{self.cs.pk}.csv", resp["Content-Disposition"])
+        self.assertIn(b"1,s1,1", resp.getvalue())
+        self.assertEqual(ExportJob.objects.count(), 1)
+
+        participation = LabParticipation.objects.get()
+        participation.present = False
+        participation.save()
+        resp = self.client.get(self.export_url)
+        queued = ExportJob.objects.get(status=ExportJob.PENDING)
+        self.assertRedirects(
+            resp, reverse("lms_courses_teacher:export_job_detail", args=[queued.pk])
+        )
+
+    def test_claimed_job_is_not_built_twice(self):
+        job = self.queue()
+        self.assertTrue(run_export_job(job))
+        self.assertFalse(run_export_job(job))
+
+    def test_failure_is_recorded(self):
+        job = self.queue()
+        with (
+            mock.patch.dict(
+                export_jobs._BUILDERS,
+                {ExportJob.KIND_COURSE_SEMESTER: mock.Mock(side_effect=RuntimeError("boom"))},
+            ),
+            self.assertLogs("lms_courses.export_jobs", "ERROR"),
+        ):
+            run_export_job(job)
+        status = self.status(job)
+        self.assertEqual((status["status"], status["error"]), ("FAILED", "boom"))
+        download = reverse("lms_courses_teacher:export_job_download", args=[job.pk])
+        self.assertEqual(self.client.get(download).status_code, 404)
+
+    def test_job_whose_worker_died_is_failed_and_not_reused(self):
+        stale = self.queue()
+        ExportJob.objects.filter(pk=stale.pk).update(
+            status=ExportJob.RUNNING, started_at=timezone.now() - timedelta(hours=2)
+        )
+        self.client.get(self.export_url)
+        fresh = ExportJob.objects.get(status=ExportJob.PENDING)
+        self.assertNotEqual(fresh.pk, stale.pk)
+
+        out = io.StringIO()
+        call_command("run_export_jobs", stdout=out)
+        self.assertIn("Failed 1 stale and deleted 0 expired", out.getvalue())
+        self.assertEqual(self.status(stale)["status"], "FAILED")
+        self.assertEqual(self.status(fresh)["status"], "DONE")
+
+    def test_running_job_within_its_lease_is_reused(self):
+        job = self.queue()
+        ExportJob.objects.filter(pk=job.pk).update(
+            status=ExportJob.RUNNING, started_at=timezone.now() - timedelta(minutes=5)
+        )
+        self.assertEqual(self.queue().pk, job.pk)
+        self.assertEqual(export_jobs.fail_stale_jobs(), 0)
+
+    def test_expired_exports_are_deleted_with_their_files(self):
+        job = self.queue()
+        run_export_job(job)
+        job.refresh_from_db()
+        path = job.file.path
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(export_jobs.purge_expired_exports(), 0)
+
+        ExportJob.objects.filter(pk=job.pk).update(finished_at=timezone.now() - timedelta(days=8))
+        self.assertEqual(export_jobs.purge_expired_exports(), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_jobs_are_private_to_their_owner(self):
+        job = enqueue_export(
+            self.teacher, ExportJob.KIND_COURSE_SEMESTER, "csv", course_semester=self.cs
+        )
+        User.objects.create_user("other", password="x", role=Roles.TEACHER)
+        self.client.login(username="other", password="x")
+        for name in ("export_job_detail", "export_job_status", "export_job_download"):
+            url = reverse(f"lms_courses_teacher:{name}", args=[job.pk])
+            self.assertEqual(self.client.get(url).status_code, 404, name)
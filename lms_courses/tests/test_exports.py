@@ -1,11 +1,19 @@
+import codecs
+import csv
+import io
 from datetime import date, timedelta
 
-from django.test import TestCase
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from lms_courses.bulk import write_lab_session_grid
+from lms_courses.exports import ROWS_PER_CHUNK, iter_csv
 from lms_courses.models import (
     Course,
     CourseSemester,
+    CourseSemesterStats,
     FinalAssignment,
     FinalAssignmentResult,
     LabParticipation,
@@ -64,7 +72,7 @@ class TestCourseSemesterExports(TestCase):
         resp = self.client.get(url)
         self.assertEqual(resp.status_code, 200)
         self.assertIn("text/csv", resp["Content-Type"])  # type: ignore[index]
-        body = resp.content.decode("utf-8-sig")
+        body = resp.getvalue().decode("utf-8-sig")
         self.assertIn("course_code,course_title,year,semester", body)
         self.assertIn("CS200", body)
         self.assertIn("sessions: week,name,date,present_count,graded_count".replace(",", ","), body)
@@ -83,8 +91,232 @@ class TestCourseSemesterExports(TestCase):
             "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             resp["Content-Type"],
         )  # type: ignore[index]
-        self.assertGreater(len(resp.content), 100)
+        self.assertGreater(len(resp.getvalue()), 100)
         self.assertIn(
             "attachment; filename=course_semester_",
             resp["Content-Disposition"],
         )  # type: ignore[index]
+
+    def test_course_semester_export_csv_streams_bom_first(self):
+        url = reverse("lms_courses_teacher:course_semester_export", kwargs={"pk": self.cs.pk})
+        resp = self.client.get(url)
+        self.assertTrue(resp.streaming)
+        chunks = iter(resp.streaming_content)  # type: ignore[attr-defined]
+        self.assertEqual(next(chunks), codecs.BOM_UTF8)
+        body = b"".join(chunks).decode("utf-8")
+        self.assertIn("\r\n1,s1,1\r\n1,s2,0\r\n", body)
+        self.assertIn("\r\ns1,1,9\r\ns2,0,\r\n", body)
+
+    def test_xlsx_is_served_from_a_file_with_all_sheets(self):
+        from openpyxl import load_workbook
+
+        url = reverse("lms_courses_teacher:course_semester_export", kwargs={"pk": self.cs.pk})
+        resp = self.client.get(url, {"format": "xlsx"})
+        self.assertTrue(resp.streaming)
+        body = resp.getvalue()
+        self.assertEqual(int(resp["Content-Length"]), len(body))
+
+        wb = load_workbook(io.BytesIO(body), read_only=True)
+        self.assertEqual(
+            wb.sheetnames,
+            ["Στοιχεία", "Συνεδρίες", "Παρουσίες", "Βαθμοί εργαστηρίων", "Τελική εργασία"],
+        )
+        rows = list(wb["Παρουσίες"].iter_rows(values_only=True))
+        self.assertEqual(rows[1:], [(1, "s1", "Ναι"), (1, "s2", "Όχι")])
+        rows = list(wb["Τελική εργασία"].iter_rows(values_only=True))
+        self.assertEqual(rows[1], ("s1", "Ναι", 9))
+
+    def test_unchanged_export_answers_not_modified(self):
+        url = reverse("lms_courses_teacher:course_semester_export", kwargs={"pk": self.cs.pk})
+        resp = self.client.get(url)
+        etag, last_modified = resp["ETag"], resp["Last-Modified"]
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp["ETag"], etag)
+        self.assertEqual(resp.content, b"")
+        # Session, user, course semester, fingerprint; the rows are never read
+        self.assertLessEqual(len(ctx.captured_queries), 4)
+
+        resp = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(resp.status_code, 304)
+
+    def test_etag_follows_edits_deletes_and_variant(self):
+        url = reverse("lms_courses_teacher:course_semester_export", kwargs={"pk": self.cs.pk})
+
+        def etag(**params):
+            return self.client.get(url, params).headers["ETag"]
+
+        first = etag()
+        self.assertEqual(etag(), first)
+        self.assertNotEqual(etag(format="xlsx"), first)
+        self.assertNotEqual(etag(layout="gradebook"), first)
+
+        session = self.cs.sessions.get()  # type: ignore[attr-defined]
+        write_lab_session_grid(session, session.report, {self.s2.pk: {"present": True}})
+        edited = etag()
+        self.assertNotEqual(edited, first)
+
+        FinalAssignmentResult.objects.filter(student=self.s2).delete()
+        self.assertNotEqual(etag(), edited)
+
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=first)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_etag_follows_counter_neutral_edits_roster_and_usernames(self):
+        url = reverse("lms_courses_teacher:course_semester_export", kwargs={"pk": self.cs.pk})
+        seen = [self.client.get(url).headers["ETag"]]
+
+        def assert_changed(message):
+            resp = self.client.get(url)
+            self.assertNotIn(resp.headers["ETag"], seen, message)
+            seen.append(resp.headers["ETag"])
+
+        grade = LabReportGrade.objects.get(student=self.s1)
+        grade.grade = 9  # still graded: no counter moves
+        grade.save()
+        assert_changed("grade value")
+
+        # Same roster size and id sum as before
+        s3 = User.objects.create_user("s3", password="x", role=Roles.STUDENT)
+        s0 = User.objects.create_user("s0", password="x", role=Roles.STUDENT)
+        self.cs.students.remove(self.s1, self.s2)
+        self.cs.students.add(s3, s0)
+        self.cs.students.remove(s3, s0)
+        self.cs.students.add(self.s1, self.s2)
+        assert_changed("roster round trip")
+
+        self.s2.username = "s2-renamed"
+        self.s2.save()
+        assert_changed("username")
+
+        self.s2.save(update_fields=["last_login"])
+        self.assertEqual(self.client.get(url).headers["ETag"], seen[-1])
+
+        session = self.cs.sessions.get()  # type: ignore[attr-defined]
+        session.name = "L1 (moved)"
+        session.save()
+        assert_changed("session name")
+
+    def test_course_rename_bumps_the_data_version(self):
+        version = CourseSemesterStats.objects.get(course_semester=self.cs).data_version
+        self.course.title = "Data Structures"
+        self.course.save()
+        stats = CourseSemesterStats.objects.get(course_semester=self.cs)
+        self.assertGreater(stats.data_version, version)
+
+    def test_user_save_does_not_read_the_old_username(self):
+        user = User.objects.get(pk=self.s1.pk)
+        user.first_name = "Sofia"
+        with CaptureQueriesContext(connection) as ctx:
+            user.save()
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+class TestIterCsv(SimpleTestCase):
+    def test_rows_are_pulled_lazily_in_chunks(self):
+        pulled = []
+
+        def rows():
+            for i in range(ROWS_PER_CHUNK * 2 + 1):
+                pulled.append(i)
+                yield [i, "x"]
+
+        chunks = iter_csv(rows())
+        self.assertEqual(next(chunks), "\ufeff")
+        self.assertEqual(pulled, [])
+        first = next(chunks)
+        self.assertEqual(len(pulled), ROWS_PER_CHUNK)
+        self.assertTrue(first.startswith("0,x\r\n1,x\r\n"))
+        self.assertEqual(len(list(chunks)), 2)
+
+
+class TestGradebookExport(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user("teach", password="x", role=Roles.TEACHER)
+        self.client.login(username="teach", password="x")
+        self.cs = CourseSemester.objects.create(
+            course=Course.objects.create(code="CS300", title="Wide"),
+            year=2025,
+            semester="WINTER",
+            owner=self.teacher,
+        )
+        self.w1 = LabSession.objects.create(
+            name="L1", week=1, date=date(2025, 1, 7), course_semester=self.cs
+        )
+        self.w2 = LabSession.objects.create(
+            name="L2", week=2, date=date(2025, 1, 14), course_semester=self.cs
+        )
+        self.url = reverse("lms_courses_teacher:course_semester_export", kwargs={"pk": self.cs.pk})
+
+    def rows(self, **params) -> list[list[str]]:
+        resp = self.client.get(self.url, {"layout": "gradebook", **params})
+        self.assertIn("_gradebook.", resp["Content-Disposition"])
+        return list(csv.reader(io.StringIO(resp.getvalue().decode("utf-8-sig"))))
+
+    def test_one_row_per_student_with_session_columns(self):
+        bob, amy, dropped = (
+            User.objects.create_user(name, password="x", role=Roles.STUDENT)
+            for name in ("bob", "amy", "zed")
+        )
+        self.cs.students.add(bob, amy)
+        LabParticipation.objects.create(session=self.w1, student=bob, present=True)
+        LabParticipation.objects.create(session=self.w2, student=amy, present=False)
+        # Rows of a student no longer enrolled are left out of the merge
+        LabParticipation.objects.create(session=self.w1, student=dropped, present=True)
+        LabReportGrade.objects.create(lab_report=self.w2.report, student=bob, grade=0)
+        LabReportGrade.objects.create(lab_report=self.w1.report, student=amy, grade=7)
+        fa = FinalAssignment.objects.create(
+            title="FA", max_grade=10, due_date=date(2025, 2, 1), course_semester=self.cs
+        )
+        FinalAssignmentResult.objects.create(
+            final_assignment=fa, student=bob, submitted=True, grade=9
+        )
+
+        self.assertEqual(
+            self.rows(),
+            [
+                [
+                    "student",
+                    "W1 L1: present",
+                    "W1 L1: grade",
+                    "W2 L2: present",
+                    "W2 L2: grade",
+                    "fa_submitted",
+                    "fa_grade",
+                ],
+                ["amy", "", "7", "0", "", "0", ""],
+                ["bob", "1", "", "", "0", "1", "9"],
+            ],
+        )
+
+    def test_query_count_independent_of_roster(self):
+        def queries() -> int:
+            with CaptureQueriesContext(connection) as ctx:
+                self.rows()
+            return len(ctx.captured_queries)
+
+        self.cs.students.add(User.objects.create_user("s0", password="x", role=Roles.STUDENT))
+        few = queries()
+        students = User.objects.bulk_create(
+            [User(username=f"b{i}", role=Roles.STUDENT) for i in range(60)]
+        )
+        self.cs.students.add(*students)
+        LabParticipation.objects.bulk_create(
+            [LabParticipation(session=self.w1, student=s, present=True) for s in students]
+        )
+        self.assertEqual(queries(), few)
+        self.assertEqual(len(self.rows()), 62)
+
+    def test_xlsx_has_single_gradebook_sheet(self):
+        from openpyxl import load_workbook
+
+        amy = User.objects.create_user("amy", password="x", role=Roles.STUDENT)
+        self.cs.students.add(amy)
+        LabParticipation.objects.create(session=self.w1, student=amy, present=True)
+        resp = self.client.get(self.url, {"layout": "gradebook", "format": "xlsx"})
+        wb = load_workbook(io.BytesIO(resp.getvalue()), read_only=True)
+        self.assertEqual(wb.sheetnames, ["Βαθμολόγιο"])
+        rows = list(wb["Βαθμολόγιο"].iter_rows(values_only=True))
+        self.assertEqual(rows[1], ("amy", 1, None, None, None, 0, None))
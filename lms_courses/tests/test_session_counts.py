@@ -0,0 +1,108 @@
+from datetime import date, timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from lms_courses.models import (
+    Course,
+    CourseSemester,
+    LabParticipation,
+    LabReportGrade,
+    LabSession,
+)
+from lms_users.models import Roles, User
+
+
+class TestLabSessionCounts(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user("t", password="x", role=Roles.TEACHER)
+        self.cs = CourseSemester.objects.create(
+            course=Course.objects.create(code="CS1", title="T"),
+            year=2025,
+            semester="WINTER",
+            owner=self.teacher,
+        )
+        self.students = User.objects.bulk_create(
+            [User(username=f"s{i}", role=Roles.STUDENT) for i in range(3)]
+        )
+        self.cs.students.add(*self.students)
+
+    def add_sessions(self, count: int) -> None:
+        start = self.cs.sessions.count()  # type: ignore[attr-defined]
+        for week in range(start + 1, start + count + 1):
+            session = LabSession.objects.create(
+                name=f"L{week}",
+                week=week,
+                date=date(2025, 1, 1) + timedelta(weeks=week),
+                course_semester=self.cs,
+            )
+            LabParticipation.objects.bulk_create(
+                [
+                    LabParticipation(session=session, student=s, present=i != 0)
+                    for i, s in enumerate(self.students)
+                ]
+            )
+            LabReportGrade.objects.bulk_create(
+                [
+                    LabReportGrade(lab_report=session.report, student=s, grade=i or None)
+                    for i, s in enumerate(self.students)
+                ]
+            )
+
+    def queries(self, url: str) -> int:
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+            if resp.streaming:
+                resp.getvalue()
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assert_budget_flat(self, url: str) -> None:
+        self.add_sessions(2)
+        few = self.queries(url)
+        self.add_sessions(11)
+        self.assertEqual(self.queries(url), few)
+
+    def test_with_counts_matches_properties(self):
+        self.add_sessions(2)
+        LabParticipation.objects.filter(student=self.students[1]).first().delete()  # type: ignore
+        annotated = {s.pk: s for s in LabSession.objects.with_counts()}
+        for session in LabSession.objects.all():
+            self.assertEqual(annotated[session.pk].present_count, session.present_count)
+            self.assertEqual(annotated[session.pk].graded_count, session.graded_count)
+        self.assertEqual(
+            sorted((s.present_count, s.graded_count) for s in annotated.values()),
+            [(1, 2), (2, 2)],
+        )
+
+    def test_annotated_counts_need_no_queries(self):
+        self.add_sessions(1)
+        session = LabSession.objects.with_counts().get()
+        with self.assertNumQueries(0):
+            self.assertEqual((session.present_count, session.graded_count), (2, 2))
+
+    def test_course_detail_budget(self):
+        self.client.force_login(self.teacher)
+        self.assert_budget_flat(
+            reverse("lms_courses_teacher:course_semester_teacher_detail", args=[self.cs.pk])
+        )
+
+    def test_csv_export_budget(self):
+        self.client.force_login(self.teacher)
+        self.assert_budget_flat(
+            reverse("lms_courses_teacher:course_semester_export", args=[self.cs.pk])
+        )
+
+    def test_xlsx_export_budget(self):
+        self.client.force_login(self.teacher)
+        self.assert_budget_flat(
+            reverse("lms_courses_teacher:course_semester_export", args=[self.cs.pk])
+            + "?format=xlsx"
+        )
+
+    def test_admin_changelist_budget(self):
+        admin = User.objects.create_superuser("admin", password="x", email="a@example.com")
+        self.client.force_login(admin)
+        self.assert_budget_flat(reverse("admin:lms_courses_labsession_changelist"))
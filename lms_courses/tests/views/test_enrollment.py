@@ -0,0 +1,42 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from lms_courses.models import Course, CourseSemester
+from lms_users.models import Roles, User
+from lms_users.services.keycloak import keycloak_breaker
+
+
+@override_settings(E2E_TEST_LOGIN=False, KEYCLOAK_CIRCUIT_MIN_CALLS=1)
+class EnrollmentKeycloakOutageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.teacher = User.objects.create_user("teach", password="x", role=Roles.TEACHER)
+        self.client.login(username="teach", password="x")
+        self.cs = CourseSemester.objects.create(
+            course=Course.objects.create(code="CS300", title="Nets"),
+            year=2025,
+            semester="WINTER",
+            owner=self.teacher,
+        )
+        User.objects.create_user("alice", password="x", role=Roles.STUDENT)
+        self.url = reverse("lms_courses_teacher:enroll_student", kwargs={"pk": self.cs.pk})
+        keycloak_breaker().record_failure()  # opens it: one failing call is enough here
+
+    def test_search_lists_local_students_with_a_notice(self):
+        with patch("lms_users.services.keycloak.get_session") as get_session:
+            resp = self.client.get(self.url, {"q": "al"})
+        get_session.return_value.get.assert_not_called()
+        self.assertContains(resp, 'data-testid="search-degraded"')
+        self.assertContains(resp, "alice")
+
+    def test_enrolling_an_unknown_student_fails_fast_with_a_clear_error(self):
+        with patch("lms_users.services.keycloak.get_session") as get_session:
+            resp = self.client.post(self.url, {"username": "newcomer"})
+        get_session.return_value.get.assert_not_called()
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "Identity provider unavailable")
+        self.assertFalse(self.cs.students.exists())
@@ -41,3 +41,17 @@ class TestFinalAssignmentManageView(TestCase):
         self.assertEqual(resp4.status_code, 200)
         self.assertContains(resp4, f'name="submitted_{s1.pk}" checked')
         self.assertContains(resp4, f'name="fa_grade_{s1.pk}" value="17"')
+
+    def test_post_reports_summary(self):
+        s1 = User.objects.create_user(username="s1", password="x", role=Roles.STUDENT)
+        s2 = User.objects.create_user(username="s2", password="x", role=Roles.STUDENT)
+        self.cs.students.add(s1, s2)
+        url = reverse("lms_courses_teacher:final_assignment_manage", args=[self.cs.pk])
+        self.client.post(url, {f"submitted_{s1.pk}": "on", f"fa_grade_{s1.pk}": "30"})
+        resp = self.client.post(
+            url,
+            {f"submitted_{s1.pk}": "on", f"fa_grade_{s1.pk}": "20", f"fa_grade_{s2.pk}": "5"},
+            follow=True,
+        )
+        self.assertContains(resp, 'data-testid="flash-message"')
+        self.assertContains(resp, "0 νέα, 1 ενημερώσεις, 1 αμετάβλητα")
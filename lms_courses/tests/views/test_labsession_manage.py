@@ -1,7 +1,20 @@
-from django.test import TestCase
+import json
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from lms_courses.models import Course, CourseSemester, LabSession
+from lms_courses.models import (
+    Course,
+    CourseSemester,
+    CourseSemesterDailyActivity,
+    LabParticipation,
+    LabReportGrade,
+    LabSession,
+    LabSessionQuerySet,
+)
 from lms_users.models import Roles, User
 
 
@@ -47,3 +60,181 @@ class TestLabSessionManageView(TestCase):
         # Grade field should have value=8
         self.assertContains(resp2, f'name="grade_{s1.id}"')
         self.assertContains(resp2, f'name="grade_{s1.id}" value="8"')
+
+
+class TestLabSessionGridPatch(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username="t1", password="x", role=Roles.TEACHER)
+        self.client.login(username="t1", password="x")
+        self.cs = CourseSemester.objects.create(
+            course=Course.objects.create(code="CS401", title="Programming I"),
+            year=2025,
+            semester="WINTER",
+            owner=self.teacher,
+        )
+        self.session = LabSession.objects.create(
+            name="Lab A", week=1, date="2025-01-07", course_semester=self.cs
+        )
+        self.url = reverse(
+            "lms_courses_teacher:lab_session_manage", args=[self.cs.pk, self.session.pk]
+        )
+        self.s1 = User.objects.create_user(username="s1", password="x", role=Roles.STUDENT)
+        self.s2 = User.objects.create_user(username="s2", password="x", role=Roles.STUDENT)
+        self.cs.students.add(self.s1, self.s2)
+
+    def patch(self, body):
+        return self.client.patch(
+            self.url, json.dumps(body) if not isinstance(body, str) else body, "application/json"
+        )
+
+    def test_writes_skip_the_session_counters(self):
+        with mock.patch.object(
+            LabSessionQuerySet, "with_counts", autospec=True, side_effect=lambda qs: qs
+        ) as with_counts:
+            self.assertEqual(self.patch({"cells": []}).status_code, 200)
+            with_counts.assert_not_called()
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+            with_counts.assert_called_once()
+
+    def test_writes_only_sent_cells(self):
+        resp = self.patch({"cells": [{"student_id": self.s1.pk, "present": True}]})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {"created": 2, "updated": 0, "unchanged": 0})
+        self.assertFalse(LabParticipation.objects.filter(student=self.s2).exists())
+
+        # A grade-only cell keeps the stored attendance
+        resp = self.patch({"cells": [{"student_id": self.s1.pk, "grade": 9}]})
+        self.assertEqual(resp.json(), {"created": 0, "updated": 1, "unchanged": 1})
+        self.assertTrue(LabParticipation.objects.get(student=self.s1).present)
+        self.assertEqual(LabReportGrade.objects.get(student=self.s1).grade, 9)
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.present_count, self.session.graded_count), (1, 1))
+
+    def test_rejects_invalid_cells(self):
+        outsider = User.objects.create_user(username="s3", password="x", role=Roles.STUDENT)
+        for body in (
+            "not json",
+            {"cells": {"student_id": self.s1.pk}},
+            {"cells": [{"student_id": "x"}]},
+            {"cells": [{"student_id": self.s1.pk, "grade": 11}]},
+            {"cells": [{"student_id": self.s1.pk, "grade": True}]},
+            {"cells": [{"student_id": self.s1.pk, "present": "on"}]},
+            {"cells": [{"student_id": outsider.pk, "present": True}]},
+        ):
+            with self.subTest(body=body):
+                resp = self.patch(body)
+                self.assertEqual(resp.status_code, 400)
+                self.assertTrue(resp.json()["errors"])
+        self.assertFalse(LabParticipation.objects.exists())
+
+    def test_other_teacher_gets_404(self):
+        User.objects.create_user(username="t2", password="x", role=Roles.TEACHER)
+        self.client.login(username="t2", password="x")
+        resp = self.patch({"cells": [{"student_id": self.s1.pk, "present": True}]})
+        self.assertEqual(resp.status_code, 404)
+
+    def test_query_count_independent_of_roster_size(self):
+        def queries(students):
+            cells = [{"student_id": s.pk, "present": True, "grade": 5} for s in students]
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.patch({"cells": cells}).status_code, 200)
+            return len(ctx.captured_queries)
+
+        few = queries([self.s1])
+        # Start from the same state: the first write also creates the day's activity row
+        LabParticipation.objects.all().delete()
+        LabReportGrade.objects.all().delete()
+        CourseSemesterDailyActivity.objects.all().delete()
+        many = User.objects.bulk_create(
+            [User(username=f"b{i}", role=Roles.STUDENT) for i in range(100)]
+        )
+        self.cs.students.add(*many)
+        self.assertEqual(queries(many), few)
+
+
+@override_settings(LAB_GRID_PAGE_SIZE=3)
+class TestLabSessionGridPaging(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username="t1", password="x", role=Roles.TEACHER)
+        self.client.login(username="t1", password="x")
+        self.cs = CourseSemester.objects.create(
+            course=Course.objects.create(code="CS401", title="Programming I"),
+            year=2025,
+            semester="WINTER",
+            owner=self.teacher,
+        )
+        self.session = LabSession.objects.create(
+            name="Lab A", week=1, date="2025-01-07", course_semester=self.cs
+        )
+        self.url = reverse(
+            "lms_courses_teacher:lab_session_manage", args=[self.cs.pk, self.session.pk]
+        )
+        self.students = User.objects.bulk_create(
+            [User(username=f"s{i:02d}", role=Roles.STUDENT) for i in range(7)]
+        )
+        self.cs.students.add(*self.students)
+
+    def names(self, resp) -> list[str]:
+        return [s.username for s in resp.context["students"]]
+
+    def test_pages_forward_and_back(self):
+        first = self.client.get(self.url)
+        self.assertEqual(self.names(first), ["s00", "s01", "s02"])
+        self.assertIsNone(first.context["prev_cursor"])
+        self.assertContains(first, 'data-testid="lab-grid-next"')
+
+        second = self.client.get(self.url, {"after": first.context["next_cursor"]})
+        self.assertEqual(self.names(second), ["s03", "s04", "s05"])
+        last = self.client.get(self.url, {"after": second.context["next_cursor"]})
+        self.assertEqual(self.names(last), ["s06"])
+        self.assertIsNone(last.context["next_cursor"])
+
+        back = self.client.get(self.url, {"before": last.context["prev_cursor"]})
+        self.assertEqual(self.names(back), ["s03", "s04", "s05"])
+        self.assertEqual(back.context["prev_cursor"], "s03")
+
+    def test_search_filters_roster(self):
+        User.objects.filter(username="s05").update(last_name="Papadopoulos")
+        resp = self.client.get(self.url, {"q": "papad"})
+        self.assertEqual(self.names(resp), ["s05"])
+        self.assertNotContains(resp, 'data-testid="lab-grid-pager"')
+
+    def test_page_query_count_independent_of_roster(self):
+        def queries():
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(self.url)
+            return len(ctx.captured_queries)
+
+        before = queries()
+        self.cs.students.add(
+            *User.objects.bulk_create(
+                [User(username=f"z{i}", role=Roles.STUDENT) for i in range(50)]
+            )
+        )
+        self.assertEqual(queries(), before)
+
+    def test_saving_a_page_leaves_other_pages_untouched(self):
+        other = self.students[5]
+        LabParticipation.objects.create(session=self.session, student=other, present=True)
+        LabReportGrade.objects.create(lab_report=self.session.report, student=other, grade=6)
+
+        page = self.students[:3]
+        data = {"paged": "1", "students": [s.pk for s in page], f"present_{page[0].pk}": "on"}
+        resp = self.client.post(f"{self.url}?q=s", data)
+        self.assertRedirects(resp, f"{self.url}?q=s")
+
+        self.assertEqual(
+            set(LabParticipation.objects.values_list("student_id", flat=True)),
+            {s.pk for s in page} | {other.pk},
+        )
+        self.assertTrue(LabParticipation.objects.get(student=other).present)
+        self.assertEqual(LabReportGrade.objects.get(student=other).grade, 6)
+        self.assertTrue(LabParticipation.objects.get(student=page[0]).present)
+
+    def test_saving_an_empty_search_page_writes_nothing(self):
+        for student in self.students[:3]:
+            LabReportGrade.objects.create(lab_report=self.session.report, student=student, grade=7)
+        resp = self.client.post(f"{self.url}?q=nobody", {"paged": "1"})
+        self.assertRedirects(resp, f"{self.url}?q=nobody")
+        self.assertEqual(list(LabReportGrade.objects.values_list("grade", flat=True)), [7, 7, 7])
+        self.assertFalse(LabParticipation.objects.exists())
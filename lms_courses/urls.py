@@ -16,6 +16,9 @@ from .views.teacher import (
     LabSessionManageView,
     MyCourseSemestersList,
     export_course_semester,
+    export_job_detail,
+    export_job_download,
+    export_job_status,
 )
 
 app_name = "lms_courses"
@@ -64,6 +67,9 @@ teacher_patterns = [
         name="final_assignment_manage",
     ),
     path("<int:pk>/export/", export_course_semester, name="course_semester_export"),
+    path("exports/<int:job_id>/", export_job_detail, name="export_job_detail"),
+    path("exports/<int:job_id>/status/", export_job_status, name="export_job_status"),
+    path("exports/<int:job_id>/download/", export_job_download, name="export_job_download"),
 ]
 
 # Student-facing patterns (to be mounted at /student/courses/)
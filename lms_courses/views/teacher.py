@@ -1,12 +1,15 @@
-import csv
-import io
+import json
 
 from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
+from django.db.models import Q
+from django.http import FileResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
+from django.utils.cache import get_conditional_response
 from django.utils.decorators import method_decorator
+from django.utils.http import quote_etag
 from django.views.generic import (
     CreateView,
     FormView,
@@ -20,6 +23,24 @@ from lms_users.decorators import role_required
 from lms_users.permissions import OwnerRequiredMixin, RoleRequiredMixin, Roles
 from lms_users.services.keycloak import search_students
 
+from ..bulk import GridCell, write_final_assignment_results, write_lab_session_grid
+from ..export_jobs import (
+    course_semester_export_rows,
+    enqueue_export,
+    export_job_row_threshold,
+    finished_export,
+    xlsx_available,
+)
+from ..exports import (
+    course_semester_csv_rows,
+    course_semester_fingerprint,
+    gradebook_rows,
+    streaming_csv_response,
+    with_fingerprint,
+    write_course_semester_sheets,
+    write_gradebook_sheet,
+    xlsx_response,
+)
 from ..forms import (
     CourseSemesterForm,
     EnrollmentForm,
@@ -29,6 +50,7 @@ from ..forms import (
 )
 from ..models import (
     CourseSemester,
+    ExportJob,
     FinalAssignment,
     FinalAssignmentResult,
     LabParticipation,
@@ -36,6 +58,7 @@ from ..models import (
     LabReportGrade,
     LabSession,
 )
+from ..stats import stats_for
 
 
 @method_decorator(login_required, name="dispatch")
@@ -66,20 +89,29 @@ class CourseSemesterDetailView(OwnerRequiredMixin, TemplateView):
     allowed_roles = (Roles.TEACHER,)
     model = CourseSemester
 
+    def get_owned_queryset(self):
+        return CourseSemester.objects.select_related("course", "stats")
+
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         cs = self.object  # type: ignore[attr-defined]
-        # Prefetch sessions for all lab sessions (λιγότερα queries + σιγουριά ότι φαίνονται αμέσως)
-        sessions = cs.sessions.all()  # type: ignore[attr-defined]
+        # Counts annotated in the one sessions query instead of two COUNTs per row
+        sessions = cs.sessions.with_counts()  # type: ignore[attr-defined]
         ctx["course_semester"] = cs
         ctx["sessions"] = sessions
         ctx["students"] = cs.students.all()
         # Provide final_assignment (if implemented as a OneToOne with related_name).
         # Falls back to None so template shows the Create button.
         ctx["final_assignment"] = getattr(cs, "final_assignment", None)
+        # Pre-aggregated counters instead of per-render COUNT queries
+        ctx["stats"] = stats_for(cs)
+        ctx["export_in_background"] = course_semester_export_rows(cs) > export_job_row_threshold()
         return ctx
 
 
+DEFAULT_LAB_GRID_PAGE_SIZE = 50
+
+
 class LabSessionManageView(RoleRequiredMixin, TemplateView):
     template_name = "lms_courses/teacher/lab_session_manage.html"
     allowed_roles = (Roles.TEACHER,)
@@ -92,8 +124,12 @@ class LabSessionManageView(RoleRequiredMixin, TemplateView):
             pk=self.kwargs["pk"],
             owner=request.user,
         )
+        # Only the GET page shows the attendance/grade counters
+        sessions = LabSession.objects.all()
+        if request.method == "GET":
+            sessions = sessions.with_counts()
         self.session = get_object_or_404(
-            LabSession, pk=self.kwargs["session_id"], course_semester=self.cs
+            sessions, pk=self.kwargs["session_id"], course_semester=self.cs
         )
         # Ensure report exists
         report = getattr(self.session, "report", None)
@@ -108,18 +144,31 @@ class LabSessionManageView(RoleRequiredMixin, TemplateView):
         return super().dispatch(request, *args, **kwargs)
 
     def get(self, request, *args, **kwargs):
-        students = list(self.cs.students.all().order_by("username"))
-        # Build maps for current participation and grades
+        query = request.GET.get("q", "").strip()
+        students_qs = self.cs.students.all()
+        if query:
+            students_qs = students_qs.filter(
+                Q(username__icontains=query)
+                | Q(first_name__icontains=query)
+                | Q(last_name__icontains=query)
+            )
+        students, prev_cursor, next_cursor = _keyset_page(
+            students_qs,
+            "username",
+            after=request.GET.get("after"),
+            before=request.GET.get("before"),
+            size=_lab_grid_page_size(),
+        )
+        # Build maps for current participation and grades of the visible page only
+        ids = [s.id for s in students]
         parts = {
             p.student_id: p.present  # type: ignore
-            for p in LabParticipation.objects.filter(session=self.session)
+            for p in LabParticipation.objects.filter(session=self.session, student_id__in=ids)
+        }
+        grades = {
+            g.student_id: g.grade  # type: ignore
+            for g in LabReportGrade.objects.filter(lab_report=self.report, student_id__in=ids)
         }
-        grades = {}
-        if self.report:
-            grades = {
-                g.student_id: g.grade  # type: ignore
-                for g in LabReportGrade.objects.filter(lab_report=self.report)
-            }
         # Attach convenience attrs for template rendering (no leading underscores)
         for s in students:
             setattr(s, "present_value", bool(parts.get(s.id, False)))
@@ -129,7 +178,7 @@ class LabSessionManageView(RoleRequiredMixin, TemplateView):
         form = LabParticipationGradeForm(
             session=self.session,
             report=self.report,
-            students_qs=self.cs.students.all(),
+            students_qs=students,
         )
         context = {
             "course_semester": self.cs,
@@ -137,23 +186,113 @@ class LabSessionManageView(RoleRequiredMixin, TemplateView):
             "report": self.report,
             "students": students,
             "form": form,
+            "query": query,
+            "prev_cursor": prev_cursor,
+            "next_cursor": next_cursor,
         }
         return render(request, self.template_name, context)
 
     def post(self, request, *args, **kwargs):
-        form = LabParticipationGradeForm(
-            request.POST,
-            session=self.session,
-            report=self.report,
-            students_qs=self.cs.students.all(),
-        )
-        if form.is_valid():
-            form.save()
+        # The paged grid marks itself and lists its students; only those are
+        # written, and an empty page writes nothing. An unmarked post is a
+        # whole-roster grid, as before pagination.
+        paged = request.POST.get("paged") == "1"
+        page_ids = [v for v in request.POST.getlist("students") if v.isdigit()]
+        students_qs = self.cs.students.all()
+        if paged:
+            students_qs = students_qs.filter(pk__in=page_ids)
+        if not paged or page_ids:
+            form = LabParticipationGradeForm(
+                request.POST,
+                session=self.session,
+                report=self.report,
+                students_qs=students_qs,
+            )
+            if form.is_valid():
+                form.save()
 
+        if paged:
+            messages.success(request, "Οι αλλαγές της σελίδας αποθηκεύτηκαν.")
+            return redirect(request.get_full_path())
         return redirect(
             reverse("lms_courses_teacher:course_semester_teacher_detail", kwargs={"pk": self.cs.pk})
         )
 
+    def patch(self, request, *args, **kwargs):
+        """Autosave: write only the cells sent as ``{"cells": [{student_id, present, grade}]}``."""
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({"errors": ["Μη έγκυρο JSON."]}, status=400)
+        cells, errors = _grid_cells_from_json(payload, self.report.max_grade)
+        if not errors:
+            unknown = set(cells) - set(
+                self.cs.students.filter(pk__in=list(cells)).values_list("pk", flat=True)
+            )
+            errors = [f"Ο φοιτητής {pk} δεν είναι εγγεγραμμένος." for pk in sorted(unknown)]
+        if errors:
+            return JsonResponse({"errors": errors}, status=400)
+        return JsonResponse(write_lab_session_grid(self.session, self.report, cells)._asdict())
+
+
+def _lab_grid_page_size() -> int:
+    return int(getattr(settings, "LAB_GRID_PAGE_SIZE", DEFAULT_LAB_GRID_PAGE_SIZE))
+
+
+def _keyset_page(qs, key: str, *, after, before, size: int):
+    """Return ``(rows, prev_cursor, next_cursor)`` for one page of ``qs`` ordered by ``key``.
+
+    ``key`` must be unique. Seeking past a cursor value keeps every page a
+    small indexed query however deep it is, unlike OFFSET.
+    """
+    if before:
+        rows = list(qs.filter(**{f"{key}__lt": before}).order_by(f"-{key}")[: size + 1])
+        has_prev, has_next = len(rows) > size, True
+        rows = rows[:size][::-1]
+    else:
+        if after:
+            qs = qs.filter(**{f"{key}__gt": after})
+        rows = list(qs.order_by(key)[: size + 1])
+        has_prev, has_next = bool(after), len(rows) > size
+        rows = rows[:size]
+    if not rows:
+        return rows, None, None
+    return (
+        rows,
+        getattr(rows[0], key) if has_prev else None,
+        getattr(rows[-1], key) if has_next else None,
+    )
+
+
+def _grid_cells_from_json(payload, max_grade: int) -> tuple[dict[int, GridCell], list[str]]:
+    """Validate the PATCH body of the lab session grid; return (cells, errors)."""
+    rows = payload.get("cells") if isinstance(payload, dict) else None
+    if not isinstance(rows, list):
+        return {}, ["Αναμένεται λίστα «cells»."]
+    cells: dict[int, GridCell] = {}
+    errors = []
+    for row in rows:
+        student_id = row.get("student_id") if isinstance(row, dict) else None
+        # bool is an int subclass; reject it explicitly for ids and grades
+        if not isinstance(student_id, int) or isinstance(student_id, bool):
+            errors.append(f"Μη έγκυρο student_id: {row!r}")
+            continue
+        cell = cells.setdefault(student_id, {})
+        if "present" in row:
+            if not isinstance(row["present"], bool):
+                errors.append(f"Μη έγκυρη παρουσία για τον φοιτητή {student_id}.")
+            else:
+                cell["present"] = row["present"]
+        if "grade" in row:
+            grade = row["grade"]
+            if grade is not None and (
+                not isinstance(grade, int) or isinstance(grade, bool) or not 0 <= grade <= max_grade
+            ):
+                errors.append(f"Ο βαθμός του φοιτητή {student_id} πρέπει να είναι 0..{max_grade}.")
+            else:
+                cell["grade"] = grade
+    return cells, errors
+
 
 class LabSessionCreateView(RoleRequiredMixin, CreateView):
     template_name = "lms_courses/teacher/lab_session_form.html"
@@ -214,6 +353,8 @@ class EnrollmentCreateView(RoleRequiredMixin, FormView):
                 results = []
         ctx["query"] = q
         ctx["results"] = results
+        # Keycloak was skipped: only students already known locally are listed
+        ctx["search_degraded"] = getattr(results, "degraded", False)
         return ctx
 
     def form_valid(self, form):
@@ -340,31 +481,19 @@ class FinalAssignmentManageView(RoleRequiredMixin, TemplateView):
         return render(request, self.template_name, context)
 
     def post(self, request, *args, **kwargs):
-        # Upsert results per student
-        for student in self.cs.students.all():
-            submitted = bool(request.POST.get(f"submitted_{student.id}") == "on")
-            grade_val = request.POST.get(f"fa_grade_{student.id}")
+        results = {}
+        for student_id in self.cs.students.values_list("pk", flat=True):
+            submitted = bool(request.POST.get(f"submitted_{student_id}") == "on")
+            grade_val = request.POST.get(f"fa_grade_{student_id}")
             grade = int(grade_val) if grade_val not in (None, "") else None
-            # Clamp grade within [0, max]
-            if grade is not None:
-                if grade < 0:
-                    grade = 0
-                if grade > self.fa.max_grade:
-                    grade = self.fa.max_grade
-
-            obj, _ = FinalAssignmentResult.objects.get_or_create(
-                final_assignment=self.fa, student=student
-            )
-            changed = False
-            if obj.submitted != submitted:
-                obj.submitted = submitted
-                changed = True
-            if obj.grade != grade:
-                obj.grade = grade
-                changed = True
-            if changed:
-                obj.save()
+            results[student_id] = (submitted, grade)
 
+        summary = write_final_assignment_results(self.fa, results)
+        messages.success(
+            request,
+            f"Αποθηκεύτηκαν τα αποτελέσματα: {summary.created} νέα, "
+            f"{summary.updated} ενημερώσεις, {summary.unchanged} αμετάβλητα.",
+        )
         return redirect(
             reverse("lms_courses_teacher:course_semester_teacher_detail", kwargs={"pk": self.cs.pk})
         )
@@ -459,105 +588,74 @@ def export_course_semester(request, pk: int):
         CourseSemester.objects.select_related("course"), pk=pk, owner=request.user
     )
     fmt = (request.GET.get("format") or "csv").lower()
-
-    # Collect sessions, participations, grades, final assignment results
-    sessions = list(cs.sessions.select_related("course_semester").all())  # type: ignore
-    parts = list(
-        LabParticipation.objects.filter(session__course_semester=cs)
-        .select_related("student", "session")
-        .order_by("session__week", "student__username")
-    )
-    grades = list(
-        LabReportGrade.objects.filter(lab_report__session__course_semester=cs)
-        .select_related("student", "lab_report__session")
-        .order_by("lab_report__session__week", "student__username")
+    if fmt != "xlsx" or not xlsx_available():
+        fmt = "csv"
+    # "gradebook" is the wide layout: one row per student, columns per session
+    if request.GET.get("layout") == "gradebook":
+        kind, filename = ExportJob.KIND_GRADEBOOK, f"course_semester_{cs.pk}_gradebook"
+        csv_rows, fill_workbook = gradebook_rows, write_gradebook_sheet
+    else:
+        kind, filename = ExportJob.KIND_COURSE_SEMESTER, f"course_semester_{cs.pk}"
+        csv_rows, fill_workbook = course_semester_csv_rows, write_course_semester_sheets
+
+    fingerprint = course_semester_fingerprint(cs, f"{kind}.{fmt}")
+    last_modified = fingerprint.last_modified
+    not_modified = get_conditional_response(
+        request,
+        etag=quote_etag(fingerprint.etag),
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
     )
-    fa = getattr(cs, "final_assignment", None)
-    fa_results = []
-    if fa:
-        fa_results = list(
-            FinalAssignmentResult.objects.filter(final_assignment=fa)
-            .select_related("student")
-            .order_by("student__username")
-        )
+    if not_modified is not None:
+        return with_fingerprint(not_modified, fingerprint)
+
+    job = finished_export(request.user, kind, fmt, cs, fingerprint.etag)
+    if job is not None:
+        resp = FileResponse(job.file.open("rb"), as_attachment=True, filename=f"{filename}.{fmt}")
+        return with_fingerprint(resp, fingerprint)
+
+    rows = course_semester_export_rows(cs)
+    if rows > export_job_row_threshold():
+        job = enqueue_export(request.user, kind, fmt, course_semester=cs, rows_total=rows)
+        return redirect("lms_courses_teacher:export_job_detail", job_id=job.pk)
 
     if fmt == "xlsx":
-        try:
-            from openpyxl import Workbook
-        except Exception:
-            fmt = "csv"
-        else:
-            wb = Workbook()
-            ws1 = wb.active
-            ws1.title = "Στοιχεία"  # type: ignore
-            ws1.append(["Πεδίο", "Τιμή"])  # type: ignore
-            ws1.append(["Μάθημα", f"{cs.course.code} — {cs.course.title}"])  # type: ignore
-            ws1.append(["Έτος", cs.year])  # type: ignore
-            ws1.append(["Εξάμηνο", cs.get_semester_display()])  # type: ignore
-
-            ws2 = wb.create_sheet("Συνεδρίες")
-            ws2.append(["Εβδομάδα", "Όνομα", "Ημερομηνία", "Παρόντες", "Βαθμολογημένα"])
-            for s in sessions:
-                ws2.append(
-                    [
-                        s.week,
-                        s.name,
-                        getattr(s, "date", ""),
-                        s.present_count,
-                        s.graded_count,
-                    ]
-                )
-
-            ws3 = wb.create_sheet("Παρουσίες")
-            ws3.append(["Εβδομάδα", "Φοιτητής", "Παρουσία"])
-            for p in parts:
-                ws3.append([p.session.week, p.student.username, "Ναι" if p.present else "Όχι"])
-
-            ws4 = wb.create_sheet("Βαθμοί εργαστηρίων")
-            ws4.append(["Εβδομάδα", "Φοιτητής", "Βαθμός"])
-            for g in grades:
-                ws4.append([g.lab_report.session.week, g.student.username, g.grade or ""])
-
-            ws5 = wb.create_sheet("Τελική εργασία")
-            ws5.append(["Φοιτητής", "Υποβλήθηκε", "Βαθμός"])
-            for r in fa_results:
-                ws5.append([r.student.username, "Ναι" if r.submitted else "Όχι", r.grade or ""])
-
-            out = io.BytesIO()
-            wb.save(out)
-            out.seek(0)
-            resp = HttpResponse(
-                out.read(),
-                content_type=(
-                    "application/" "vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                ),
-            )
-            resp["Content-Disposition"] = f"attachment; filename=course_semester_{cs.pk}.xlsx"
-            return resp
-
-    # CSV
-    out = io.StringIO()
-    writer = csv.writer(out)
-    writer.writerow(["course_code", "course_title", "year", "semester"])
-    writer.writerow([cs.course.code, cs.course.title, cs.year, cs.get_semester_display()])
-    writer.writerow([])
-    writer.writerow(["sessions: week", "name", "date", "present_count", "graded_count"])
-    for s in sessions:
-        writer.writerow([s.week, s.name, getattr(s, "date", ""), s.present_count, s.graded_count])
-    writer.writerow([])
-    writer.writerow(["participations: week", "student", "present"])
-    for p in parts:
-        writer.writerow([p.session.week, p.student.username, int(bool(p.present))])
-    writer.writerow([])
-    writer.writerow(["lab_grades: week", "student", "grade"])
-    for g in grades:
-        writer.writerow([g.lab_report.session.week, g.student.username, g.grade or ""])
-    writer.writerow([])
-    writer.writerow(["final_assignment: student", "submitted", "grade"])
-    for r in fa_results:
-        writer.writerow([r.student.username, int(bool(r.submitted)), r.grade or ""])
-
-    csv_bytes = out.getvalue().encode("utf-8-sig")
-    resp = HttpResponse(csv_bytes, content_type="text/csv; charset=utf-8")
-    resp["Content-Disposition"] = f"attachment; filename=course_semester_{cs.pk}.csv"
-    return resp
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        fill_workbook(wb, cs)
+        return with_fingerprint(xlsx_response(wb, f"{filename}.xlsx"), fingerprint)
+
+    return with_fingerprint(streaming_csv_response(csv_rows(cs), f"{filename}.csv"), fingerprint)
+
+
+@role_required(Roles.TEACHER)
+def export_job_detail(request, job_id: int):
+    """Status page of a queued export; polls ``export_job_status`` until it finishes."""
+    job = get_object_or_404(ExportJob, pk=job_id, owner=request.user)
+    return render(request, "lms_courses/teacher/export_job_detail.html", {"job": job})
+
+
+@role_required(Roles.TEACHER)
+def export_job_status(request, job_id: int):
+    job = get_object_or_404(ExportJob, pk=job_id, owner=request.user)
+    download_url = None
+    if job.status == ExportJob.DONE:
+        download_url = reverse("lms_courses_teacher:export_job_download", args=[job.pk])
+    return JsonResponse(
+        {
+            "status": job.status,
+            "status_display": job.get_status_display(),  # type: ignore[attr-defined]
+            "progress": job.progress,
+            "rows_done": job.rows_done,
+            "download_url": download_url,
+            "error": job.error,
+        }
+    )
+
+
+@role_required(Roles.TEACHER)
+def export_job_download(request, job_id: int):
+    job = get_object_or_404(ExportJob, pk=job_id, owner=request.user, status=ExportJob.DONE)
+    return FileResponse(
+        job.file.open("rb"), as_attachment=True, filename=job.file.name.rsplit("/", 1)[-1]
+    )
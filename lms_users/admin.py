@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import User
+from .models import DirectoryStudent, DirectorySync, User
 
 
 @admin.register(User)
@@ -13,3 +13,23 @@ class UserAdmin(admin.ModelAdmin):
     search_fields = ("username", "email")
     # Define the fields to be used for filtering in the admin interface.
     list_filter = ("role", "is_staff", "is_superuser", "is_active")
+
+
+@admin.register(DirectoryStudent)
+class DirectoryStudentAdmin(admin.ModelAdmin):
+    """Read-only view of the Keycloak students mirror; ``sync_keycloak_students`` writes it."""
+
+    list_display = ("username", "first_name", "last_name", "email", "synced_at")
+    search_fields = ("username", "email", "first_name", "last_name")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DirectorySync)
+class DirectorySyncAdmin(admin.ModelAdmin):
+    list_display = ("group", "started_at", "finished_at", "created", "updated", "deleted")
+    list_filter = ("group",)
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lms_users.services.directory import DEFAULT_SYNC_PAGE_SIZE, sync_students
+from lms_users.services.keycloak import KeycloakError
+
+
+class Command(BaseCommand):
+    help = (
+        "Mirror the Keycloak students group into the local student directory. "
+        "Run it from cron; enrollment search reads the directory after the first run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=DEFAULT_SYNC_PAGE_SIZE,
+            help=f"Members requested per page (default: {DEFAULT_SYNC_PAGE_SIZE})",
+        )
+
+    def handle(self, *args: Any, **options: Any):
+        try:
+            run = sync_students(page_size=options["page_size"])
+        except KeycloakError as exc:
+            raise CommandError(
+                f"Sync failed, pages read so far were kept and nothing was deleted: {exc}"
+            ) from exc
+        elapsed_ms = (run.finished_at - run.started_at).total_seconds() * 1000
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Synced group {run.group!r}: {run.created} created, {run.updated} updated, "
+                f"{run.deleted} deleted in {elapsed_ms:.0f} ms."
+            )
+        )
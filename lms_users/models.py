@@ -21,3 +21,46 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.username
+
+
+class DirectoryStudent(models.Model):
+    """A member of the Keycloak students group, mirrored by ``sync_keycloak_students``.
+
+    Enrollment search and provisioning read this table instead of calling
+    Keycloak; rows missing from the group at the next sync are deleted.
+    """
+
+    keycloak_id = models.CharField(max_length=64, unique=True)
+    username = models.CharField(max_length=150, unique=True)
+    email = models.EmailField(blank=True, null=True)
+    first_name = models.CharField(max_length=150, blank=True)
+    last_name = models.CharField(max_length=150, blank=True)
+    synced_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["username"]
+
+    def __str__(self):
+        return self.username
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.first_name} {self.last_name}".strip()
+
+
+class DirectorySync(models.Model):
+    """One run of ``sync_keycloak_students``; ``finished_at`` is empty until it succeeds."""
+
+    group = models.CharField(max_length=150)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-started_at"]
+
+    def __str__(self):
+        return f"DirectorySync({self.group} @ {self.started_at:%Y-%m-%d %H:%M})"
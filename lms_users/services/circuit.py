@@ -0,0 +1,112 @@
+"""A circuit breaker whose state lives in Django's cache, shared by all workers.
+
+The breaker counts calls and failures over a sliding window. Once at least
+``min_calls`` were made and the failure rate reaches ``failure_rate`` it
+opens, and callers fail fast instead of waiting on timeouts. After
+``cooldown`` seconds it is half-open: a single trial call is let through,
+closing the breaker on success and re-opening it on failure.
+
+Outcomes are counted in buckets of ``window`` seconds. Each bucket is one
+cache integer holding both counters, so a single atomic ``incr`` records an
+outcome and the two counters always expire together. The rate is taken over
+the current bucket plus the share of the previous one that still falls
+inside the window.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Optional, Tuple
+
+from django.core.cache import cache
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+# A bucket holds ``calls + failures * _FAILURE``; a failure adds ``1 + _FAILURE``
+_FAILURE = 1 << 32
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_rate: float = 0.5,
+        min_calls: int = 5,
+        window: int = 60,
+        cooldown: int = 30,
+    ) -> None:
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+
+    def _key(self, part: str) -> str:
+        return f"circuit:{self.name}:{part}"
+
+    @property
+    def state(self) -> str:
+        opened_at = cache.get(self._key("opened_at"))
+        if opened_at is None:
+            return CLOSED
+        return OPEN if time.time() < opened_at + self.cooldown else HALF_OPEN
+
+    def allow(self) -> Optional[str]:
+        """Admit a call: the state it was let through in, or None to fail fast.
+
+        Half-open lets one trial caller through per cooldown. Pass the
+        returned state to ``record_success``/``record_failure``, so that only
+        the trial can close or re-open the breaker.
+        """
+        state = self.state
+        if state == CLOSED:
+            return CLOSED
+        if state == HALF_OPEN and cache.add(self._key("trial"), 1, self.cooldown):
+            return HALF_OPEN
+        return None
+
+    def record_success(self, admitted: str = CLOSED) -> None:
+        if admitted == HALF_OPEN:
+            self.reset()
+        elif self.state == CLOSED:
+            self._count(failed=False)
+        # A call admitted before the breaker opened says nothing about recovery
+
+    def record_failure(self, admitted: str = CLOSED) -> None:
+        if admitted == HALF_OPEN:
+            self._open()
+        elif self.state == CLOSED:
+            calls, failures = self._count(failed=True)
+            if calls >= self.min_calls and failures / calls >= self.failure_rate:
+                self._open()
+
+    def reset(self) -> None:
+        cache.delete_many([self._key("opened_at"), self._key("trial"), *self._bucket_keys()])
+
+    def _open(self) -> None:
+        cache.set(self._key("opened_at"), time.time(), None)
+        cache.delete_many([self._key("trial"), *self._bucket_keys()])
+
+    def _bucket_keys(self) -> Tuple[str, str]:
+        current = int(time.time() // self.window)
+        return self._key(f"bucket:{current}"), self._key(f"bucket:{current - 1}")
+
+    def _count(self, *, failed: bool) -> Tuple[float, float]:
+        """Record one outcome; return the (calls, failures) seen over the window."""
+        current_key, previous_key = self._bucket_keys()
+        delta = 1 + _FAILURE if failed else 1
+        # A bucket must outlive its own slice to be read as the previous one
+        if cache.add(current_key, delta, 2 * self.window):
+            current = delta
+        else:
+            try:
+                current = cache.incr(current_key, delta)
+            except ValueError:  # expired between add() and incr()
+                cache.add(current_key, delta, 2 * self.window)
+                current = delta
+        previous = cache.get(previous_key, 0)
+        weight = 1 - (time.time() % self.window) / self.window
+        calls = current % _FAILURE + previous % _FAILURE * weight
+        failures = current // _FAILURE + previous // _FAILURE * weight
+        return calls, failures
@@ -0,0 +1,145 @@
+"""Local mirror of the Keycloak students group.
+
+``sync_students`` pages through the group and upserts ``DirectoryStudent``
+rows, writing only the ones that changed; members not seen during the run
+are deleted at the end. Enrollment search reads the mirror while the last
+finished sync is younger than ``KEYCLOAK_DIRECTORY_MAX_AGE`` and queries
+Keycloak live otherwise; provisioning reads the mirror first.
+"""
+
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from lms_users.models import DirectoryStudent, DirectorySync
+
+from .circuit import CLOSED
+from .keycloak import KeycloakClient, KeycloakError, KeycloakUnavailable
+
+DEFAULT_SYNC_PAGE_SIZE = 500
+# The sync runs nightly; a couple of hours' slack covers a slow run before the mirror is stale
+DEFAULT_DIRECTORY_MAX_AGE = 26 * 60 * 60
+_FIELDS = ("username", "email", "first_name", "last_name")
+
+
+def students_group() -> str:
+    return getattr(settings, "KEYCLOAK_STUDENTS_GROUP", "students")
+
+
+def directory_max_age() -> int:
+    return getattr(settings, "KEYCLOAK_DIRECTORY_MAX_AGE", DEFAULT_DIRECTORY_MAX_AGE)
+
+
+def directory_ready(stale_ok: bool = False) -> bool:
+    """True if a sync of the students group finished within the maximum age.
+
+    With ``stale_ok`` any finished sync will do, however old.
+    """
+    runs = DirectorySync.objects.filter(group=students_group(), finished_at__isnull=False)
+    if not stale_ok:
+        runs = runs.filter(finished_at__gte=timezone.now() - timedelta(seconds=directory_max_age()))
+    return runs.exists()
+
+
+def last_sync() -> Optional[DirectorySync]:
+    return DirectorySync.objects.filter(group=students_group()).first()
+
+
+def _directory_row(user: Dict[str, Any], synced_at) -> Optional[DirectoryStudent]:
+    if not user.get("id") or not user.get("username"):
+        return None
+    return DirectoryStudent(
+        keycloak_id=user["id"],
+        username=user["username"],
+        email=user.get("email") or None,
+        first_name=user.get("firstName") or "",
+        last_name=user.get("lastName") or "",
+        synced_at=synced_at,
+    )
+
+
+def _apply_page(rows: List[DirectoryStudent], run: DirectorySync) -> None:
+    """Upsert one page of members and stamp every one of them as seen by ``run``."""
+    ids = [r.keycloak_id for r in rows]
+    existing = {d.keycloak_id: d for d in DirectoryStudent.objects.filter(keycloak_id__in=ids)}
+    new, changed = [], []
+    for row in rows:
+        current = existing.get(row.keycloak_id)
+        if current is None:
+            new.append(row)
+        elif any(getattr(current, f) != getattr(row, f) for f in _FIELDS):
+            row.pk = current.pk
+            changed.append(row)
+
+    with transaction.atomic():
+        # A username freed by a deleted account may now belong to a new id
+        DirectoryStudent.objects.filter(username__in=[r.username for r in rows]).exclude(
+            keycloak_id__in=ids
+        ).delete()
+        if new:
+            DirectoryStudent.objects.bulk_create(
+                new,
+                update_conflicts=True,
+                unique_fields=["keycloak_id"],
+                update_fields=[*_FIELDS, "synced_at"],
+            )
+        if changed:
+            DirectoryStudent.objects.bulk_update(changed, [*_FIELDS, "synced_at"])
+        DirectoryStudent.objects.filter(keycloak_id__in=ids).update(synced_at=run.started_at)
+    run.created += len(new)
+    run.updated += len(changed)
+
+
+def sync_students(
+    client: Optional[KeycloakClient] = None, page_size: int = DEFAULT_SYNC_PAGE_SIZE
+) -> DirectorySync:
+    """Mirror the Keycloak students group into ``DirectoryStudent``.
+
+    Each page is committed as it is read. Raises ``KeycloakError`` if the
+    group cannot be read completely; the run is recorded with its error, the
+    pages read so far stay applied and nothing is deleted.
+    """
+    client = client or KeycloakClient(interactive=False)
+    run = DirectorySync.objects.create(group=students_group(), started_at=timezone.now())
+    try:
+        group_id = client.get_group_id_by_name(run.group)
+        if not group_id and client.breaker.state != CLOSED:
+            raise KeycloakUnavailable("Keycloak is unavailable (circuit breaker open)")
+        if not group_id:
+            raise KeycloakError(f"Group {run.group!r} was not found")
+        for page in client.iter_group_members(group_id, page_size=page_size):
+            rows = [r for r in (_directory_row(u, run.started_at) for u in page) if r]
+            _apply_page(rows, run)
+    except KeycloakError as exc:
+        run.error = str(exc)
+        run.save(update_fields=["created", "updated", "error"])
+        raise
+    run.deleted, _ = DirectoryStudent.objects.filter(synced_at__lt=run.started_at).delete()
+    run.finished_at = timezone.now()
+    run.save(update_fields=["created", "updated", "deleted", "finished_at"])
+    return run
+
+
+def search_directory(query: str, max_results: int = 10) -> List[DirectoryStudent]:
+    """Substring search over the mirror, like the local student search.
+
+    ``icontains`` cannot use an index, so every query scans the table; that is
+    fine for a students group of tens of thousands of rows.
+    """
+    q = (
+        Q(username__icontains=query)
+        | Q(email__icontains=query)
+        | Q(first_name__icontains=query)
+        | Q(last_name__icontains=query)
+    )
+    return list(DirectoryStudent.objects.filter(q).order_by("username")[:max_results])
+
+
+def find_directory_student(username: str) -> Optional[DirectoryStudent]:
+    return DirectoryStudent.objects.filter(username=username).first()
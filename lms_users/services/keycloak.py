@@ -1,13 +1,138 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import threading
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 import requests
 from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .circuit import CLOSED, OPEN, CircuitBreaker
+
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_GET_RETRIES = 2
+DEFAULT_RETRY_BACKOFF = 0.2
+# Group ids practically never change; a 404 on the members endpoint evicts them early
+DEFAULT_GROUP_ID_CACHE_TTL = 24 * 60 * 60
+# Refresh this many seconds before the token's ``expires_in`` runs out
+DEFAULT_TOKEN_REFRESH_MARGIN = 30
+# Lifetime assumed when the token response carries no ``expires_in``
+DEFAULT_TOKEN_LIFETIME = 60
+# Interactive answers slower than this (seconds) count as failures for the circuit
+# breaker; it also caps their read timeout
+DEFAULT_LATENCY_BUDGET = 1.0
+# Batch calls page through whole groups, so they may wait much longer per answer
+DEFAULT_SYNC_READ_TIMEOUT = 30
+
+
+class KeycloakError(Exception):
+    """Keycloak could not answer a request whose result must not be guessed."""
+
+
+class KeycloakUnavailable(KeycloakError):
+    """The circuit breaker is open, so the request was not sent."""
+
+
+def keycloak_breaker(name: str = "keycloak") -> CircuitBreaker:
+    """The breaker shared by every worker's Keycloak calls, tuned by ``KEYCLOAK_CIRCUIT_*``.
+
+    Batch clients pass their own ``name``, so that their failures do not open
+    the breaker of the interactive calls.
+    """
+    return CircuitBreaker(
+        name,
+        failure_rate=getattr(settings, "KEYCLOAK_CIRCUIT_FAILURE_RATE", 0.5),
+        min_calls=getattr(settings, "KEYCLOAK_CIRCUIT_MIN_CALLS", 5),
+        window=getattr(settings, "KEYCLOAK_CIRCUIT_WINDOW", 60),
+        cooldown=getattr(settings, "KEYCLOAK_CIRCUIT_COOLDOWN", 30),
+    )
+
+
+def keycloak_available() -> bool:
+    return keycloak_breaker().state == CLOSED
+
+
+class _CachedToken(NamedTuple):
+    value: str
+    expires_at: float  # time.monotonic() deadline, margin already applied
+
+
+# Admin tokens shared by all clients of the process, keyed by (token URL, client id).
+# The lock is held while fetching, so concurrent callers wait for one refresh.
+_token_cache: Dict[Tuple[str, str], _CachedToken] = {}
+_token_lock = threading.Lock()
+
+
+def clear_token_cache() -> None:
+    with _token_lock:
+        _token_cache.clear()
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    """A keep-alive session whose GETs retry transient failures with backoff.
+
+    Retries are limited to GET, which is idempotent; connection errors and
+    502/503/504 answers are retried with exponential backoff. Read timeouts are
+    not: a server that is slow to answer would make every retry wait the full
+    read timeout again.
+    """
+    retry = Retry(
+        total=getattr(settings, "KEYCLOAK_GET_RETRIES", DEFAULT_GET_RETRIES),
+        read=0,
+        backoff_factor=getattr(settings, "KEYCLOAK_RETRY_BACKOFF", DEFAULT_RETRY_BACKOFF),
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=getattr(settings, "KEYCLOAK_POOL_CONNECTIONS", DEFAULT_POOL_CONNECTIONS),
+        pool_maxsize=getattr(settings, "KEYCLOAK_POOL_MAXSIZE", DEFAULT_POOL_MAXSIZE),
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide Keycloak session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session()
+        return _session
+
+
+def reset_session() -> None:
+    """Close the shared session; the next call builds one from current settings."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
 
 
 class KeycloakClient:
-    def __init__(self) -> None:
+    """Keycloak admin API client.
+
+    Interactive clients, used by enrollment search and provisioning, cap the
+    read timeout at ``KEYCLOAK_LATENCY_BUDGET`` and count slower answers as
+    failures. Batch clients (``interactive=False``), such as the directory
+    sync, wait up to ``KEYCLOAK_SYNC_READ_TIMEOUT`` instead and record their
+    outcomes on a breaker of their own.
+    """
+
+    def __init__(self, *, interactive: bool = True) -> None:
         self.base_url: str = settings.KEYCLOAK_BASE_URL.rstrip("/")
         self.realm: str = settings.KEYCLOAK_REALM
         # Prefer dedicated admin client if provided; fall back to RP client
@@ -18,7 +143,35 @@ class KeycloakClient:
             settings, "KEYCLOAK_ADMIN_CLIENT_SECRET", None
         ) or getattr(settings, "OIDC_RP_CLIENT_SECRET", "")
         self.verify_ssl: bool = getattr(settings, "OIDC_VERIFY_SSL", True)
-        self.timeout: int = getattr(settings, "KEYCLOAK_TIMEOUT", 5)
+        if interactive:
+            self.latency_budget: float = getattr(
+                settings, "KEYCLOAK_LATENCY_BUDGET", DEFAULT_LATENCY_BUDGET
+            )
+            # KEYCLOAK_TIMEOUT remains the default read timeout. Waiting past the
+            # latency budget only delays a call that already counts as failed.
+            read_timeout = min(
+                getattr(
+                    settings, "KEYCLOAK_READ_TIMEOUT", getattr(settings, "KEYCLOAK_TIMEOUT", 5)
+                ),
+                self.latency_budget,
+            )
+        else:
+            read_timeout = getattr(
+                settings, "KEYCLOAK_SYNC_READ_TIMEOUT", DEFAULT_SYNC_READ_TIMEOUT
+            )
+            self.latency_budget = read_timeout
+        # (connect, read)
+        self.timeout: Tuple[float, float] = (
+            getattr(settings, "KEYCLOAK_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT),
+            read_timeout,
+        )
+        self.session: requests.Session = get_session()
+        self.breaker: CircuitBreaker = keycloak_breaker(
+            "keycloak" if interactive else "keycloak-sync"
+        )
+        self.token_refresh_margin: int = getattr(
+            settings, "KEYCLOAK_TOKEN_REFRESH_MARGIN", DEFAULT_TOKEN_REFRESH_MARGIN
+        )
 
     def _token_url(self) -> str:
         return f"{self.base_url}/realms/{self.realm}/protocol/openid-connect/token"
@@ -26,36 +179,117 @@ class KeycloakClient:
     def _admin_url(self, path: str) -> str:
         return f"{self.base_url}/admin/realms/{self.realm}{path}"
 
+    def _token_key(self) -> Tuple[str, str]:
+        return self._token_url(), self.client_id
+
     def get_admin_token(self) -> Optional[str]:
+        """Return a cached admin token, fetching a new one once it is near expiry."""
+        key = self._token_key()
+        with _token_lock:
+            cached = _token_cache.get(key)
+            if cached and cached.expires_at > time.monotonic():
+                return cached.value
+            _token_cache.pop(key, None)
+            token = self._fetch_admin_token()
+            if token:
+                _token_cache[key] = token
+                return token.value
+            return None
+
+    def invalidate_admin_token(self, token: str) -> None:
+        """Drop ``token`` from the cache, unless another caller already replaced it."""
+        key = self._token_key()
+        with _token_lock:
+            cached = _token_cache.get(key)
+            if cached and cached.value == token:
+                del _token_cache[key]
+
+    def _fetch_admin_token(self) -> Optional[_CachedToken]:
         data = {
             "grant_type": "client_credentials",
             "client_id": self.client_id,
             "client_secret": self.client_secret,
         }
         try:
-            r = requests.post(
-                self._token_url(), data=data, verify=self.verify_ssl, timeout=self.timeout
-            )
+            r = self._send(self.session.post, self._token_url(), data=data)
             if r.status_code != 200:
                 return None
-            return r.json().get("access_token")
+            payload = r.json()
+            token = payload.get("access_token")
+            if not token:
+                return None
+            lifetime = payload.get("expires_in") or DEFAULT_TOKEN_LIFETIME
+            ttl = max(float(lifetime) - self.token_refresh_margin, 0.0)
+            return _CachedToken(token, time.monotonic() + ttl)
         except Exception:
             return None
 
-    # ---- Group helpers ----
-    def get_group_id_by_name(self, name: str) -> Optional[str]:
+    def _admin_get(self, path: str, params: Dict[str, Any]) -> Optional[requests.Response]:
+        """GET an admin API path; on 401 refresh the token and retry exactly once."""
         token = self.get_admin_token()
         if not token:
             return None
+        r = self._get_with_token(path, params, token)
+        if r.status_code == 401:
+            self.invalidate_admin_token(token)
+            token = self.get_admin_token()
+            if not token:
+                return None
+            r = self._get_with_token(path, params, token)
+        return r
+
+    def _get_with_token(self, path: str, params: Dict[str, Any], token: str) -> requests.Response:
+        return self._send(
+            self.session.get,
+            self._admin_url(path),
+            params=params,
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    def _send(self, method: Any, url: str, **kwargs: Any) -> requests.Response:
+        """Send one request through the circuit breaker.
+
+        Raises ``KeycloakUnavailable`` without sending while the breaker is
+        open. Errors, 5xx answers and answers slower than the latency budget
+        are recorded as failures.
+        """
+        admitted = self.breaker.allow()
+        if admitted is None:
+            raise KeycloakUnavailable("Keycloak is unavailable (circuit breaker open)")
+        started = time.monotonic()
         try:
-            r = requests.get(
-                self._admin_url("/groups"),
-                params={"search": name},
-                headers={"Authorization": f"Bearer {token}"},
-                verify=self.verify_ssl,
-                timeout=self.timeout,
-            )
-            if r.status_code != 200:
+            r = method(url, verify=self.verify_ssl, timeout=self.timeout, **kwargs)
+        except requests.RequestException:
+            self.breaker.record_failure(admitted)
+            raise
+        if r.status_code >= 500 or time.monotonic() - started > self.latency_budget:
+            self.breaker.record_failure(admitted)
+        else:
+            self.breaker.record_success(admitted)
+        return r
+
+    # ---- Group helpers ----
+    def _group_id_cache_key(self, name: str) -> str:
+        return f"keycloak:group_id:{self.base_url}:{self.realm}:{name.lower()}"
+
+    def get_group_id_by_name(self, name: str) -> Optional[str]:
+        """Resolve a group name to its id, cached for ``KEYCLOAK_GROUP_ID_CACHE_TTL``."""
+        key = self._group_id_cache_key(name)
+        group_id = cache.get(key)
+        if group_id is None:
+            group_id = self._lookup_group_id(name)
+            if group_id:
+                ttl = getattr(settings, "KEYCLOAK_GROUP_ID_CACHE_TTL", DEFAULT_GROUP_ID_CACHE_TTL)
+                cache.set(key, group_id, ttl)
+        return group_id
+
+    def forget_group_id(self, name: str) -> None:
+        cache.delete(self._group_id_cache_key(name))
+
+    def _lookup_group_id(self, name: str) -> Optional[str]:
+        try:
+            r = self._admin_get("/groups", {"search": name})
+            if r is None or r.status_code != 200:
                 return None
             groups = r.json() or []
             # Prefer exact (case-insensitive) name match
@@ -68,24 +302,24 @@ class KeycloakClient:
             return None
 
     def get_group_members(
-        self, group_id: str, *, search: Optional[str] = None, max_results: int = 10
+        self,
+        group_id: str,
+        *,
+        search: Optional[str] = None,
+        max_results: int = 10,
+        group_name: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
-        token = self.get_admin_token()
-        if not token:
-            return []
+        """List members of ``group_id``; a 404 evicts ``group_name``'s cached id."""
         params: Dict[str, Any] = {"first": 0, "max": max_results}
         # Modern Keycloak supports `search` to filter group members
         if search:
             params["search"] = search
         try:
-            r = requests.get(
-                self._admin_url(f"/groups/{group_id}/members"),
-                params=params,
-                headers={"Authorization": f"Bearer {token}"},
-                verify=self.verify_ssl,
-                timeout=self.timeout,
-            )
-            if r.status_code != 200:
+            r = self._admin_get(f"/groups/{group_id}/members", params)
+            if r is not None and r.status_code == 404 and group_name:
+                # The group was deleted or recreated under a new id
+                self.forget_group_id(group_name)
+            if r is None or r.status_code != 200:
                 return []
             users = r.json() or []
             # If server ignored `search`, fallback client-side filter
@@ -105,19 +339,35 @@ class KeycloakClient:
         except Exception:
             return []
 
+    def iter_group_members(
+        self, group_id: str, page_size: int = 100
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Yield every member of ``group_id`` in ``first``/``max`` pages.
+
+        Unlike the search helpers this raises ``KeycloakError`` when a page
+        cannot be read, so a partial listing is never taken for the whole group.
+        """
+        first = 0
+        while True:
+            params = {"first": first, "max": page_size, "briefRepresentation": "true"}
+            try:
+                r = self._admin_get(f"/groups/{group_id}/members", params)
+                page = r.json() if r is not None and r.status_code == 200 else None
+            except (requests.RequestException, ValueError) as exc:
+                raise KeycloakError(f"Reading members of group {group_id} failed: {exc}") from exc
+            if page is None:
+                status = "no token" if r is None else f"HTTP {r.status_code}"
+                raise KeycloakError(f"Reading members of group {group_id} failed: {status}")
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            first += page_size
+
     def search_users(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
-        token = self.get_admin_token()
-        if not token:
-            return []
         try:
-            r = requests.get(
-                self._admin_url("/users"),
-                params={"search": query, "max": max_results},
-                headers={"Authorization": f"Bearer {token}"},
-                verify=self.verify_ssl,
-                timeout=self.timeout,
-            )
-            if r.status_code != 200:
+            r = self._admin_get("/users", {"search": query, "max": max_results})
+            if r is None or r.status_code != 200:
                 return []
             return r.json()
         except Exception:
@@ -138,12 +388,53 @@ class KeycloakClient:
         group_id = self.get_group_id_by_name(group_name)
         if not group_id:
             return []
-        return self.get_group_members(group_id, search=query, max_results=max_results)
+        return self.get_group_members(
+            group_id, search=query, max_results=max_results, group_name=group_name
+        )
 
 
-def search_students(query: str, max_results: int = 10) -> List[Dict[str, Any]]:
+class StudentSearchResults(list):
+    """Search results; ``degraded`` is set when Keycloak was skipped as unavailable.
+
+    The Keycloak part then comes from an outdated mirror, if there is one.
+    """
+
+    degraded = False
+
+
+def _search_keycloak_live(query: str, max_results: int) -> List[Dict[str, Any]]:
+    kc = KeycloakClient()
+    try:
+        group_name = getattr(settings, "KEYCLOAK_STUDENTS_GROUP", "students")
+        kc_users = kc.search_users_in_group(query, group_name, max_results=max_results)
+    except Exception:
+        kc_users = []
+    results: List[Dict[str, Any]] = []
+    for u in kc_users:
+        username = u.get("username")
+        if not username:
+            continue
+        full = f"{u.get('firstName', '')} {u.get('lastName', '')}".strip()
+        results.append(
+            {
+                "username": username,
+                "full_name": full,
+                "email": u.get("email"),
+                "source": "keycloak",
+            }
+        )
+    return results
+
+
+def search_students(query: str, max_results: int = 10) -> StudentSearchResults:
     """Search for students across local DB and Keycloak (if enabled).
 
+    Keycloak results come from the ``DirectoryStudent`` mirror while its
+    last sync is recent enough; before the first sync, or once it is stale,
+    Keycloak is queried live. While the Keycloak circuit breaker is open the
+    results come from the local students and whatever mirror there is, and
+    are marked ``degraded``.
+
     Returns a list of dicts: {username, full_name, email, source}
     """
     from django.contrib.auth import get_user_model
@@ -152,6 +443,7 @@ def search_students(query: str, max_results: int = 10) -> List[Dict[str, Any]]:
     from lms_users.models import Roles
 
     results: List[Dict[str, Any]] = []
+    degraded = False
     User = get_user_model()
     # Local first
     local_q = Q(role=Roles.STUDENT) & (
@@ -171,42 +463,47 @@ def search_students(query: str, max_results: int = 10) -> List[Dict[str, Any]]:
             }
         )
 
-    # Keycloak (if OIDC is on)
+    # Keycloak (if OIDC is on): the synced directory, or a live search before the first sync
     if not getattr(settings, "E2E_TEST_LOGIN", False):
-        kc = KeycloakClient()
-        try:
-            group_name = getattr(settings, "KEYCLOAK_STUDENTS_GROUP", "students")
-            kc_users = kc.search_users_in_group(query, group_name, max_results=max_results)
-        except Exception:
-            kc_users = []
-        for u in kc_users:
-            username = u.get("username")
-            if not username:
-                continue
-            full = f"{u.get('firstName', '')} {u.get('lastName', '')}".strip()
-            results.append(
-                {
-                    "username": username,
-                    "full_name": full,
-                    "email": u.get("email"),
-                    "source": "keycloak",
-                }
-            )
+        from .directory import directory_ready, search_directory
+
+        fresh = directory_ready()
+        if not fresh and keycloak_breaker().state != OPEN:
+            results.extend(_search_keycloak_live(query, max_results))
+            # The search itself may have tripped the breaker and come back empty
+            degraded = not keycloak_available()
+        else:
+            # While Keycloak is down an outdated mirror still beats no results
+            if fresh or directory_ready(stale_ok=True):
+                for d in search_directory(query, max_results=max_results):
+                    results.append(
+                        {
+                            "username": d.username,
+                            "full_name": d.full_name,
+                            "email": d.email,
+                            "source": "keycloak",
+                        }
+                    )
+            degraded = not fresh
 
     # De-duplicate by username preserving order (local wins)
     seen = set()
-    deduped: List[Dict[str, Any]] = []
+    deduped = StudentSearchResults()
     for r in results:
         if r["username"] in seen:
             continue
         seen.add(r["username"])
         deduped.append(r)
-    return deduped[:max_results]
+    del deduped[max_results:]
+    deduped.degraded = degraded
+    return deduped
 
 
 def provision_local_student_from_kc(username: str):
     """Find a Keycloak user and create a local student if not existing.
 
+    The synced directory is consulted first; Keycloak is only asked for
+    students who joined the group after the last sync.
     Returns the Django user or None if not found / failure.
     """
     from django.contrib.auth import get_user_model
@@ -220,8 +517,17 @@ def provision_local_student_from_kc(username: str):
     except User.DoesNotExist:
         pass
 
-    client = KeycloakClient()
-    kc_user = client.get_user_by_username(username)
+    from .directory import find_directory_student
+
+    entry = find_directory_student(username)
+    if entry is not None:
+        kc_user: Optional[Dict[str, Any]] = {
+            "email": entry.email,
+            "firstName": entry.first_name,
+            "lastName": entry.last_name,
+        }
+    else:
+        kc_user = KeycloakClient().get_user_by_username(username)
     if not kc_user:
         return None
 
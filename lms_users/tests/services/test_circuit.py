@@ -0,0 +1,101 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from lms_users.services import circuit
+from lms_users.services.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class TestCircuitBreaker(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.now = 1000.0
+        patcher = patch.object(circuit.time, "time", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=4, cooldown=30)
+
+    def test_opens_once_the_failure_rate_is_reached(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)  # below min_calls
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertIsNone(self.breaker.allow())
+
+    def test_stays_closed_below_the_failure_rate(self):
+        for _ in range(3):
+            self.breaker.record_success()
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.allow(), CLOSED)
+
+    def test_state_is_shared_between_instances(self):
+        for _ in range(4):
+            self.breaker.record_failure()
+        self.assertEqual(CircuitBreaker("test").state, OPEN)
+        self.assertEqual(CircuitBreaker("other").state, CLOSED)
+
+    def test_half_open_lets_one_trial_through(self):
+        for _ in range(4):
+            self.breaker.record_failure()
+        self.now += 31
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        admitted = self.breaker.allow()
+        self.assertEqual(admitted, HALF_OPEN)
+        self.assertIsNone(CircuitBreaker("test", cooldown=30).allow())
+
+        self.breaker.record_success(admitted)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.allow(), CLOSED)
+
+    def test_failed_trial_reopens_for_another_cooldown(self):
+        for _ in range(4):
+            self.breaker.record_failure()
+        self.now += 31
+        self.breaker.record_failure(self.breaker.allow())
+        self.assertEqual(self.breaker.state, OPEN)
+        self.now += 29
+        self.assertIsNone(self.breaker.allow())
+        self.now += 2
+        self.assertEqual(self.breaker.allow(), HALF_OPEN)
+
+    def test_calls_admitted_while_closed_do_not_close_the_breaker(self):
+        for _ in range(4):
+            self.breaker.record_failure()
+        self.breaker.record_success()  # a slow call that started before the breaker opened
+        self.assertEqual(self.breaker.state, OPEN)
+        self.now += 31
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+
+    def test_late_failures_do_not_extend_the_cooldown(self):
+        for _ in range(4):
+            self.breaker.record_failure()
+        self.now += 20
+        self.breaker.record_failure()
+        self.now += 11
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+
+    def test_failures_are_counted_over_a_sliding_window(self):
+        self.now = 1200.0  # the start of a 60 second slice
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.now += 90  # half way through the next slice: the old one counts half
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)  # 2.5 calls, below min_calls
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)  # 4.5 calls, all failed
+
+    def test_slices_older_than_the_window_are_forgotten(self):
+        self.now = 1200.0
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.now += 120
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
@@ -0,0 +1,203 @@
+import io
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from lms_users.models import DirectoryStudent, DirectorySync, Roles
+from lms_users.services.directory import sync_students
+from lms_users.services.keycloak import (
+    KeycloakError,
+    clear_token_cache,
+    keycloak_available,
+    keycloak_breaker,
+    provision_local_student_from_kc,
+    reset_session,
+    search_students,
+)
+
+
+def member(username, first="", last=""):
+    return {"id": f"id-{username}", "username": username, "firstName": first, "lastName": last}
+
+
+class _StubDirectoryHandler(BaseHTTPRequestHandler):
+    """Stub of the token, group search and paged group members endpoints."""
+
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status, payload=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self._reply(200, {"access_token": "t", "expires_in": 300})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        server = self.server
+        server.gets.append((url.path, params))  # type: ignore[attr-defined]
+        if url.path.endswith("/groups"):
+            self._reply(200, [{"id": "g1", "name": "students"}])
+        elif url.path.endswith("/groups/g1/members"):
+            first, size = int(params["first"]), int(params["max"])
+            if first == server.fail_at:  # type: ignore[attr-defined]
+                self._reply(500, {"error": "boom"})
+            else:
+                self._reply(200, server.members[first : first + size])  # type: ignore
+        else:
+            self._reply(404)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestStudentDirectorySync(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubDirectoryHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def setUp(self):
+        self.server.gets, self.server.fail_at = [], None
+        self.server.members = [
+            member("alice", "Alice", "A"),
+            member("albert", "Albert", "B"),
+            member("bob", "Bob", "C"),
+        ]
+        settings_override = override_settings(
+            KEYCLOAK_BASE_URL=f"http://127.0.0.1:{self.server.server_port}",
+            KEYCLOAK_REALM="lms",
+            KEYCLOAK_STUDENTS_GROUP="students",
+            KEYCLOAK_RETRY_BACKOFF=0,
+            KEYCLOAK_GET_RETRIES=0,
+            E2E_TEST_LOGIN=False,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for reset in (reset_session, clear_token_cache, cache.clear):
+            reset()
+            self.addCleanup(reset)
+
+    def member_pages(self):
+        return [p["first"] for path, p in self.server.gets if path.endswith("/members")]
+
+    def test_sync_pages_through_the_group(self):
+        run = sync_students(page_size=2)
+        self.assertEqual(self.member_pages(), ["0", "2"])
+        self.assertEqual((run.created, run.updated, run.deleted), (3, 0, 0))
+        self.assertIsNotNone(run.finished_at)
+        alice = DirectoryStudent.objects.get(username="alice")
+        self.assertEqual((alice.keycloak_id, alice.full_name), ("id-alice", "Alice A"))
+
+    def test_resync_writes_changes_and_deletes_departed_members(self):
+        first = sync_students(page_size=2)
+        self.server.members = [
+            member("alice", "Alice", "Changed"),
+            member("bob", "Bob", "C"),
+            member("carol", "Carol", "D"),
+        ]
+        run = sync_students(page_size=2)
+        self.assertEqual((run.created, run.updated, run.deleted), (1, 1, 1))
+        self.assertEqual(
+            list(DirectoryStudent.objects.values_list("username", "last_name")),
+            [("alice", "Changed"), ("bob", "C"), ("carol", "D")],
+        )
+        self.assertEqual(DirectoryStudent.objects.filter(synced_at=run.started_at).count(), 3)
+        self.assertGreater(run.started_at, first.started_at)
+
+    def test_failed_page_leaves_the_directory_alone(self):
+        sync_students(page_size=2)
+        self.server.members = self.server.members[:1]
+        self.server.fail_at = 0
+        with self.assertRaises(KeycloakError):
+            sync_students(page_size=2)
+        self.assertEqual(DirectoryStudent.objects.count(), 3)
+        run = DirectorySync.objects.first()
+        self.assertIsNone(run.finished_at)  # type: ignore[union-attr]
+        self.assertIn("HTTP 500", run.error)  # type: ignore[union-attr]
+
+    @override_settings(KEYCLOAK_CIRCUIT_MIN_CALLS=1, KEYCLOAK_CIRCUIT_FAILURE_RATE=0.1)
+    def test_failed_run_leaves_enrollment_search_breaker_closed(self):
+        self.server.fail_at = 0
+        with self.assertRaises(KeycloakError):
+            sync_students(page_size=2)
+        self.assertTrue(keycloak_available())
+        self.assertIsNone(keycloak_breaker("keycloak-sync").allow())
+
+    def test_failed_run_keeps_the_pages_it_applied(self):
+        sync_students(page_size=2)
+        self.server.members = [member("alice", "Alice", "Changed"), *self.server.members[1:]]
+        self.server.fail_at = 2
+        with self.assertRaises(KeycloakError):
+            sync_students(page_size=2)
+        self.assertEqual(DirectoryStudent.objects.get(username="alice").last_name, "Changed")
+        self.assertEqual(DirectoryStudent.objects.count(), 3)
+
+    def test_search_and_provisioning_read_the_directory(self):
+        sync_students()
+        requests_after_sync = len(self.server.gets)
+
+        results = search_students("al")
+        self.assertEqual([r["username"] for r in results], ["albert", "alice"])
+        self.assertEqual(results[1]["full_name"], "Alice A")
+
+        user = provision_local_student_from_kc("bob")
+        assert user is not None
+        self.assertEqual((user.first_name, user.role), ("Bob", Roles.STUDENT))
+        self.assertEqual(len(self.server.gets), requests_after_sync)
+
+    def test_search_is_live_before_the_first_sync(self):
+        search_students("al")
+        self.assertEqual(len(self.member_pages()), 1)
+        self.assertFalse(get_user_model().objects.filter(username="alice").exists())
+
+    def make_stale(self):
+        stale_at = timezone.now() - timedelta(seconds=3600)
+        DirectorySync.objects.update(started_at=stale_at, finished_at=stale_at)
+
+    @override_settings(KEYCLOAK_DIRECTORY_MAX_AGE=60)
+    def test_stale_directory_is_bypassed_for_a_live_search(self):
+        sync_students()
+        self.make_stale()
+        pages = len(self.member_pages())
+        results = search_students("al")
+        self.assertEqual(len(self.member_pages()), pages + 1)
+        self.assertFalse(results.degraded)
+
+    @override_settings(KEYCLOAK_DIRECTORY_MAX_AGE=60)
+    def test_stale_directory_is_searched_while_keycloak_is_down(self):
+        sync_students()
+        self.make_stale()
+        for _ in range(5):
+            keycloak_breaker().record_failure()
+        requests_before = len(self.server.gets)
+        results = search_students("al")
+        self.assertEqual([r["username"] for r in results], ["albert", "alice"])
+        self.assertTrue(results.degraded)
+        self.assertEqual(len(self.server.gets), requests_before)
+
+    def test_command_reports_the_run(self):
+        out = io.StringIO()
+        call_command("sync_keycloak_students", "--page-size", "2", stdout=out)
+        self.assertIn("3 created, 0 updated, 0 deleted", out.getvalue())
+
+        self.server.fail_at = 0
+        with self.assertRaisesMessage(CommandError, "nothing was deleted"):
+            call_command("sync_keycloak_students", stdout=io.StringIO())
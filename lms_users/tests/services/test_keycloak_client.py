@@ -0,0 +1,340 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from lms_users.models import Roles
+from lms_users.services import keycloak
+from lms_users.services.keycloak import (
+    KeycloakClient,
+    clear_token_cache,
+    keycloak_available,
+    reset_session,
+    search_students,
+)
+
+
+def response(status=200, payload=None):
+    r = Mock(status_code=status)
+    r.json.return_value = payload
+    return r
+
+
+def token_response(token, expires_in=300):
+    return response(payload={"access_token": token, "expires_in": expires_in})
+
+
+@override_settings(
+    KEYCLOAK_BASE_URL="http://kc.test",
+    KEYCLOAK_REALM="lms",
+    KEYCLOAK_ADMIN_CLIENT_ID="lms-admin",
+    KEYCLOAK_TOKEN_REFRESH_MARGIN=30,
+)
+class TestAdminTokenCache(SimpleTestCase):
+    def setUp(self):
+        clear_token_cache()
+        self.addCleanup(clear_token_cache)
+        cache.clear()
+        self.addCleanup(cache.clear)
+        patcher = patch.object(keycloak, "get_session")
+        self.session = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def test_token_is_shared_across_clients(self):
+        self.session.post.return_value = token_response("t1")
+        self.session.get.side_effect = [
+            response(payload=[{"id": "g1", "name": "students"}]),
+            response(payload=[{"username": "alice"}]),
+        ]
+        users = KeycloakClient().search_users_in_group("al", "students")
+        self.assertEqual(users, [{"username": "alice"}])
+        self.assertEqual(KeycloakClient().get_admin_token(), "t1")
+        self.assertEqual(self.session.post.call_count, 1)
+        headers = self.session.get.call_args.kwargs["headers"]
+        self.assertEqual(headers, {"Authorization": "Bearer t1"})
+
+    def test_token_is_refreshed_within_the_margin_of_expiry(self):
+        self.session.post.side_effect = [token_response("t1", 60), token_response("t2", 60)]
+        client = KeycloakClient()
+        now = time.monotonic()
+        with patch.object(keycloak.time, "monotonic", return_value=now):
+            self.assertEqual(client.get_admin_token(), "t1")
+        with patch.object(keycloak.time, "monotonic", return_value=now + 29):
+            self.assertEqual(client.get_admin_token(), "t1")
+        with patch.object(keycloak.time, "monotonic", return_value=now + 31):
+            self.assertEqual(client.get_admin_token(), "t2")
+
+    def test_failed_fetch_is_not_cached(self):
+        self.session.post.side_effect = [response(500), token_response("t1")]
+        client = KeycloakClient()
+        self.assertIsNone(client.get_admin_token())
+        self.assertEqual(client.get_admin_token(), "t1")
+
+    def test_unauthorized_refreshes_token_and_retries_once(self):
+        self.session.post.side_effect = [token_response("old"), token_response("new")]
+        self.session.get.side_effect = [response(401), response(payload=[{"username": "a"}])]
+        self.assertEqual(KeycloakClient().search_users("a"), [{"username": "a"}])
+        tokens = [c.kwargs["headers"]["Authorization"] for c in self.session.get.call_args_list]
+        self.assertEqual(tokens, ["Bearer old", "Bearer new"])
+
+    def test_second_unauthorized_is_not_retried(self):
+        self.session.post.side_effect = [token_response("old"), token_response("new")]
+        self.session.get.return_value = response(401)
+        self.assertEqual(KeycloakClient().search_users("a"), [])
+        self.assertEqual(self.session.get.call_count, 2)
+
+    def test_concurrent_callers_fetch_one_token(self):
+        def slow_post(*args, **kwargs):
+            time.sleep(0.05)
+            return token_response("t1")
+
+        self.session.post.side_effect = slow_post
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            tokens = list(pool.map(lambda _: KeycloakClient().get_admin_token(), range(8)))
+        self.assertEqual(tokens, ["t1"] * 8)
+        self.assertEqual(self.session.post.call_count, 1)
+
+
+@override_settings(KEYCLOAK_BASE_URL="http://kc.test", KEYCLOAK_REALM="lms")
+class TestGroupIdCache(SimpleTestCase):
+    def setUp(self):
+        for reset in (clear_token_cache, cache.clear):
+            reset()
+            self.addCleanup(reset)
+        patcher = patch.object(keycloak, "get_session")
+        self.session = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.session.post.return_value = token_response("t1")
+
+    def paths(self):
+        return [c.args[0].rsplit("/lms", 1)[1] for c in self.session.get.call_args_list]
+
+    def test_group_id_is_resolved_once(self):
+        self.session.get.side_effect = [
+            response(payload=[{"id": "g1", "name": "students"}]),
+            response(payload=[{"username": "alice"}]),
+            response(payload=[{"username": "albert"}]),
+        ]
+        KeycloakClient().search_users_in_group("al", "students")
+        KeycloakClient().search_users_in_group("alb", "Students")
+        self.assertEqual(self.paths(), ["/groups", "/groups/g1/members", "/groups/g1/members"])
+
+    def test_missing_group_is_not_cached(self):
+        self.session.get.return_value = response(payload=[])
+        self.assertEqual(KeycloakClient().search_users_in_group("al", "students"), [])
+        self.assertEqual(KeycloakClient().search_users_in_group("al", "students"), [])
+        self.assertEqual(self.paths(), ["/groups", "/groups"])
+
+    def test_members_404_evicts_the_cached_id(self):
+        self.session.get.side_effect = [
+            response(payload=[{"id": "g1", "name": "students"}]),
+            response(404),
+            response(payload=[{"id": "g2", "name": "students"}]),
+            response(payload=[{"username": "alice"}]),
+        ]
+        self.assertEqual(KeycloakClient().search_users_in_group("al", "students"), [])
+        users = KeycloakClient().search_users_in_group("al", "students")
+        self.assertEqual(users, [{"username": "alice"}])
+        self.assertEqual(
+            self.paths(),
+            ["/groups", "/groups/g1/members", "/groups", "/groups/g2/members"],
+        )
+
+    @override_settings(KEYCLOAK_GROUP_ID_CACHE_TTL=60)
+    def test_cached_id_expires_after_ttl(self):
+        with patch.object(keycloak.cache, "set") as cache_set:
+            self.session.get.return_value = response(payload=[{"id": "g1", "name": "students"}])
+            KeycloakClient().get_group_id_by_name("students")
+        self.assertEqual(cache_set.call_args.args[1:], ("g1", 60))
+
+
+@override_settings(
+    KEYCLOAK_BASE_URL="http://kc.test",
+    KEYCLOAK_REALM="lms",
+    KEYCLOAK_CIRCUIT_MIN_CALLS=2,
+    KEYCLOAK_CIRCUIT_COOLDOWN=30,
+    KEYCLOAK_LATENCY_BUDGET=1.0,
+    E2E_TEST_LOGIN=False,
+)
+class TestKeycloakCircuitBreaker(TestCase):
+    def setUp(self):
+        for reset in (clear_token_cache, cache.clear):
+            reset()
+            self.addCleanup(reset)
+        patcher = patch.object(keycloak, "get_session")
+        self.session = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.session.post.return_value = token_response("t1")
+        get_user_model().objects.create_user(username="alice", role=Roles.STUDENT)
+
+    def trip(self):
+        self.session.get.return_value = response(503)
+        KeycloakClient().search_users("a")
+        KeycloakClient().search_users("a")
+        self.session.get.reset_mock()
+
+    def test_server_errors_open_the_breaker_and_calls_fail_fast(self):
+        self.trip()
+        self.assertFalse(keycloak_available())
+        self.assertEqual(KeycloakClient().search_users("a"), [])
+        self.session.get.assert_not_called()
+
+    def test_slow_answers_count_against_the_latency_budget(self):
+        clock = iter(range(0, 100, 2))  # every call appears to take 2 seconds
+        self.session.get.return_value = response(payload=[])
+        with patch.object(keycloak.time, "monotonic", side_effect=lambda: next(clock)):
+            KeycloakClient().search_users("a")
+            KeycloakClient().search_users("a")
+        self.assertFalse(keycloak_available())
+
+    @override_settings(KEYCLOAK_READ_TIMEOUT=5)
+    def test_read_timeout_is_capped_by_the_latency_budget(self):
+        self.session.get.return_value = response(payload=[])
+        KeycloakClient().search_users("a")
+        _, read_timeout = self.session.get.call_args.kwargs["timeout"]
+        self.assertEqual(read_timeout, 1.0)
+
+    @override_settings(KEYCLOAK_READ_TIMEOUT=5, KEYCLOAK_SYNC_READ_TIMEOUT=30)
+    def test_batch_clients_wait_longer_on_a_breaker_of_their_own(self):
+        client = KeycloakClient(interactive=False)
+        self.assertEqual(client.timeout, (keycloak.DEFAULT_CONNECT_TIMEOUT, 30))
+        self.session.get.return_value = response(503)
+        client.search_users("a")
+        client.search_users("a")
+        self.assertTrue(keycloak_available())
+        self.assertIsNone(client.breaker.allow())
+
+    def test_open_breaker_degrades_search_to_local_students(self):
+        self.trip()
+        results = search_students("al")
+        self.assertEqual([r["username"] for r in results], ["alice"])
+        self.assertTrue(results.degraded)
+        self.session.get.assert_not_called()
+
+    def test_search_is_not_degraded_while_keycloak_answers(self):
+        self.session.get.side_effect = [
+            response(payload=[{"id": "g1", "name": "students"}]),
+            response(payload=[{"username": "albert"}]),
+        ]
+        results = search_students("al")
+        self.assertEqual([r["username"] for r in results], ["alice", "albert"])
+        self.assertFalse(results.degraded)
+
+
+class _StubKeycloakHandler(BaseHTTPRequestHandler):
+    """Keep-alive stub of the token and users endpoints; records each client port."""
+
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status, payload=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _record(self):
+        self.server.requests.append((self.command, self.client_address[1]))  # type: ignore
+        if self.server.failures:  # type: ignore[attr-defined]
+            self.server.failures -= 1  # type: ignore[attr-defined]
+            return False
+        return True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        if self._record():
+            self._reply(200, {"access_token": "t", "expires_in": 300})
+        else:
+            self._reply(503)
+
+    def do_GET(self):
+        time.sleep(self.server.delay)  # type: ignore[attr-defined]
+        if self._record():
+            self._reply(200, [{"username": "alice"}])
+        else:
+            self._reply(503)
+
+    def log_message(self, *args):
+        pass
+
+
+class _StubKeycloakServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        pass  # the client hung up first, e.g. after its read timeout
+
+
+class TestKeycloakSession(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = _StubKeycloakServer(("127.0.0.1", 0), _StubKeycloakHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def setUp(self):
+        self.server.requests, self.server.failures, self.server.delay = [], 0, 0
+        settings_override = override_settings(
+            KEYCLOAK_BASE_URL=f"http://127.0.0.1:{self.server.server_port}",
+            KEYCLOAK_REALM="lms",
+            KEYCLOAK_RETRY_BACKOFF=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for reset in (reset_session, clear_token_cache, cache.clear):
+            reset()
+            self.addCleanup(reset)
+
+    def test_connections_are_kept_alive_across_clients(self):
+        for _ in range(3):
+            self.assertEqual(KeycloakClient().search_users("al"), [{"username": "alice"}])
+        methods = [method for method, _ in self.server.requests]
+        self.assertEqual(methods, ["POST", "GET", "GET", "GET"])
+        self.assertEqual(len({port for _, port in self.server.requests}), 1)
+
+    def test_get_is_retried_with_backoff(self):
+        client = KeycloakClient()
+        client.get_admin_token()
+        self.server.failures = 2
+        self.assertEqual(client.search_users("al"), [{"username": "alice"}])
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_get_retries_are_bounded(self):
+        client = KeycloakClient()
+        client.get_admin_token()
+        self.server.failures = 10
+        self.assertEqual(client.search_users("al"), [])
+        self.assertEqual(len(self.server.requests), 1 + 3)  # token, first try, two retries
+
+    def test_token_post_is_not_retried(self):
+        self.server.failures = 1
+        self.assertIsNone(KeycloakClient().get_admin_token())
+        self.assertEqual(len(self.server.requests), 1)
+
+    @override_settings(KEYCLOAK_READ_TIMEOUT=0.05, KEYCLOAK_GET_RETRIES=0)
+    def test_read_timeout_is_separate_from_connect_timeout(self):
+        reset_session()
+        client = KeycloakClient()
+        self.assertEqual(client.timeout, (keycloak.DEFAULT_CONNECT_TIMEOUT, 0.05))
+        client.get_admin_token()
+        self.server.delay = 0.5
+        started = time.monotonic()
+        self.assertEqual(client.search_users("al"), [])
+        self.assertLess(time.monotonic() - started, 0.4)
+
+    @override_settings(KEYCLOAK_READ_TIMEOUT=0.1)
+    def test_read_timeouts_are_not_retried(self):
+        reset_session()
+        client = KeycloakClient()
+        client.get_admin_token()
+        self.server.delay = 0.5
+        started = time.monotonic()
+        self.assertEqual(client.search_users("al"), [])
+        self.assertLess(time.monotonic() - started, 0.25)
@@ -62,7 +62,7 @@ class TestTeacherDashboard(TestCase):
                 pass
 
         class DummyWB:
-            def __init__(self):
+            def __init__(self, write_only=False):
                 self.active = DummyWS()
 
             def create_sheet(self, _name):
@@ -127,7 +127,7 @@ class TestTeacherDashboard(TestCase):
                 pass
 
         class DummyWB:
-            def __init__(self):
+            def __init__(self, write_only=False):
                 self.active = DummyWS()
 
             def create_sheet(self, _name):
@@ -141,6 +141,7 @@ class TestTeacherDashboard(TestCase):
             title = "Course X"
 
         class FakeCS:
+            id = 1
             course = FakeCourse()
             year = 2025
             students_count = 10
@@ -193,6 +194,7 @@ class TestTeacherDashboard(TestCase):
             title = "Title"
 
         class FakeCS:
+            id = 1
             course = FakeCourse()
             year = 2025
             students_count = 2
@@ -224,7 +226,7 @@ class TestTeacherDashboard(TestCase):
             )
             resp = teacher_export_dashboard(req)
             self.assertEqual(resp.status_code, 200)
-            body = resp.content.decode("utf-8-sig")
+            body = resp.getvalue().decode("utf-8-sig")
             self.assertIn("key,value", body)
             self.assertIn("course_code,course_title,year,students", body)
             self.assertIn("CSXYZ,Title,2025,2", body)